@@ -4,6 +4,8 @@ from __future__ import annotations
 import argparse
 from typing import Any, Dict, List, Optional
 
+from rwhtn.catalog_store import CatalogStore
+from rwhtn.cassette import REPLAY_TOKEN, add_cassette_args, apply_cassette_args, replaying
 from rwhtn.config import DEBUG_OUTPUT_DIR, coerce_bool, ensure_dir, iso_now, try_load_dotenv, write_json
 from rwhtn.reader_api import fetch_reader_documents
 
@@ -64,11 +66,19 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--top-level-only", type=coerce_bool, default=True)
     parser.add_argument("--page-limit", type=int, default=None)
     parser.add_argument("--out-dir", default=DEBUG_OUTPUT_DIR)
+    parser.add_argument(
+        "--store-sqlite",
+        type=coerce_bool,
+        default=False,
+        help="Also store the snapshot in 11_cache/catalog.sqlite (table reader_snapshots, keyed by --location).",
+    )
+    add_cassette_args(parser)
     args = parser.parse_args(argv)
 
     import os
 
-    token = os.environ.get(args.token_env)
+    apply_cassette_args(args)
+    token = os.environ.get(args.token_env) or (REPLAY_TOKEN if replaying() else None)
     if not token:
         raise RuntimeError(f"Missing token env var {args.token_env!r}")
 
@@ -85,6 +95,11 @@ def main(argv: Optional[List[str]] = None) -> int:
     write_json(f"{out_dir}/shortlist_snapshot.json", {"meta": meta, "documents": docs})
     write_markdown(f"{out_dir}/shortlist_snapshot.md", docs, meta)
     print(f"Wrote shortlist snapshot to {out_dir}/shortlist_snapshot.* ({len(docs)} docs)")
+    if args.store_sqlite:
+        store = CatalogStore()
+        count = store.replace_reader_snapshot(args.location, docs)
+        store.set_meta({f"reader_snapshot:{args.location}:queried_at": meta["queried_at"]})
+        print(f"Stored {count} docs in {store.path} (snapshot {args.location!r})")
     return 0
 
 
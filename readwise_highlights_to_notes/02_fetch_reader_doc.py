@@ -5,6 +5,7 @@ import argparse
 import os
 from typing import List, Optional
 
+from rwhtn.cassette import REPLAY_TOKEN, add_cassette_args, apply_cassette_args, replaying
 from rwhtn.config import DEBUG_OUTPUT_DIR, coerce_bool, ensure_dir, try_load_dotenv, write_json
 from rwhtn.reader_api import fetch_reader_document
 
@@ -17,9 +18,11 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--token-env", default="READWISE_TOKEN")
     parser.add_argument("--with-html", type=coerce_bool, default=True)
     parser.add_argument("--out-dir", default=DEBUG_OUTPUT_DIR)
+    add_cassette_args(parser)
     args = parser.parse_args(argv)
 
-    token = os.environ.get(args.token_env)
+    apply_cassette_args(args)
+    token = os.environ.get(args.token_env) or (REPLAY_TOKEN if replaying() else None)
     if not token:
         raise RuntimeError(f"Missing token env var {args.token_env!r}")
 
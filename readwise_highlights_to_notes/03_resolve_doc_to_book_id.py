@@ -5,8 +5,9 @@ import argparse
 import os
 from typing import List, Optional
 
+from rwhtn.cassette import REPLAY_TOKEN, add_cassette_args, apply_cassette_args, replaying
 from rwhtn.config import try_load_dotenv
-from rwhtn.readwise_api import fetch_all_books, resolve_book_id_for_source_url
+from rwhtn.orchestrate import book_resolver
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -16,14 +17,25 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--token-env", default="READWISE_TOKEN")
     parser.add_argument("--source-url", required=True)
     parser.add_argument("--title", required=True)
+    parser.add_argument(
+        "--reader-doc-id",
+        default="",
+        help="Reader document id; resolves via 11_cache/resolution_map.json (no catalog sync when known).",
+    )
+    parser.add_argument("--refresh-books", action="store_true", help="Re-list the whole books catalog (no delta sync).")
+    add_cassette_args(parser)
     args = parser.parse_args(argv)
 
-    token = os.environ.get(args.token_env)
+    apply_cassette_args(args)
+    token = os.environ.get(args.token_env) or (REPLAY_TOKEN if replaying() else None)
     if not token:
         raise RuntimeError(f"Missing token env var {args.token_env!r}")
 
-    books = fetch_all_books(token=token)
-    book_id = resolve_book_id_for_source_url(books, args.source_url, args.title)
+    resolver = book_resolver(token=token, refresh_books=args.refresh_books)
+    if args.refresh_books:
+        resolver.catalog()
+    book_id = resolver.resolve(args.reader_doc_id.strip(), args.source_url.strip(), args.title.strip())
+    resolver.save()
     if book_id is None:
         print("No match.")
         return 1
@@ -5,24 +5,28 @@ import argparse
 import os
 from typing import List, Optional
 
+from rwhtn.cassette import REPLAY_TOKEN, add_cassette_args, apply_cassette_args, replaying
 from rwhtn.config import DEBUG_OUTPUT_DIR, ensure_dir, try_load_dotenv, write_json
-from rwhtn.readwise_api import export_highlights_for_book_id
+from rwhtn.highlight_store import sync_highlights_for_book_id
 
 
 def main(argv: Optional[List[str]] = None) -> int:
     try_load_dotenv()
 
-    parser = argparse.ArgumentParser(description="Export highlights for a Readwise book_id.")
+    parser = argparse.ArgumentParser(description="Sync highlights for a Readwise book_id into 11_cache/highlights/ and write them to JSON.")
     parser.add_argument("book_id", type=int)
     parser.add_argument("--token-env", default="READWISE_TOKEN")
     parser.add_argument("--out-dir", default=DEBUG_OUTPUT_DIR)
+    parser.add_argument("--full-refresh", action="store_true", help="Re-export everything instead of a delta sync.")
+    add_cassette_args(parser)
     args = parser.parse_args(argv)
 
-    token = os.environ.get(args.token_env)
+    apply_cassette_args(args)
+    token = os.environ.get(args.token_env) or (REPLAY_TOKEN if replaying() else None)
     if not token:
         raise RuntimeError(f"Missing token env var {args.token_env!r}")
 
-    highlights = export_highlights_for_book_id(token=token, book_id=int(args.book_id))
+    highlights = sync_highlights_for_book_id(token=token, book_id=int(args.book_id), full_refresh=args.full_refresh)
     out_dir = ensure_dir(args.out_dir)
     out_path = os.path.join(out_dir, f"highlights_{args.book_id}.json")
     write_json(out_path, highlights)
@@ -6,7 +6,8 @@ import json
 from typing import Any, Dict, List, Optional
 
 from rwhtn.config import write_json
-from rwhtn.transform import dedupe_exact_highlights_in_place_order, sort_highlights_in_read_order
+from rwhtn.near_dupes import KEEP_POLICIES, dedupe_near_duplicate_highlights, near_duplicate_settings
+from rwhtn.transform import dedupe_exact_highlights_in_place_order, place_highlights_in_read_order
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -14,6 +15,14 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("in_json")
     parser.add_argument("out_json")
     parser.add_argument("--html-stream-json", default=None, help="Optional JSON file containing {'html_stream': ...}.")
+    parser.add_argument(
+        "--near-dup-threshold",
+        type=float,
+        default=near_duplicate_settings().threshold,
+        help="Drop overlapping/re-highlighted passages at the same place when this share of the shorter one's "
+        "word shingles occurs in the other, 0-1; 0 disables.",
+    )
+    parser.add_argument("--near-dup-keep", choices=KEEP_POLICIES, default=near_duplicate_settings().keep)
     args = parser.parse_args(argv)
 
     with open(args.in_json, "r", encoding="utf-8") as f:
@@ -28,8 +37,15 @@ def main(argv: Optional[List[str]] = None) -> int:
         if isinstance(payload, dict) and isinstance(payload.get("html_stream"), str):
             html_stream = payload["html_stream"]
 
-    highlights = sort_highlights_in_read_order(highlights, html_stream)
-    highlights = dedupe_exact_highlights_in_place_order(highlights)
+    placed = place_highlights_in_read_order(highlights, html_stream)
+    position_of = {id(h): pos for pos, h in placed}
+    highlights = dedupe_exact_highlights_in_place_order([h for _, h in placed])
+    highlights = dedupe_near_duplicate_highlights(
+        highlights,
+        threshold=args.near_dup_threshold,
+        keep=args.near_dup_keep,
+        positions=[position_of[id(h)] for h in highlights],
+    )
     write_json(args.out_json, highlights)
     print(f"Wrote {args.out_json} ({len(highlights)} highlights)")
     return 0
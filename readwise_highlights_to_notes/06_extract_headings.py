@@ -6,7 +6,7 @@ import json
 from typing import List, Optional
 
 from rwhtn.config import write_json
-from rwhtn.transform import build_html_stream, extract_headings_from_html
+from rwhtn.transform import analyze_html
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -21,10 +21,16 @@ def main(argv: Optional[List[str]] = None) -> int:
         raise RuntimeError("Expected a Reader document JSON object.")
 
     html = doc.get("html_content") or ""
-    headings = extract_headings_from_html(html if isinstance(html, str) else "")
-    html_stream = build_html_stream(html if isinstance(html, str) else "")
-    write_json(args.out_json, {"headings": headings, "html_stream": html_stream})
-    print(f"Wrote {args.out_json} ({len(headings)} headings)")
+    analysis = analyze_html(html if isinstance(html, str) else "")
+    write_json(
+        args.out_json,
+        {
+            "headings": analysis.headings,
+            "heading_offsets": analysis.heading_offsets,
+            "html_stream": analysis.html_stream,
+        },
+    )
+    print(f"Wrote {args.out_json} ({len(analysis.headings)} headings)")
     return 0
 
 
@@ -6,6 +6,9 @@ import json
 from typing import Any, Dict, List, Optional, Tuple
 
 from rwhtn.render import render_markdown_note
+from rwhtn.sections import SectionTree
+from rwhtn.templates import configure_note_template
+from rwhtn.transform import anchor_highlights
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -17,7 +20,9 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--highlights-json", required=True)
     parser.add_argument("--headings-json", required=True)
     parser.add_argument("--out", required=True)
+    parser.add_argument("--template", default=None, help="Directory of note template fragments (see README).")
     args = parser.parse_args(argv)
+    configure_note_template(args.template)
 
     with open(args.frontmatter_json, "r", encoding="utf-8") as f:
         frontmatter = json.load(f)
@@ -29,17 +34,32 @@ def main(argv: Optional[List[str]] = None) -> int:
     headings = headings_payload.get("headings") if isinstance(headings_payload, dict) else []
     if not isinstance(headings, list):
         headings = []
+    headings = [(int(lvl), str(txt)) for (lvl, txt) in headings if isinstance(lvl, (int, str))]
+    highlights = highlights if isinstance(highlights, list) else []
 
-    render_markdown_note(
+    # headings.json from 06_extract_headings.py (or a --debug run) also carries offsets and the
+    # stream, which lets highlights be placed under their enclosing sections.
+    section_tree: Optional[SectionTree] = None
+    highlight_sections: Optional[List[Optional[int]]] = None
+    if isinstance(headings_payload, dict):
+        offsets = headings_payload.get("heading_offsets")
+        html_stream = headings_payload.get("html_stream")
+        if isinstance(offsets, list) and isinstance(html_stream, str):
+            section_tree = SectionTree.build(headings, [int(o) for o in offsets], html_stream)
+            highlight_sections = [section_tree.section_at(p) for p in anchor_highlights(highlights, html_stream)]
+
+    changed = render_markdown_note(
         path=args.out,
         title=args.title,
         source_url=args.source_url,
         cover_image_url=args.cover_image_url,
         frontmatter=frontmatter if isinstance(frontmatter, dict) else {},
-        highlights=highlights if isinstance(highlights, list) else [],
-        headings=[(int(lvl), str(txt)) for (lvl, txt) in headings if isinstance(lvl, (int, str))],
+        highlights=highlights,
+        headings=headings,
+        section_tree=section_tree,
+        highlight_sections=highlight_sections,
     )
-    print(f"Wrote {args.out}")
+    print(f"Wrote {args.out}" if changed else f"Unchanged {args.out}")
     return 0
 
 
@@ -3,10 +3,39 @@ from __future__ import annotations
 
 import argparse
 import os
-from typing import List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from rwhtn.cassette import REPLAY_TOKEN, add_cassette_args, apply_cassette_args, replaying
 from rwhtn.config import coerce_bool, try_load_dotenv
-from rwhtn.orchestrate import find_shortlist_docs_by_queries, load_shortlist_and_books, load_title_file, make_note_for_doc, TargetDoc
+from rwhtn.near_dupes import KEEP_POLICIES, configure_near_duplicates, near_duplicate_settings
+from rwhtn.orchestrate import (
+    find_shortlist_docs_by_queries,
+    book_resolver,
+    iter_shortlist_target_batches,
+    load_shortlist,
+    load_shortlist_async,
+    load_title_file,
+    make_note_for_doc,
+    make_notes_async,
+    prefetch_highlights_for_targets,
+    ShortlistStream,
+    split_up_to_date,
+    TargetDoc,
+)
+from rwhtn.ratelimit import configure_rate_limiter
+from rwhtn.resolution import BookResolver
+from rwhtn.response_cache import (
+    CACHE_MODES,
+    DEFAULT_MAX_BYTES,
+    DEFAULT_TTLS,
+    configure_response_cache,
+    parse_ttl_override,
+    prune_response_cache,
+)
+from rwhtn.templates import FRAGMENTS, configure_note_template
+from rwhtn.title_index import DEFAULT_MATCH_THRESHOLD
+from rwhtn.transport import configure_transport
 
 
 def _get_printer():
@@ -45,6 +74,64 @@ def _get_printer():
         return _print_ok, _print_fail, _print_err, _print_plain
 
 
+def _iter_note_results(
+    *,
+    token: str,
+    target_batches: Iterable[List[TargetDoc]],
+    resolver: BookResolver,
+    debug: bool,
+    skip_existing: bool,
+    workers: int,
+    bulk_export: bool,
+    refresh_highlights: bool,
+    skip_unchanged: bool,
+    incremental: bool,
+) -> Iterator[Tuple[TargetDoc, Optional[str], Optional[str]]]:
+    def run(t: TargetDoc, prefetched: Optional[Dict[int, List[Dict[str, Any]]]]) -> Tuple[Optional[str], Optional[str]]:
+        return make_note_for_doc(
+            token=token,
+            target=t,
+            resolver=resolver,
+            debug=debug,
+            skip_existing=skip_existing,
+            prefetched_highlights=prefetched,
+            refresh_highlights=refresh_highlights,
+            incremental=incremental,
+        )
+
+    def result(fut: Future, t: TargetDoc) -> Tuple[TargetDoc, Optional[str], Optional[str]]:
+        try:
+            out_path, err = fut.result()
+        except Exception as e:
+            out_path, err = None, str(e) or type(e).__name__
+        return t, out_path, err
+
+    # Each batch is submitted as soon as it is listed, so notes for page 1 are written while
+    # page 2 is still being fetched.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures: Dict[Future, TargetDoc] = {}
+        for batch in target_batches:
+            settled, pending = split_up_to_date(
+                batch, resolver, skip_existing=skip_existing, skip_unchanged=skip_unchanged
+            )
+            for t, out_path in settled:
+                yield t, out_path, None
+            if pending:
+                prefetched = None
+                if bulk_export:
+                    prefetched = prefetch_highlights_for_targets(
+                        token=token,
+                        targets=pending,
+                        resolver=resolver,
+                        refresh_highlights=refresh_highlights,
+                    )
+                futures.update({pool.submit(run, t, prefetched): t for t in pending})
+            for fut in [f for f in futures if f.done()]:
+                yield result(fut, futures.pop(fut))
+        for fut in as_completed(list(futures)):
+            yield result(fut, futures.pop(fut))
+
+
 def main(argv: Optional[List[str]] = None) -> int:
     try_load_dotenv()
     print_ok, print_fail, print_err, print_plain = _get_printer()
@@ -52,79 +139,223 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser = argparse.ArgumentParser(description="Generate structured Markdown notes from Readwise Reader shortlist.")
     parser.add_argument("titles", nargs="*", help="One or more title substrings to match in shortlist.")
     parser.add_argument("--titles-file", default=None, help="File containing one title substring per line.")
+    parser.add_argument(
+        "--match-threshold",
+        type=float,
+        default=DEFAULT_MATCH_THRESHOLD,
+        help=f"Minimum fuzzy title-match confidence, 0-1, when no title contains the query (default: {DEFAULT_MATCH_THRESHOLD}).",
+    )
     parser.add_argument("--all-shortlist", action="store_true", help="Generate notes for every top-level item in Shortlist.")
     parser.add_argument("--debug", action="store_true", help="Write intermediates to 09_shortlist_outputs/ (per-doc).")
     parser.add_argument("--skip-existing", action="store_true", help="Skip writing notes that already exist in 10_output_notes/.")
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="Skip notes whose Reader doc and Readwise book are unchanged since the note was generated.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Insert only new highlights into existing notes, keeping your edits, instead of re-rendering them.",
+    )
     parser.add_argument(
         "--include-children",
         action="store_true",
         help="Include child documents (parent_id set). Default is top-level only.",
     )
+    parser.add_argument(
+        "--refresh-books",
+        action="store_true",
+        help="Re-list the whole Readwise books catalog instead of a delta sync of 11_cache/catalog.sqlite.",
+    )
+    parser.add_argument(
+        "--refresh-highlights",
+        action="store_true",
+        help="Re-export every selected doc's highlights instead of a delta sync of 11_cache/highlights/.",
+    )
+    parser.add_argument(
+        "--near-dup-threshold",
+        type=float,
+        default=near_duplicate_settings().threshold,
+        help="Drop overlapping/re-highlighted passages at the same place when this share of the shorter one's "
+        f"word shingles occurs in the other, 0-1; 0 disables (default: {near_duplicate_settings().threshold}).",
+    )
+    parser.add_argument(
+        "--near-dup-keep",
+        choices=KEEP_POLICIES,
+        default=near_duplicate_settings().keep,
+        help="Which highlight of a near-duplicate group to keep (default: the longest).",
+    )
+    parser.add_argument(
+        "--template",
+        default=None,
+        help=f"Directory of note template fragments ({', '.join(f'{n}.md' for n in FRAGMENTS)}); "
+        "missing files keep the built-in layout.",
+    )
     parser.add_argument("--limit", type=int, default=None, help="Limit number of docs processed (useful with --all-shortlist).")
+    parser.add_argument("--workers", type=int, default=1, help="Process N documents concurrently (default: 1).")
+    parser.add_argument(
+        "--engine",
+        choices=("threads", "async"),
+        default="threads",
+        help="Fetch engine: 'threads' (see --workers) or 'async' (one event loop; best for whole-library runs).",
+    )
+    parser.add_argument("--concurrency", type=int, default=64, help="Max in-flight requests for --engine async.")
+    parser.add_argument(
+        "--bulk-export",
+        type=coerce_bool,
+        default=None,
+        help="Export highlights for all selected docs in a few multi-id calls (default: on for 2+ docs).",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=coerce_bool,
+        default=True,
+        help="Pace requests with the shared per-endpoint token bucket (default: true).",
+    )
+    parser.add_argument(
+        "--shared-rate-limit",
+        type=coerce_bool,
+        default=True,
+        help="Share the rate-limit budget with other rwhtn processes via 11_cache/ratelimit.json (default: true).",
+    )
+    parser.add_argument(
+        "--cache-mode",
+        choices=CACHE_MODES,
+        default="use",
+        help="HTTP response cache in 11_cache/http/: use it, refresh it (fetch + overwrite), or bypass it.",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=parse_ttl_override,
+        action="append",
+        default=[],
+        metavar="ENDPOINT=SECONDS",
+        help=f"Override a response cache TTL; endpoints: {', '.join(DEFAULT_TTLS)}. Repeatable.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Trim the response cache to this size (oldest entries first) after the run; 0: no cap "
+        f"(default: {DEFAULT_MAX_BYTES // (1024 * 1024)}). Expired entries are always removed.",
+    )
     parser.add_argument("--token-env", default="READWISE_TOKEN")
+    parser.add_argument("--http-timeout", type=int, default=None, help="Per-request timeout in seconds (default: 60).")
+    parser.add_argument("--http-pool-size", type=int, default=None, help="Max keep-alive connections per host (default: 16).")
+    add_cassette_args(parser)
     args = parser.parse_args(argv)
 
-    token = os.environ.get(args.token_env)
+    workers = max(1, int(args.workers))
+    pool_size = args.http_pool_size
+    if pool_size is None and workers > 16:
+        pool_size = workers
+    configure_transport(timeout=args.http_timeout, pool_maxsize=pool_size)
+    configure_rate_limiter(enabled=bool(args.rate_limit), shared=bool(args.shared_rate_limit))
+    configure_near_duplicates(threshold=args.near_dup_threshold, keep=args.near_dup_keep)
+    configure_note_template(args.template)
+    ttls = {k: v for override in args.cache_ttl for k, v in override.items()}
+    if args.skip_unchanged:
+        # "Unchanged" must be judged against the current listing and catalog, and a note
+        # regenerated because of a new highlight must get it from a live export.
+        ttls.update(reader_list=0, books=0, export=0)
+    configure_response_cache(
+        mode=args.cache_mode,
+        ttls=ttls,
+        max_bytes=args.cache_max_mb * 1024 * 1024,
+    )
+
+    apply_cassette_args(args)
+    token = os.environ.get(args.token_env) or (REPLAY_TOKEN if replaying() else None)
     if not token:
         raise RuntimeError(f"Missing token env var {args.token_env!r}")
 
+    top_level_only = not args.include_children
+    limit = None if args.limit is None else max(0, int(args.limit))
+    targets: Optional[List[TargetDoc]] = None
+    errors: List[str] = []
+
+    # Books are resolved through 11_cache/resolution_map.json; the catalog is loaded only if needed.
+    resolver = book_resolver(
+        token=token,
+        refresh_books=args.refresh_books,
+        catalog_max_age_seconds=0 if args.skip_unchanged else 60 * 60,
+    )
     try:
-        shortlist, books = load_shortlist_and_books(token=token, top_level_only=(not args.include_children))
+        if args.refresh_books:
+            resolver.catalog()
+        if not args.all_shortlist:
+            # With --all-shortlist the Shortlist is streamed page by page inside the run instead.
+            load = load_shortlist_async if args.engine == "async" else load_shortlist
+            shortlist = load(token=token, top_level_only=top_level_only)
+            title_queries: List[str] = list(args.titles or [])
+            if args.titles_file:
+                title_queries.extend(load_title_file(args.titles_file))
+            targets, errors = find_shortlist_docs_by_queries(shortlist, title_queries, threshold=args.match_threshold)
+            if limit is not None:
+                targets = targets[:limit]
     except RuntimeError as e:
         print_err(str(e))
         return 1
 
-    targets: List[TargetDoc] = []
-    errors: List[str] = []
-
-    if args.all_shortlist:
-        for d in shortlist:
-            title = (d.get("title") or "").strip()
-            if not title:
-                continue
-            targets.append(
-                TargetDoc(
-                    reader_doc_id=(d.get("id") or "").strip(),
-                    title=title,
-                    source_url=(d.get("source_url") or "").strip(),
-                )
-            )
-    else:
-        title_queries: List[str] = list(args.titles or [])
-        if args.titles_file:
-            title_queries.extend(load_title_file(args.titles_file))
-        targets, errors = find_shortlist_docs_by_queries(shortlist, title_queries)
-
-    if args.limit is not None:
-        targets = targets[: max(0, int(args.limit))]
-
-    if not targets:
+    if targets is not None and not targets:
         for e in errors:
             print_err(e)
         print_err("No documents selected.")
         return 1
 
+    bulk_export = bool(args.bulk_export) if args.bulk_export is not None else (targets is None or len(targets) > 1)
+    common = dict(
+        token=token,
+        resolver=resolver,
+        debug=args.debug,
+        skip_existing=args.skip_existing,
+        bulk_export=bulk_export,
+        refresh_highlights=args.refresh_highlights,
+        skip_unchanged=args.skip_unchanged,
+        incremental=args.incremental,
+    )
     ok = 0
     failed = 0
-    for t in targets:
-        out_path, err = make_note_for_doc(
-            token=token,
-            target=t,
-            books=books,
-            debug=args.debug,
-            skip_existing=args.skip_existing,
-        )
-        if err:
-            failed += 1
-            print_fail(t.title, f": {err}")
-            continue
-        ok += 1
-        print_ok(t.title, f" -> {out_path}")
+    try:
+        results: Iterable[Tuple[TargetDoc, Optional[str], Optional[str]]]
+        if args.engine == "async":
+            results = make_notes_async(
+                targets=targets,
+                shortlist_stream=ShortlistStream(top_level_only=top_level_only, limit=limit) if targets is None else None,
+                concurrency=args.concurrency,
+                **common,
+            )
+        else:
+            batches = (
+                iter_shortlist_target_batches(token=token, top_level_only=top_level_only, limit=limit)
+                if targets is None
+                else [targets]
+            )
+            results = _iter_note_results(target_batches=batches, workers=workers, **common)
+        for t, out_path, err in results:
+            if err:
+                failed += 1
+                print_fail(t.title, f": {err}")
+                continue
+            ok += 1
+            print_ok(t.title, f" -> {out_path}")
+    except RuntimeError as e:
+        # A Shortlist page, the catalog or a bulk export failed mid-run; notes already written stay written.
+        print_err(str(e))
+        failed += 1
+    finally:
+        resolver.save()
+        prune_response_cache()
+
+    if ok + failed == 0:
+        print_err("No documents selected.")
+        return 1
 
     for e in errors:
         print_err(e)
 
-    print_plain(f"Done. ok={ok}, failed={failed}, total={len(targets)}")
+    print_plain(f"Done. ok={ok}, failed={failed}, total={ok + failed}")
     return 0 if failed == 0 and not errors else 1
 
 
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+
+# Words of each highlight used as its search pattern: enough to be distinctive, short enough
+# to survive differences later in the passage (footnote markers, paragraph joins).
+PATTERN_WORDS = 8
+
+# `_` is a separator, not a word character: `_emphasis_` and `snake_case` split the same way
+# in Markdown highlights and in the HTML stream.
+_TOKEN_RE = re.compile(r"\[img:[^\]\s]+\]|[^\W_]+")
+
+
+def anchor_tokens(text: str) -> List[str]:
+    """
+    Case-, accent-width- and punctuation-insensitive word tokens; `[IMG:<name>]` markers from
+    the HTML stream stay single tokens so image highlights can anchor on them.
+    """
+    return _TOKEN_RE.findall(unicodedata.normalize("NFKC", text or "").casefold())
+
+
+class TokenAutomaton:
+    """
+    Aho-Corasick automaton over word tokens: finds every occurrence of every pattern in one
+    left-to-right pass over the document, however many patterns there are.
+    """
+
+    def __init__(self, patterns: Sequence[Sequence[str]]) -> None:
+        self.patterns = [list(p) for p in patterns]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[int]] = [[]]
+        for pid, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for token in pattern:
+                nxt = self._goto[state].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][token] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(pid)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and token not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, tokens: Sequence[str]) -> List[List[int]]:
+        """
+        Start token index of every occurrence of each pattern, in order.
+        """
+        found: List[List[int]] = [[] for _ in self.patterns]
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for pid in out[state]:
+                found[pid].append(i - len(self.patterns[pid]) + 1)
+        return found
+
+
+def anchor_positions(patterns: Sequence[Sequence[str]], stream_tokens: Sequence[str]) -> List[Optional[int]]:
+    """
+    One token position per pattern (None if it cannot be anchored). Patterns are taken in the
+    given order and anchored at their first occurrence at or after the previous anchor, so
+    repeated phrases follow the existing order instead of collapsing onto their first
+    appearance. A pattern found only before that is anchored there if it occurs exactly once;
+    a repeated one is left unanchored, since nothing says which earlier occurrence it is.
+    """
+    if not stream_tokens or not any(patterns):
+        return [None] * len(patterns)
+    # Every occurrence is kept, so identical patterns (a repeated short highlight) share one list.
+    distinct = list(dict.fromkeys(tuple(p) for p in patterns))
+    occurrences = dict(zip(distinct, TokenAutomaton(distinct).search(stream_tokens)))
+    anchors: List[Optional[int]] = []
+    last = -1
+    for pattern in patterns:
+        hits = occurrences[tuple(pattern)]
+        k = bisect_left(hits, last)
+        if k < len(hits):
+            pos = hits[k]
+        elif len(hits) == 1:
+            pos = hits[0]
+        else:
+            anchors.append(None)
+            continue
+        anchors.append(pos)
+        last = max(last, pos)
+    return anchors
@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import asyncio
+import math
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from rwhtn import cassette, response_cache
+from rwhtn.catalog_store import CatalogStore
+from rwhtn.config import RawPayloadWriter
+from rwhtn.json_stream import PayloadDecoder, ReaderPayloadDecoder, TextSink
+from rwhtn.ratelimit import rate_limiter
+from rwhtn.reader_api import READER_LIST_URL, _document_params, _first_document, _list_params, _page_documents
+from rwhtn.readwise_api import (
+    READWISE_BOOKS_URL,
+    READWISE_EXPORT_URL,
+    EXPORT_IDS_PER_REQUEST,
+    _apply_books_sync,
+    _books_params,
+    _chunk_book_ids,
+    _export_params,
+    _highlights_from_export,
+    _page_books,
+    _page_export_results,
+    _plan_books_sync,
+    _split_export_by_book,
+)
+from rwhtn.transport import (
+    STREAM_CHUNK_BYTES,
+    backoff_seconds,
+    decode_entry,
+    get_json,
+    parse_retry_after,
+    stream_json,
+    transport_settings,
+)
+
+
+class AsyncEngine:
+    """
+    One event loop, one keep-alive client, many in-flight requests.
+
+    Uses `httpx` when installed (`uv sync --extra async`). Without it, requests are handed to
+    the pooled synchronous transport on worker threads so callers keep the same API.
+    """
+
+    def __init__(self, *, token: str, concurrency: int = 64) -> None:
+        self.token = token
+        self.concurrency = max(1, int(concurrency))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Any = None
+
+    async def __aenter__(self) -> "AsyncEngine":
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            import httpx  # type: ignore
+        except Exception:
+            return self
+        settings = transport_settings()
+        self._client = httpx.AsyncClient(
+            headers={"Authorization": f"Token {self.token}"},
+            timeout=settings.timeout,
+            limits=httpx.Limits(
+                max_connections=max(self.concurrency, settings.pool_maxsize),
+                max_keepalive_connections=settings.pool_maxsize,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_json(self, *, url: str, params: Dict[str, Any], api_name: str = "Readwise") -> Dict[str, Any]:
+        if self._semaphore is None:
+            raise RuntimeError("AsyncEngine must be used as `async with AsyncEngine(...)`.")
+        # Cache and cassette entries can be multi-MB files; read and write them off the loop.
+        replayed = await asyncio.to_thread(cassette.replay, url, params)
+        if replayed is not None:
+            return replayed
+        cached = await asyncio.to_thread(response_cache.lookup, url, self.token, params)
+        if cached is not None:
+            await asyncio.to_thread(cassette.record, url, params, cached)
+            return cached
+        async with self._semaphore:
+            if self._client is None:
+                return await asyncio.to_thread(get_json, url=url, token=self.token, params=params, api_name=api_name)
+            return await self._get_json_httpx(url=url, params=params, api_name=api_name)
+
+    async def stream_json(
+        self, *, url: str, params: Dict[str, Any], decoder: PayloadDecoder, api_name: str = "Readwise"
+    ) -> Dict[str, Any]:
+        """
+        `transport.stream_json` on the event loop. Decoding (which may include HTML analysis)
+        runs on a worker thread one chunk at a time, so the loop keeps serving other requests;
+        cache and cassette hits are streamed from disk on a worker thread (`decode_entry`).
+        """
+        if self._semaphore is None:
+            raise RuntimeError("AsyncEngine must be used as `async with AsyncEngine(...)`.")
+        replayed = await asyncio.to_thread(cassette.replay_path, url, params)
+        if replayed is not None:
+            return await asyncio.to_thread(decode_entry, replayed, decoder, url=url, params=params, cached=False)
+        cached = await asyncio.to_thread(response_cache.lookup_path, url, self.token, params)
+        if cached is not None:
+            return await asyncio.to_thread(decode_entry, cached, decoder, url=url, params=params)
+        async with self._semaphore:
+            if self._client is None:
+                return await asyncio.to_thread(
+                    stream_json, url=url, token=self.token, params=params, decoder=decoder, api_name=api_name
+                )
+            import httpx  # type: ignore
+
+            resp = await self._send_httpx(url=url, params=params, api_name=api_name, stream=True)
+            writers: List[RawPayloadWriter] = []
+            try:
+                for writer in (response_cache.open_writer(url, self.token, params), cassette.open_writer(url, params)):
+                    if writer is not None:
+                        writers.append(writer)
+
+                def consume(chunk: bytes) -> None:
+                    decoder.feed(chunk)
+                    for w in writers:
+                        w.write(chunk)
+
+                async for chunk in resp.aiter_bytes(STREAM_CHUNK_BYTES):
+                    await asyncio.to_thread(consume, chunk)
+                payload = await asyncio.to_thread(decoder.close)
+            except BaseException as e:
+                for writer in writers:
+                    writer.abort()
+                if isinstance(e, httpx.HTTPError):
+                    raise RuntimeError(f"{api_name} API request failed: {e}") from e
+                if isinstance(e, ValueError):
+                    raise RuntimeError(f"{api_name} API returned invalid JSON: {e}") from e
+                raise
+            finally:
+                await resp.aclose()
+            for writer in writers:
+                await asyncio.to_thread(writer.commit)
+            return payload
+
+    async def _get_json_httpx(self, *, url: str, params: Dict[str, Any], api_name: str) -> Dict[str, Any]:
+        resp = await self._send_httpx(url=url, params=params, api_name=api_name)
+        payload = resp.json()
+        payload = payload if isinstance(payload, dict) else {"results": payload}
+        await asyncio.to_thread(response_cache.store, url, self.token, params, payload)
+        await asyncio.to_thread(cassette.record, url, params, payload)
+        return payload
+
+    async def _send_httpx(self, *, url: str, params: Dict[str, Any], api_name: str, stream: bool = False) -> Any:
+        import httpx  # type: ignore
+
+        limiter = rate_limiter()
+        max_retries = transport_settings().max_retries
+        attempt = 0
+        while True:
+            # The shared limiter takes a file lock and does file I/O; keep that off the loop.
+            wait = await asyncio.to_thread(limiter.reserve, url)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                request = self._client.build_request("GET", url, params=params)
+                resp = await self._client.send(request, stream=stream)
+            except httpx.HTTPError as e:
+                raise RuntimeError(f"{api_name} API request failed: {e}") from e
+            if resp.status_code == 429:
+                await resp.aclose()
+                retry_after_seconds = parse_retry_after(resp.headers.get("Retry-After"))
+                attempt += 1
+                if attempt > max_retries:
+                    raise RuntimeError("Hit rate limit repeatedly (429); aborting.")
+                if limiter.enabled:
+                    await asyncio.to_thread(limiter.penalize, url, backoff_seconds(attempt, retry_after_seconds))
+                else:
+                    await asyncio.sleep(backoff_seconds(attempt, retry_after_seconds))
+                continue
+            try:
+                resp.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                await resp.aclose()
+                raise RuntimeError(f"{api_name} API request failed: {e}") from e
+            return resp
+
+
+async def _reader_payload(
+    engine: AsyncEngine, params: Dict[str, Any], html_sink: Optional[Callable[[], TextSink]]
+) -> Dict[str, Any]:
+    if html_sink is not None and params.get("withHtmlContent") == "true":
+        decoder = ReaderPayloadDecoder(html_sink=html_sink)
+        return await engine.stream_json(url=READER_LIST_URL, params=params, decoder=decoder, api_name="Reader")
+    return await engine.get_json(url=READER_LIST_URL, params=params, api_name="Reader")
+
+
+async def aiter_reader_document_pages(
+    *,
+    engine: AsyncEngine,
+    location: Optional[str] = None,
+    updated_after: Optional[str] = None,
+    category: Optional[str] = None,
+    tags: Tuple[str, ...] = (),
+    with_html_content: bool = False,
+    top_level_only: bool = False,
+    page_limit: Optional[int] = None,
+    html_sink: Optional[Callable[[], TextSink]] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    # Cursor pagination is inherently sequential; the win is that other coroutines run meanwhile.
+    next_page_cursor: Optional[str] = None
+    page_count = 0
+
+    while True:
+        if page_limit is not None and page_count >= page_limit:
+            break
+        page_count += 1
+
+        params = _list_params(
+            page_cursor=next_page_cursor,
+            location=location,
+            updated_after=updated_after,
+            category=category,
+            tags=tags,
+            with_html_content=with_html_content,
+        )
+        payload = await _reader_payload(engine, params, html_sink)
+        yield _page_documents(payload, top_level_only=top_level_only)
+        next_page_cursor = payload.get("nextPageCursor")
+        if not next_page_cursor:
+            break
+
+
+async def fetch_reader_documents_async(
+    *,
+    engine: AsyncEngine,
+    location: Optional[str] = None,
+    updated_after: Optional[str] = None,
+    category: Optional[str] = None,
+    tags: Tuple[str, ...] = (),
+    with_html_content: bool = False,
+    top_level_only: bool = False,
+    page_limit: Optional[int] = None,
+    html_sink: Optional[Callable[[], TextSink]] = None,
+) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    async for page in aiter_reader_document_pages(
+        engine=engine,
+        location=location,
+        updated_after=updated_after,
+        category=category,
+        tags=tags,
+        with_html_content=with_html_content,
+        top_level_only=top_level_only,
+        page_limit=page_limit,
+        html_sink=html_sink,
+    ):
+        results.extend(page)
+    return results
+
+
+async def fetch_reader_document_async(
+    *,
+    engine: AsyncEngine,
+    document_id: str,
+    with_html_content: bool = False,
+    html_sink: Optional[Callable[[], TextSink]] = None,
+) -> Dict[str, Any]:
+    payload = await _reader_payload(engine, _document_params(document_id, with_html_content), html_sink)
+    return _first_document(payload)
+
+
+async def sync_books_catalog_async(
+    *,
+    engine: AsyncEngine,
+    max_pages: int = 200,
+    cache_max_age_seconds: int = 60 * 60,
+    full_refresh: bool = False,
+) -> CatalogStore:
+    store = CatalogStore()
+    mode, mark = _plan_books_sync(store, max_age_seconds=cache_max_age_seconds, full_refresh=full_refresh)
+    if mode != "fresh":
+        books = await _fetch_book_pages_async(engine=engine, max_pages=max_pages, updated_after=mark)
+        _apply_books_sync(store, mode, mark, books)
+    return store
+
+
+async def _fetch_book_pages_async(
+    *,
+    engine: AsyncEngine,
+    max_pages: int,
+    updated_after: Optional[str],
+) -> List[Dict[str, Any]]:
+    first = await engine.get_json(url=READWISE_BOOKS_URL, params=_books_params(1, updated_after))
+    results = _page_books(first)
+    count = first.get("count")
+    if not results or not first.get("next"):
+        return results
+
+    if isinstance(count, int) and count > 0:
+        # Page-numbered listing: once the total is known, the remaining pages are independent.
+        last_page = min(max_pages, math.ceil(count / len(results)))
+        pages = await asyncio.gather(
+            *(
+                engine.get_json(url=READWISE_BOOKS_URL, params=_books_params(p, updated_after))
+                for p in range(2, last_page + 1)
+            )
+        )
+        for payload in pages:
+            results.extend(_page_books(payload))
+        return results
+
+    page = 2
+    while page <= max_pages:
+        payload = await engine.get_json(url=READWISE_BOOKS_URL, params=_books_params(page, updated_after))
+        page_results = _page_books(payload)
+        if not page_results:
+            break
+        results.extend(page_results)
+        if not payload.get("next"):
+            break
+        page += 1
+    return results
+
+
+async def export_highlights_for_book_id_async(*, engine: AsyncEngine, book_id: int) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    next_page_cursor: Optional[str] = None
+    while True:
+        payload = await engine.get_json(url=READWISE_EXPORT_URL, params=_export_params(book_id, next_page_cursor))
+        results.extend(_page_export_results(payload))
+        next_page_cursor = payload.get("nextPageCursor")
+        if not next_page_cursor:
+            break
+
+    return _highlights_from_export(results)
+
+
+async def export_highlights_for_book_ids_async(
+    *,
+    engine: AsyncEngine,
+    book_ids: Iterable[int],
+    chunk_size: int = EXPORT_IDS_PER_REQUEST,
+    updated_after: Optional[str] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    async def sweep(chunk: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        results: List[Any] = []
+        next_page_cursor: Optional[str] = None
+        while True:
+            params = _export_params(chunk, next_page_cursor, updated_after)
+            payload = await engine.get_json(url=READWISE_EXPORT_URL, params=params)
+            results.extend(_page_export_results(payload))
+            next_page_cursor = payload.get("nextPageCursor")
+            if not next_page_cursor:
+                break
+        return _split_export_by_book(results, chunk)
+
+    by_book: Dict[int, List[Dict[str, Any]]] = {}
+    for part in await asyncio.gather(*(sweep(c) for c in _chunk_book_ids(book_ids, chunk_size))):
+        by_book.update(part)
+    return by_book
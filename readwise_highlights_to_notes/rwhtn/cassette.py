@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import urllib.parse
+from typing import Any, Dict, Optional
+
+from rwhtn.config import RawPayloadWriter, ensure_dir, set_cache_dir, write_json_atomic
+
+
+# Placeholder token for replay runs on machines without READWISE_TOKEN; it never leaves the process.
+REPLAY_TOKEN = "replay"
+
+_mode: Optional[str] = None
+_directory: Optional[str] = None
+
+
+def configure_cassette(*, record_dir: Optional[str] = None, replay_dir: Optional[str] = None) -> None:
+    """
+    Record every API response into a directory, or serve them back from one with no network.
+
+    Both modes run against a throwaway cache root so no local cache (books, highlight store,
+    outlines, response cache) can short-circuit a request: a recording is complete, and a
+    replay exercises the whole pipeline.
+    """
+    global _mode, _directory
+    if record_dir and replay_dir:
+        raise ValueError("Use either --record or --replay, not both.")
+    if not record_dir and not replay_dir:
+        _mode, _directory = None, None
+        return
+    if replay_dir and not os.path.isdir(replay_dir):
+        raise RuntimeError(f"Cassette directory not found: {replay_dir!r}")
+
+    _mode = "record" if record_dir else "replay"
+    _directory = ensure_dir(record_dir) if record_dir else replay_dir
+
+    scratch = tempfile.mkdtemp(prefix="rwhtn_cassette_cache_")
+    atexit.register(shutil.rmtree, scratch, True)
+    set_cache_dir(scratch)
+
+
+def replaying() -> bool:
+    return _mode == "replay"
+
+
+def _entry_path(url: str, params: Dict[str, Any]) -> str:
+    material = json.dumps({"url": url, "params": params}, sort_keys=True, default=str)
+    digest = hashlib.sha256(material.encode("utf-8")).hexdigest()[:24]
+    # Readable prefix (e.g. `api_v3_list_`) so a cassette can be browsed by endpoint.
+    prefix = re.sub(r"[^a-z0-9]+", "_", urllib.parse.urlparse(url).path.lower()).strip("_")
+    return os.path.join(_directory or "", f"{prefix}_{digest}.json")
+
+
+def replay_path(url: str, params: Dict[str, Any]) -> Optional[str]:
+    """
+    Path of the recorded entry when replaying (None otherwise), for streaming its payload with
+    `config.iter_raw_payload` instead of loading it with `replay`.
+    """
+    if _mode != "replay":
+        return None
+    path = _entry_path(url, params)
+    if not os.path.exists(path):
+        raise RuntimeError(f"No recorded response for {url} params={params!r} in {_directory!r}")
+    return path
+
+
+def replay(url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    path = replay_path(url, params)
+    if path is None:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    payload = entry.get("payload") if isinstance(entry, dict) else None
+    if not isinstance(payload, dict):
+        raise RuntimeError(f"Corrupt cassette entry: {path}")
+    return payload
+
+
+def record(url: str, params: Dict[str, Any], payload: Dict[str, Any]) -> None:
+    if _mode != "record":
+        return
+    write_json_atomic(_entry_path(url, params), {"url": url, "params": params, "payload": payload})
+
+
+def open_writer(url: str, params: Dict[str, Any]) -> Optional[RawPayloadWriter]:
+    """
+    `record` for a response that is being streamed.
+    """
+    if _mode != "record":
+        return None
+    return RawPayloadWriter(_entry_path(url, params), {"url": url, "params": params})
+
+
+def add_cassette_args(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--record", default=None, metavar="DIR", help="Record every API response into DIR.")
+    group.add_argument("--replay", default=None, metavar="DIR", help="Serve API responses from DIR; no network, no token.")
+
+
+def apply_cassette_args(args: argparse.Namespace) -> None:
+    configure_cassette(record_dir=args.record, replay_dir=args.replay)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+import urllib.parse
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+
+_TRACKING_PARAM_PREFIXES = ("utm_",)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Comparable form of a source URL: scheme, `www.`, fragment, trailing slash and `utm_*`
+    tracking parameters are dropped; host is lowercased; remaining query params are sorted.
+    """
+    raw = (url or "").strip()
+    if not raw:
+        return ""
+    parts = urllib.parse.urlsplit(raw if "://" in raw else f"//{raw}")
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    query = sorted(
+        (k, v)
+        for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAM_PREFIXES)
+    )
+    normalized = f"{host}{path}"
+    if query:
+        normalized += "?" + urllib.parse.urlencode(query)
+    return normalized
+
+
+def normalize_title(title: str) -> str:
+    text = unicodedata.normalize("NFKC", title or "").casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class BookLookup(Protocol):
+    """
+    What book resolution needs from a catalog (implemented by `catalog_store.SqliteBookCatalog`).
+    """
+
+    def book_by_id(self, book_id: int) -> Optional[Dict[str, Any]]: ...
+
+    def match(self, source_url: str, title: str) -> Tuple[List[int], Optional[str]]: ...
+
+    def resolve(self, source_url: str, title: str) -> Optional[int]: ...
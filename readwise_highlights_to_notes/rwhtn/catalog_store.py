@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from rwhtn.catalog import normalize_title, normalize_url
+from rwhtn.config import cache_dir, ensure_dir, json_default
+
+
+CATALOG_DB_FILENAME = "catalog.sqlite"
+# Stored as `PRAGMA user_version`; a mismatch drops and rebuilds the tables (it is only a cache).
+CATALOG_SCHEMA_VERSION = 1
+
+# Book fields kept as columns, so lookups can select just what they need. The full record
+# stays in `raw` for callers that want everything.
+BOOK_COLUMNS = (
+    "id",
+    "title",
+    "author",
+    "category",
+    "source",
+    "source_url",
+    "cover_image_url",
+    "published_date",
+    "num_highlights",
+    "last_highlight_at",
+    "updated",
+)
+SNAPSHOT_COLUMNS = ("id", "title", "author", "category", "location", "source_url", "url", "parent_id", "updated_at")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT, author TEXT, category TEXT, source TEXT, source_url TEXT, cover_image_url TEXT,
+    published_date TEXT, num_highlights INTEGER, last_highlight_at TEXT, updated TEXT,
+    url_norm TEXT, title_norm TEXT,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_url_norm ON books (url_norm);
+CREATE INDEX IF NOT EXISTS books_title_norm ON books (title_norm);
+CREATE TABLE IF NOT EXISTS reader_snapshots (
+    snapshot TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT, author TEXT, category TEXT, location TEXT, source_url TEXT, url TEXT,
+    parent_id TEXT, updated_at TEXT,
+    title_norm TEXT,
+    raw TEXT NOT NULL,
+    PRIMARY KEY (snapshot, id)
+);
+CREATE INDEX IF NOT EXISTS reader_snapshots_title_norm ON reader_snapshots (snapshot, title_norm);
+"""
+_TABLES = ("meta", "books", "reader_snapshots")
+
+
+def _book_row(book: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        book_id = int(book.get("id"))
+    except Exception:
+        return None
+    row = {c: book.get(c) for c in BOOK_COLUMNS}
+    row["id"] = book_id
+    row["url_norm"] = normalize_url(book.get("source_url") or "") or None
+    row["title_norm"] = normalize_title(book.get("title") or "") or None
+    row["raw"] = json.dumps(book, ensure_ascii=False, default=json_default)
+    return row
+
+
+def _check_fields(fields: Sequence[str], allowed: Sequence[str]) -> str:
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown catalog field(s) {unknown}; expected {list(allowed)}.")
+    return ", ".join(fields)
+
+
+class CatalogStore:
+    """
+    Indexed SQLite copy of the Readwise books catalog (and optional Reader snapshots) in
+    `11_cache/catalog.sqlite`. Nothing is loaded up front: each lookup reads only the rows
+    and columns it asks for, so startup cost does not grow with the library.
+
+    Connections are per thread; WAL mode lets other rwhtn processes read during a sync.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.path.join(ensure_dir(cache_dir()), CATALOG_DB_FILENAME)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_SCHEMA_VERSION:
+                with conn:
+                    for table in _TABLES:
+                        conn.execute(f"DROP TABLE IF EXISTS {table}")
+                    conn.executescript(_SCHEMA)
+                    conn.execute(f"PRAGMA user_version = {CATALOG_SCHEMA_VERSION}")
+            self._local.conn = conn
+        return conn
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, values: Dict[str, Optional[str]]) -> None:
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                list(values.items()),
+            )
+
+    # Books
+
+    def count_books(self) -> int:
+        return int(self._conn().execute("SELECT COUNT(*) FROM books").fetchone()[0])
+
+    def replace_books(self, books: Iterable[Dict[str, Any]]) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM books")
+            self._insert_books(conn, books, start=0)
+
+    def upsert_books(self, books: Iterable[Dict[str, Any]]) -> None:
+        """
+        Apply a delta: changed books are updated in place (keeping their position), new ones
+        are appended.
+        """
+        with self._conn() as conn:
+            start = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM books").fetchone()[0]
+            self._insert_books(conn, books, start=int(start))
+
+    def _insert_books(self, conn: sqlite3.Connection, books: Iterable[Dict[str, Any]], *, start: int) -> None:
+        columns = list(BOOK_COLUMNS) + ["url_norm", "title_norm", "raw"]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "id")
+        sql = (
+            f"INSERT INTO books (position, {', '.join(columns)}) "
+            f"VALUES (?, {', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}"
+        )
+        rows = (r for r in (_book_row(b) for b in books if isinstance(b, dict)) if r is not None)
+        conn.executemany(sql, ((start + i, *[r[c] for c in columns]) for i, r in enumerate(rows)))
+
+    def book_by_id(self, book_id: int, fields: Sequence[str] = BOOK_COLUMNS) -> Optional[Dict[str, Any]]:
+        sql = f"SELECT {_check_fields(fields, BOOK_COLUMNS)} FROM books WHERE id = ?"
+        try:
+            row = self._conn().execute(sql, (int(book_id),)).fetchone()
+        except (TypeError, ValueError):
+            return None
+        return dict(row) if row else None
+
+    def books_for_url(self, url_norm: str) -> List[Tuple[int, str]]:
+        rows = self._conn().execute(
+            "SELECT id, source_url FROM books WHERE url_norm = ? ORDER BY position", (url_norm,)
+        ).fetchall()
+        return [(int(r["id"]), r["source_url"] or "") for r in rows]
+
+    def book_ids_for_title(self, title_norm: str) -> List[int]:
+        rows = self._conn().execute(
+            "SELECT id FROM books WHERE title_norm = ? ORDER BY position", (title_norm,)
+        ).fetchall()
+        return [int(r["id"]) for r in rows]
+
+    def iter_books(self) -> Iterator[Dict[str, Any]]:
+        for row in self._conn().execute("SELECT raw FROM books ORDER BY position"):
+            yield json.loads(row["raw"])
+
+    # Reader snapshots (e.g. the Shortlist pulled by 01_pull_from_shortlist.py)
+
+    def replace_reader_snapshot(self, snapshot: str, documents: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        with self._conn() as conn:
+            conn.execute("DELETE FROM reader_snapshots WHERE snapshot = ?", (snapshot,))
+            for position, d in enumerate(x for x in documents if isinstance(x, dict) and x.get("id")):
+                conn.execute(
+                    f"INSERT OR REPLACE INTO reader_snapshots "
+                    f"(snapshot, position, {', '.join(SNAPSHOT_COLUMNS)}, title_norm, raw) "
+                    f"VALUES (?, ?, {', '.join('?' for _ in SNAPSHOT_COLUMNS)}, ?, ?)",
+                    (
+                        snapshot,
+                        position,
+                        *[d.get(c) for c in SNAPSHOT_COLUMNS],
+                        normalize_title(d.get("title") or "") or None,
+                        json.dumps(d, ensure_ascii=False, default=json_default),
+                    ),
+                )
+                count += 1
+        return count
+
+    def reader_snapshot(self, snapshot: str, fields: Sequence[str] = SNAPSHOT_COLUMNS) -> List[Dict[str, Any]]:
+        sql = f"SELECT {_check_fields(fields, SNAPSHOT_COLUMNS)} FROM reader_snapshots WHERE snapshot = ? ORDER BY position"
+        return [dict(r) for r in self._conn().execute(sql, (snapshot,))]
+
+
+class SqliteBookCatalog:
+    """
+    `catalog.BookLookup` answered by indexed queries against a `CatalogStore`.
+    """
+
+    def __init__(self, store: CatalogStore) -> None:
+        self.store = store
+
+    def __len__(self) -> int:
+        return self.store.count_books()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.store.iter_books()
+
+    def book_by_id(self, book_id: int) -> Optional[Dict[str, Any]]:
+        return self.store.book_by_id(book_id)
+
+    def match(self, source_url: str, title: str) -> Tuple[List[int], Optional[str]]:
+        raw_url = (source_url or "").strip()
+        rows = self.store.books_for_url(normalize_url(raw_url)) if raw_url else []
+        if rows:
+            exact = [i for i, url in rows if url.strip() == raw_url]
+            return exact + [i for i, _ in rows if i not in exact], "source_url"
+        key = normalize_title(title)
+        ids = self.store.book_ids_for_title(key) if key else []
+        if ids:
+            return ids, "title"
+        return [], None
+
+    def resolve(self, source_url: str, title: str) -> Optional[int]:
+        ids, _ = self.match(source_url, title)
+        return ids[0] if ids else None
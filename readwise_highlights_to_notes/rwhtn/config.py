@@ -3,9 +3,10 @@ from __future__ import annotations
 import argparse
 import os
 import re
+import threading
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Iterable, Optional
+from typing import Any, Dict, Iterable, Iterator, Optional
 
 
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,6 +15,20 @@ DEBUG_OUTPUT_DIR = os.path.join(PROJECT_DIR, "09_shortlist_outputs")
 FINAL_NOTES_DIR = os.path.join(PROJECT_DIR, "10_output_notes")
 CACHE_DIR = os.path.join(PROJECT_DIR, "11_cache")
 
+_cache_root = CACHE_DIR
+
+
+def cache_dir(*parts: str) -> str:
+    """
+    Path under the active cache root (`11_cache/` unless redirected with `set_cache_dir`).
+    """
+    return os.path.join(_cache_root, *parts)
+
+
+def set_cache_dir(path: str) -> None:
+    global _cache_root
+    _cache_root = path
+
 
 def try_load_dotenv() -> None:
     """
@@ -73,6 +88,22 @@ def parse_iso_datetime(value: str) -> Optional[datetime]:
         return None
 
 
+def latest_timestamp(rows: Iterable[Dict[str, Any]], key: str) -> Optional[str]:
+    """
+    Raw value of the latest ISO timestamp under `key` (kept verbatim so it can be sent back to the API).
+    """
+    best_dt: Optional[datetime] = None
+    best_raw: Optional[str] = None
+    for row in rows:
+        raw = row.get(key) if isinstance(row, dict) else None
+        dt = parse_iso_datetime(raw) if isinstance(raw, str) else None
+        if dt is None:
+            continue
+        if best_dt is None or dt > best_dt:
+            best_dt, best_raw = dt, raw
+    return best_raw
+
+
 def format_dd_mmm_yyyy(iso_value: str) -> Optional[str]:
     dt = parse_iso_datetime(iso_value)
     if not dt:
@@ -113,6 +144,121 @@ def write_json(path: str, payload: Any) -> None:
         json.dump(payload, f, ensure_ascii=False, indent=2, default=json_default)
 
 
+def write_json_atomic(path: str, payload: Any) -> None:
+    """
+    Write to a sibling temp file and rename over `path`, so readers never see a half-written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_json(tmp_path, payload)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_text_atomic(path: str, text: str) -> None:
+    """
+    `write_json_atomic` for text (e.g. a rendered note).
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class RawPayloadWriter:
+    """
+    Writes a `{<header fields>, "payload": <raw JSON>}` entry whose payload is copied byte for
+    byte from a streamed response, so it never has to be decoded and re-encoded in memory.
+    Goes through a temp file renamed over `path` on `commit`, like `write_json_atomic`.
+
+    With `strict=False` (caches) I/O errors are swallowed and the entry is simply not written.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any], *, strict: bool = True) -> None:
+        import json
+
+        self.path = path
+        self.strict = strict
+        self._tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file: Any = None
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(self._tmp_path, "wb")
+            prefix = json.dumps(header, ensure_ascii=False, default=json_default)[:-1]
+            self._file.write(f'{prefix}{", " if header else ""}"payload": '.encode("utf-8"))
+        except Exception:
+            self._fail()
+
+    def _fail(self) -> None:
+        self.abort()
+        if self.strict:
+            raise
+
+    def write(self, data: bytes) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.write(data)
+        except Exception:
+            self._fail()
+
+    def commit(self) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.write(b"}")
+            self._file.close()
+            self._file = None
+            os.replace(self._tmp_path, self.path)
+        except Exception:
+            self._fail()
+
+    def abort(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def iter_raw_payload(path: str, chunk_size: int) -> Iterator[bytes]:
+    """
+    The raw bytes of the `"payload"` value of an entry written by `RawPayloadWriter` (or a JSON
+    object whose last key is `payload`), in chunks, without decoding the entry.
+    Raises ValueError if the file does not look like such an entry.
+    """
+    marker = b'"payload": '
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(max(0, size - 64))
+        tail = f.read()
+        if not tail.rstrip().endswith(b"}"):
+            raise ValueError(f"Truncated entry: {path}")
+        end = size - (len(tail) - len(tail.rstrip())) - 1
+        f.seek(0)
+        head = f.read(min(end, 64 * 1024))
+        start = head.find(marker)
+        if start < 0:
+            raise ValueError(f"No payload in entry: {path}")
+        pos = start + len(marker)
+        f.seek(pos)
+        while pos < end:
+            chunk = f.read(min(chunk_size, end - pos))
+            if not chunk:
+                raise ValueError(f"Truncated entry: {path}")
+            pos += len(chunk)
+            yield chunk
+
+
 def compact_whitespace(text: str) -> str:
     return " ".join((text or "").split())
 
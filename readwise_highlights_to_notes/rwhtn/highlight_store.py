@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from rwhtn.async_api import AsyncEngine, export_highlights_for_book_ids_async
+from rwhtn.config import cache_dir, ensure_dir, iso_now, latest_timestamp, parse_iso_datetime, write_json_atomic
+from rwhtn.readwise_api import export_highlights_for_book_ids
+
+
+def _store_path(book_id: int) -> str:
+    return os.path.join(ensure_dir(cache_dir("highlights")), f"{int(book_id)}.json")
+
+
+def load_store(book_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_store_path(book_id), "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("highlights"), list):
+        return None
+    return payload
+
+
+def load_highlights_for_book_id(book_id: int) -> List[Dict[str, Any]]:
+    store = load_store(book_id)
+    return [h for h in (store or {}).get("highlights", []) if isinstance(h, dict)]
+
+
+def _save_store(book_id: int, highlights: List[Dict[str, Any]], high_water_mark: Optional[str]) -> None:
+    write_json_atomic(
+        _store_path(book_id),
+        {
+            "book_id": int(book_id),
+            "synced_at": iso_now(),
+            "high_water_mark": high_water_mark,
+            "highlights": highlights,
+        },
+    )
+
+
+def merge_highlights(existing: List[Dict[str, Any]], updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Apply exported changes by highlight id: edits replace, `is_deleted` removes, new ones append.
+    """
+    by_id: Dict[Any, Dict[str, Any]] = {}
+    for h in existing:
+        if isinstance(h, dict):
+            by_id[h.get("id")] = h
+    for h in updates:
+        if not isinstance(h, dict):
+            continue
+        if h.get("is_deleted"):
+            by_id.pop(h.get("id"), None)
+            continue
+        by_id[h.get("id")] = h
+    return list(by_id.values())
+
+
+def _plan_sync(
+    book_ids: Iterable[int], full_refresh: bool
+) -> Tuple[List[int], List[int], Optional[str], Dict[int, Dict[str, Any]]]:
+    """
+    Split books into those needing a full export and those that can be delta-synced.
+    Delta books share one sweep starting at the oldest of their high-water marks; merging by
+    id makes re-applying a few already-seen changes harmless.
+    """
+    full_ids: List[int] = []
+    delta_ids: List[int] = []
+    stores: Dict[int, Dict[str, Any]] = {}
+    since: Optional[str] = None
+    since_dt: Optional[datetime] = None
+    for book_id in dict.fromkeys(int(b) for b in book_ids):
+        store = None if full_refresh else load_store(book_id)
+        mark = (store or {}).get("high_water_mark")
+        mark_dt = parse_iso_datetime(mark) if isinstance(mark, str) else None
+        if not store or mark_dt is None:
+            full_ids.append(book_id)
+            continue
+        stores[book_id] = store
+        delta_ids.append(book_id)
+        if since_dt is None or mark_dt < since_dt:
+            since, since_dt = mark, mark_dt
+    return full_ids, delta_ids, since, stores
+
+
+def _apply_sync(
+    *,
+    full: Dict[int, List[Dict[str, Any]]],
+    delta: Dict[int, List[Dict[str, Any]]],
+    stores: Dict[int, Dict[str, Any]],
+) -> Dict[int, List[Dict[str, Any]]]:
+    by_book: Dict[int, List[Dict[str, Any]]] = {}
+    for book_id, highlights in full.items():
+        merged = merge_highlights([], highlights)
+        _save_store(book_id, merged, latest_timestamp(highlights, "updated_at"))
+        by_book[book_id] = merged
+    for book_id, store in stores.items():
+        updates = delta.get(book_id) or []
+        if not updates:
+            by_book[book_id] = [h for h in store.get("highlights") or [] if isinstance(h, dict)]
+            continue
+        merged = merge_highlights(store.get("highlights") or [], updates)
+        mark = latest_timestamp(updates + [{"updated_at": store.get("high_water_mark")}], "updated_at")
+        _save_store(book_id, merged, mark)
+        by_book[book_id] = merged
+    return by_book
+
+
+def sync_highlights_for_book_ids(
+    *,
+    token: str,
+    book_ids: Iterable[int],
+    full_refresh: bool = False,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Bring the local per-book highlight store up to date and return its contents.
+    Books already in the store only ask the export endpoint for highlights updated after
+    their last sync.
+    """
+    full_ids, delta_ids, since, stores = _plan_sync(book_ids, full_refresh)
+    full = export_highlights_for_book_ids(token=token, book_ids=full_ids) if full_ids else {}
+    delta = export_highlights_for_book_ids(token=token, book_ids=delta_ids, updated_after=since) if delta_ids else {}
+    return _apply_sync(full=full, delta=delta, stores=stores)
+
+
+def sync_highlights_for_book_id(*, token: str, book_id: int, full_refresh: bool = False) -> List[Dict[str, Any]]:
+    return sync_highlights_for_book_ids(token=token, book_ids=[book_id], full_refresh=full_refresh).get(int(book_id), [])
+
+
+async def sync_highlights_for_book_ids_async(
+    *,
+    engine: AsyncEngine,
+    book_ids: Iterable[int],
+    full_refresh: bool = False,
+) -> Dict[int, List[Dict[str, Any]]]:
+    full_ids, delta_ids, since, stores = _plan_sync(book_ids, full_refresh)
+    full = await export_highlights_for_book_ids_async(engine=engine, book_ids=full_ids) if full_ids else {}
+    delta = (
+        await export_highlights_for_book_ids_async(engine=engine, book_ids=delta_ids, updated_after=since)
+        if delta_ids
+        else {}
+    )
+    return _apply_sync(full=full, delta=delta, stores=stores)
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, Generator, List, Optional, Protocol, Tuple
+
+
+# Decoded string pieces are batched up to this many characters before reaching a sink.
+SINK_BATCH_CHARS = 64 * 1024
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+# Characters that can continue a JSON number (`0.` / `1e` / `-` are valid-looking prefixes).
+_NUMBER_TAIL_RE = re.compile(r"[0-9.eE+\-]*")
+_WHITESPACE = " \t\n\r"
+
+_Step = Generator[None, None, Any]
+
+
+class TextSink(Protocol):
+    def feed(self, text: str) -> None: ...
+
+    def close(self) -> Any: ...
+
+
+class PayloadDecoder(Protocol):
+    """
+    What `transport.stream_json` needs: bytes in as they arrive (from the network, or from a
+    cache or cassette entry on disk), the payload out at the end.
+    """
+
+    def feed(self, data: bytes) -> None: ...
+
+    def close(self) -> Dict[str, Any]: ...
+
+
+class ReaderPayloadDecoder:
+    """
+    Incremental decoder for a Reader list response (`{"results": [doc, ...], ...}`).
+
+    Bytes are pushed in with `feed` as they arrive. Each document's `html_content` string is
+    decoded straight into a fresh sink from `html_sink` and replaced by the sink's `close()`
+    result, so the full HTML is never held as one string; every other value is small and is
+    decoded with `json` as usual. `close` returns the payload.
+    """
+
+    def __init__(self, *, html_sink: Callable[[], TextSink]) -> None:
+        self._html_sink = html_sink
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._eof = False
+        self._result: Optional[Dict[str, Any]] = None
+        self._done = False
+        self._steps = self._payload()
+        next(self._steps)
+
+    def feed(self, data: bytes) -> None:
+        text = self._decoder.decode(data)
+        if text:
+            self._pending.append(text)
+            self._pending_chars += len(text)
+            self._resume()
+
+    def close(self) -> Dict[str, Any]:
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            self._pending.append(tail)
+            self._pending_chars += len(tail)
+        self._eof = True
+        self._resume()
+        if not self._done:
+            raise ValueError("Truncated JSON response.")
+        return self._result  # type: ignore[return-value]
+
+    def _resume(self) -> None:
+        if self._done:
+            return
+        try:
+            self._steps.send(None)
+        except StopIteration:
+            self._done = True
+
+    # Buffer management: the parser below yields whenever it needs more input.
+
+    def _available(self) -> int:
+        return len(self._buf) - self._pos + self._pending_chars
+
+    def _more(self, at_least: int) -> _Step:
+        """
+        Wait until `at_least` characters are buffered past the cursor (or the input ended).
+        """
+        while self._available() < at_least and not self._eof:
+            yield
+        if self._pending:
+            self._buf = self._buf[self._pos :] + "".join(self._pending)
+            self._pos = 0
+            self._pending = []
+            self._pending_chars = 0
+
+    def _peek(self) -> _Step:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._eof and not self._pending:
+                return ""
+            yield from self._more(1)
+
+    def _expect(self, char: str) -> _Step:
+        found = yield from self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at character {self._pos}, got {found!r}.")
+        self._pos += 1
+
+    def _value(self) -> _Step:
+        yield from self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._eof and not self._pending:
+                    raise
+            else:
+                # A number followed only by number characters may continue in the next chunk.
+                at_eof = self._eof and not self._pending
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if at_eof or not is_number or _NUMBER_TAIL_RE.match(self._buf, end).end() < len(self._buf):
+                    self._pos = end
+                    return value
+            # Grow geometrically, so a large value is re-parsed O(log n) times, not per chunk.
+            remaining = len(self._buf) - self._pos
+            yield from self._more(max(2 * remaining, remaining + 1))
+
+    def _object(self, member: Callable[[str], _Step]) -> _Step:
+        yield from self._expect("{")
+        out: Dict[str, Any] = {}
+        if (yield from self._peek()) == "}":
+            self._pos += 1
+            return out
+        while True:
+            key = yield from self._value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key at character {self._pos}.")
+            yield from self._expect(":")
+            out[key] = yield from member(key)
+            sep = yield from self._peek()
+            self._pos += 1
+            if sep == "}":
+                return out
+            if sep != ",":
+                raise ValueError(f"Expected ',' or '}}' at character {self._pos - 1}, got {sep!r}.")
+
+    def _array(self, item: Callable[[], _Step]) -> _Step:
+        yield from self._expect("[")
+        out: List[Any] = []
+        if (yield from self._peek()) == "]":
+            self._pos += 1
+            return out
+        while True:
+            out.append((yield from item()))
+            sep = yield from self._peek()
+            self._pos += 1
+            if sep == "]":
+                return out
+            if sep != ",":
+                raise ValueError(f"Expected ',' or ']' at character {self._pos - 1}, got {sep!r}.")
+
+    # Reader payload shape
+
+    def _payload(self) -> _Step:
+        yield
+        if (yield from self._peek()) == "{":
+            payload = yield from self._object(self._payload_member)
+        else:
+            payload = yield from self._value()
+        if (yield from self._peek()) != "":
+            raise ValueError(f"Extra data at character {self._pos}.")
+        self._result = payload if isinstance(payload, dict) else {"results": payload}
+
+    def _payload_member(self, key: str) -> _Step:
+        if key == "results" and (yield from self._peek()) == "[":
+            return (yield from self._array(self._document))
+        return (yield from self._value())
+
+    def _document(self) -> _Step:
+        if (yield from self._peek()) == "{":
+            return (yield from self._object(self._document_member))
+        return (yield from self._value())
+
+    def _document_member(self, key: str) -> _Step:
+        if key == "html_content" and (yield from self._peek()) == '"':
+            return (yield from self._string_into_sink())
+        return (yield from self._value())
+
+    def _string_into_sink(self) -> _Step:
+        self._pos += 1  # opening quote
+        sink = self._html_sink()
+        parts: List[str] = []
+        size = 0
+        while True:
+            match = _STRING_SPECIAL_RE.search(self._buf, self._pos)
+            end = match.start() if match else len(self._buf)
+            if end > self._pos:
+                parts.append(self._buf[self._pos : end])
+                size += end - self._pos
+                self._pos = end
+            if size >= SINK_BATCH_CHARS:
+                sink.feed("".join(parts))
+                parts, size = [], 0
+            if match is None:
+                if self._eof and not self._pending:
+                    raise ValueError("Unterminated string in JSON response.")
+                yield from self._more(1)
+                continue
+            if match.group() == '"':
+                self._pos += 1
+                if parts:
+                    sink.feed("".join(parts))
+                return sink.close()
+            # Longest escape is a surrogate pair: \uXXXX\uXXXX.
+            yield from self._more(12)
+            text, consumed = self._escape(self._buf, self._pos)
+            parts.append(text)
+            size += len(text)
+            self._pos += consumed
+
+    @staticmethod
+    def _escape(buf: str, pos: int) -> Tuple[str, int]:
+        kind = buf[pos + 1 : pos + 2]
+        if kind in _ESCAPES:
+            return _ESCAPES[kind], 2
+        if kind != "u" or len(buf) < pos + 6:
+            raise ValueError(f"Invalid escape at character {pos}.")
+        code = int(buf[pos + 2 : pos + 6], 16)
+        if 0xD800 <= code < 0xDC00 and buf[pos + 6 : pos + 8] == "\\u":
+            low = int(buf[pos + 8 : pos + 12], 16)
+            if 0xDC00 <= low < 0xE000:
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+        return chr(code), 6
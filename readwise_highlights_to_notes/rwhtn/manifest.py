@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from rwhtn.config import cache_dir, ensure_dir, iso_now, latest_timestamp, parse_iso_datetime, write_json_atomic
+from rwhtn.templates import load_note_template
+
+
+# Bump when rendering changes enough that existing notes should be regenerated.
+MANIFEST_VERSION = 6
+
+
+def _manifest_path(slug: str) -> str:
+    return os.path.join(ensure_dir(cache_dir("manifests")), f"{slug}.json")
+
+
+def source_fingerprint(
+    *,
+    reader_doc_id: str,
+    reader_updated_at: str,
+    book_id: int,
+    book: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Everything a note depends on that can be known without a per-document request:
+    the Reader doc's `updated_at` (from the listing), the book's catalog timestamps and, when
+    notes use a custom template, that template's fragments.
+    """
+    fingerprint = {
+        "version": MANIFEST_VERSION,
+        "reader_doc_id": reader_doc_id,
+        "reader_updated_at": reader_updated_at,
+        "book_id": int(book_id),
+        "book_updated": ((book or {}).get("updated") or ""),
+        "book_last_highlight_at": ((book or {}).get("last_highlight_at") or ""),
+    }
+    # Only recorded for custom templates, so built-in notes keep matching older manifests.
+    template = load_note_template().fingerprint
+    if template:
+        fingerprint["template"] = template
+    return fingerprint
+
+
+def exported_book_state(book: Optional[Dict[str, Any]], highlights: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    `book` as the note rendered from `highlights` reflects it, for `source_fingerprint`: the
+    catalog's `last_highlight_at` is kept only if the export has a highlight at least that
+    recent. Otherwise the export's own latest is recorded, which never matches the catalog,
+    so a note rendered from a lagging export is regenerated instead of skipped for good.
+    """
+    state = dict(book or {})
+    exported = latest_timestamp(highlights, "updated_at")
+    catalog_dt = parse_iso_datetime(state.get("last_highlight_at") or "")
+    exported_dt = parse_iso_datetime(exported or "")
+    if catalog_dt is not None and (exported_dt is None or exported_dt < catalog_dt):
+        state["last_highlight_at"] = exported or ""
+    return state
+
+
+def load_note_manifest(slug: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_manifest_path(slug), "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def write_note_manifest(
+    slug: str,
+    *,
+    note_path: str,
+    fingerprint: Dict[str, Any],
+    highlight_ids: Optional[List[Any]] = None,
+) -> None:
+    payload: Dict[str, Any] = {"note_path": note_path, "generated_at": iso_now(), "source": fingerprint}
+    if highlight_ids is not None:
+        payload["highlight_ids"] = highlight_ids
+    write_json_atomic(_manifest_path(slug), payload)
+
+
+def rendered_highlight_ids(slug: str, *, note_path: str) -> Optional[List[Any]]:
+    """
+    Ids of the highlights already written to the note at `note_path`, or None when that is
+    unknown (no note, no manifest, or a manifest from before ids were recorded).
+    """
+    if not os.path.exists(note_path):
+        return None
+    manifest = load_note_manifest(slug)
+    if not manifest or manifest.get("note_path") != note_path:
+        return None
+    ids = manifest.get("highlight_ids")
+    return ids if isinstance(ids, list) else None
+
+
+def manifest_matches(slug: str, *, note_path: str, fingerprint: Dict[str, Any]) -> bool:
+    if not fingerprint.get("reader_updated_at") or not os.path.exists(note_path):
+        return False
+    manifest = load_note_manifest(slug)
+    if not manifest or manifest.get("note_path") != note_path:
+        return False
+    return manifest.get("source") == fingerprint
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from rwhtn.anchoring import anchor_tokens
+from rwhtn.transform import is_image_only_highlight, strip_markdown
+
+
+KEEP_POLICIES = ("longest", "first")
+
+# Word shingles; highlights shorter than this are a single shingle (their whole text).
+SHINGLE_WORDS = 3
+# Signature length, one row per band. Pairs are judged by containment, and a short highlight
+# inside a long one has a low Jaccard similarity s (12 words in 60: ~0.17); single-row bands
+# still catch it with probability 1 - (1 - s)^64 (~100% there). Candidates are verified
+# exactly, so the bands only need to be generous.
+SIGNATURE_BITS = 6
+LSH_ROWS = 1
+LSH_BANDS = (1 << SIGNATURE_BITS) // LSH_ROWS
+
+# Near-duplicates must also sit together in the book: spans that overlap or are at most this
+# far apart (anchored spans in words, `offset` locations in characters, other locations such
+# as pages in units), so a refrain or a "Summary" repeated in two chapters is kept twice.
+ADJACENT_WORDS = 8
+ADJACENT_CHARS = 64
+ADJACENT_LOCATIONS = 1
+
+# (kind, start, end): "anchor" for token positions in the HTML stream, else the location type.
+Span = Tuple[str, int, int]
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# Fixed hash parameters: the same highlights always cluster the same way.
+_HASH_A = 0x1F3D5B79A2C4E6F1 % _MERSENNE_PRIME
+_HASH_B = 0x5DEECE66D
+# Offset that keeps values borrowed by empty bins apart from the bin's own values.
+_ROTATION_STEP = 1 << (61 - SIGNATURE_BITS)
+
+
+@dataclass(frozen=True)
+class NearDuplicateSettings:
+    threshold: float = 0.8  # containment of word shingles (see `containment`); 0 disables near-duplicate removal
+    keep: str = "longest"
+
+
+_settings = NearDuplicateSettings()
+
+
+def configure_near_duplicates(*, threshold: Optional[float] = None, keep: Optional[str] = None) -> NearDuplicateSettings:
+    global _settings
+    if keep is not None and keep not in KEEP_POLICIES:
+        raise ValueError(f"Invalid keep policy {keep!r}; expected one of {KEEP_POLICIES}.")
+    if threshold is not None and not 0 <= threshold <= 1:
+        raise ValueError(f"Near-duplicate threshold must be between 0 and 1, got {threshold}.")
+    _settings = replace(
+        _settings,
+        threshold=_settings.threshold if threshold is None else float(threshold),
+        keep=_settings.keep if keep is None else keep,
+    )
+    return _settings
+
+
+def near_duplicate_settings() -> NearDuplicateSettings:
+    return _settings
+
+
+def shingles(text: str) -> Set[int]:
+    tokens = anchor_tokens(strip_markdown(text))
+    if len(tokens) < SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))} if tokens else set()
+    return {
+        zlib.crc32(" ".join(tokens[i : i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(tokens) - SHINGLE_WORDS + 1)
+    }
+
+
+def minhash(shingle_set: Set[int]) -> List[int]:
+    """
+    One-permutation MinHash: each shingle is hashed once and lands in one of 64 bins by its low
+    bits, keeping the minimum per bin; empty bins borrow from the next non-empty bin
+    (densification by rotation). Collision probability per position is still the Jaccard
+    similarity, at a fraction of the cost of 64 separate permutations.
+    """
+    size = 1 << SIGNATURE_BITS
+    mask = size - 1
+    bins: List[Optional[int]] = [None] * size
+    for x in shingle_set:
+        h = (_HASH_A * x + _HASH_B) % _MERSENNE_PRIME
+        j = h & mask
+        v = h >> SIGNATURE_BITS
+        current = bins[j]
+        if current is None or v < current:
+            bins[j] = v
+    signature = [0] * size
+    if not shingle_set:
+        return signature
+    # Walk the circle backwards twice, tracking the nearest non-empty bin at or after each bin.
+    nearest = 0
+    for k in range(2 * size - 1, -1, -1):
+        if bins[k & mask] is not None:
+            nearest = k
+        if k < size:
+            signature[k] = bins[nearest & mask] + (nearest - k) * _ROTATION_STEP  # type: ignore[operator]
+    return signature
+
+
+def containment(a: Set[int], b: Set[int]) -> float:
+    """
+    Share of the smaller set found in the other: 1.0 when one highlight's text lies inside
+    the other's, however much longer the other is.
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def anchor_span(h: Dict[str, Any], position: Optional[int]) -> Optional[Span]:
+    """
+    Tokens of the HTML stream a highlight covers, from its anchor position (see
+    `transform.anchor_highlights`); None if it has none.
+    """
+    if position is None or position < 0:
+        return None
+    return ("anchor", position, position + len(anchor_tokens(strip_markdown(h.get("text") or ""))))
+
+
+def location_span(h: Dict[str, Any]) -> Optional[Span]:
+    """
+    `location`..`end_location` in the highlight's location units; without an end, an `offset`
+    highlight is taken to run for its text's length. None if it has no location.
+    """
+    try:
+        start = int(h.get("location"))
+    except Exception:
+        return None
+    if start <= 0:
+        return None
+    kind = h.get("location_type") or ""
+    try:
+        end = int(h.get("end_location"))
+    except Exception:
+        end = start + len(h.get("text") or "") if kind == "offset" else start
+    return (kind, start, max(start, end))
+
+
+def spans_touch(a: Optional[Span], b: Optional[Span]) -> bool:
+    if a is None or b is None or a[0] != b[0]:
+        return False
+    slack = {"anchor": ADJACENT_WORDS, "offset": ADJACENT_CHARS}.get(a[0], ADJACENT_LOCATIONS)
+    return b[1] <= a[2] + slack and a[1] <= b[2] + slack
+
+
+class _DisjointSets:
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def near_duplicate_clusters(
+    texts: List[str],
+    *,
+    threshold: float,
+    together: Optional[Callable[[int, int], bool]] = None,
+) -> List[List[int]]:
+    """
+    Groups (indices, ascending) of texts whose shingle sets reach `threshold` containment,
+    directly or through a chain of such pairs; with `together`, only pairs it accepts count.
+    Only groups of two or more are returned.
+
+    Candidate pairs come from MinHash LSH buckets, so the cost grows with the number of texts
+    and of similar pairs rather than with every pair; each candidate is verified exactly.
+    """
+    sets = [shingles(t) for t in texts]
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    for i, s in enumerate(sets):
+        if not s:
+            continue
+        signature = minhash(s)
+        for band in range(LSH_BANDS):
+            key = (band, tuple(signature[band * LSH_ROWS : (band + 1) * LSH_ROWS]))
+            buckets.setdefault(key, []).append(i)
+
+    clusters = _DisjointSets(len(texts))
+    checked: Set[Tuple[int, int]] = set()
+    for members in buckets.values():
+        for x in range(1, len(members)):
+            j = members[x]
+            for i in members[:x]:
+                if clusters.find(i) == clusters.find(j) or (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if together is not None and not together(i, j):
+                    continue
+                if containment(sets[i], sets[j]) >= threshold:
+                    clusters.union(i, j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(clusters.find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def dedupe_near_duplicate_highlights(
+    highlights: List[Dict[str, Any]],
+    *,
+    threshold: Optional[float] = None,
+    keep: Optional[str] = None,
+    positions: Optional[Sequence[Optional[int]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Drop overlapping or re-highlighted passages, keeping one highlight per near-duplicate group
+    (the longest text by default, or the first in order) at its own place in the order.
+
+    Two highlights only count as near-duplicates where they overlap or are adjacent: by their
+    anchored spans when both have an anchor `positions` entry, else by their locations. Ones
+    with neither are never merged. Image-only highlights are left to the exact dedupe.
+    """
+    threshold = _settings.threshold if threshold is None else threshold
+    keep = _settings.keep if keep is None else keep
+    if threshold <= 0 or len(highlights) < 2:
+        return list(highlights)
+
+    candidates = [
+        i
+        for i, h in enumerate(highlights)
+        if isinstance(h.get("text"), str) and h["text"].strip() and not is_image_only_highlight(h["text"])
+    ]
+    texts = [highlights[i]["text"] for i in candidates]
+    anchors = [anchor_span(highlights[i], positions[i] if positions else None) for i in candidates]
+    locations = [location_span(highlights[i]) for i in candidates]
+
+    def together(x: int, y: int) -> bool:
+        if anchors[x] is not None and anchors[y] is not None:
+            return spans_touch(anchors[x], anchors[y])
+        return spans_touch(locations[x], locations[y])
+
+    dropped: Set[int] = set()
+    for group in near_duplicate_clusters(texts, threshold=threshold, together=together):
+        if keep == "longest":
+            # Ties go to the earlier highlight.
+            winner = max(group, key=lambda g: (len(" ".join(texts[g].split())), -g))
+        else:
+            winner = group[0]
+        dropped.update(candidates[g] for g in group if g != winner)
+    return [h for i, h in enumerate(highlights) if i not in dropped]
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import os
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from rwhtn.config import (
     FINAL_NOTES_DIR,
@@ -13,10 +14,31 @@ from rwhtn.config import (
     slugify,
     write_json,
 )
-from rwhtn.reader_api import fetch_reader_document, fetch_reader_documents
-from rwhtn.readwise_api import book_by_id, export_highlights_for_book_id, fetch_all_books, resolve_book_id_for_source_url
-from rwhtn.render import render_markdown_note
-from rwhtn.transform import build_html_stream, dedupe_exact_highlights_in_place_order, extract_headings_from_html, sort_highlights_in_read_order
+from rwhtn.async_api import (
+    AsyncEngine,
+    aiter_reader_document_pages,
+    fetch_reader_document_async,
+    fetch_reader_documents_async,
+    sync_books_catalog_async,
+)
+from rwhtn.near_dupes import dedupe_near_duplicate_highlights
+from rwhtn.manifest import (
+    exported_book_state,
+    manifest_matches,
+    rendered_highlight_ids,
+    source_fingerprint,
+    write_note_manifest,
+)
+from rwhtn.outline_cache import DocOutline, load_outline, outline_from_reader_doc, save_outline
+from rwhtn.highlight_store import sync_highlights_for_book_id, sync_highlights_for_book_ids, sync_highlights_for_book_ids_async
+from rwhtn.reader_api import fetch_reader_document, fetch_reader_documents, iter_reader_document_pages
+from rwhtn.catalog_store import SqliteBookCatalog
+from rwhtn.resolution import BookResolver
+from rwhtn.readwise_api import sync_books_catalog
+from rwhtn.render import render_markdown_note, update_markdown_note
+from rwhtn.title_index import AMBIGUITY_MARGIN, DEFAULT_MATCH_THRESHOLD, TitleIndex, TitleMatch
+from rwhtn.sections import SectionTree
+from rwhtn.transform import HtmlAnalysisStream, dedupe_exact_highlights_in_place_order, place_highlights_in_read_order
 
 
 @dataclass(frozen=True)
@@ -24,40 +46,61 @@ class TargetDoc:
     reader_doc_id: str
     title: str
     source_url: str
+    updated_at: str = ""
+
+
+def target_from_shortlist_doc(d: Dict[str, Any]) -> TargetDoc:
+    return TargetDoc(
+        reader_doc_id=(d.get("id") or "").strip(),
+        title=(d.get("title") or "").strip(),
+        source_url=(d.get("source_url") or "").strip(),
+        updated_at=(d.get("updated_at") or "").strip(),
+    )
 
 
-def find_shortlist_docs_by_queries(shortlist: List[Dict[str, Any]], queries: List[str]) -> Tuple[List[TargetDoc], List[str]]:
+def _describe_matches(header: str, matches: List[TitleMatch]) -> str:
+    lines = [header]
+    for m in matches:
+        t = target_from_shortlist_doc(m.doc)
+        confidence = "" if m.substring else f" ({m.score:.0%} match)"
+        lines.append(f"- {t.title} | {t.source_url} | id={t.reader_doc_id}{confidence}")
+    return "\n".join(lines)
+
+
+def find_shortlist_docs_by_queries(
+    shortlist: List[Dict[str, Any]],
+    queries: List[str],
+    *,
+    threshold: float = DEFAULT_MATCH_THRESHOLD,
+) -> Tuple[List[TargetDoc], List[str]]:
+    """
+    Resolve title queries against a trigram index of the Shortlist. A query containing a
+    unique title substring (or equal to one full title) wins outright; otherwise the best fuzzy
+    match wins if it clears `threshold` and leads the runner-up by `AMBIGUITY_MARGIN`.
+    """
+    index = TitleIndex(shortlist)
     targets: List[TargetDoc] = []
     errors: List[str] = []
 
     for query in queries:
-        q = (query or "").strip().lower()
-        if not q:
+        if not (query or "").strip():
             continue
-        matches: List[TargetDoc] = []
-        for d in shortlist:
-            title = (d.get("title") or "").strip()
-            if not title or q not in title.lower():
-                continue
-            matches.append(
-                TargetDoc(
-                    reader_doc_id=(d.get("id") or "").strip(),
-                    title=title,
-                    source_url=(d.get("source_url") or "").strip(),
-                )
-            )
+        matches = index.search(query, threshold=threshold)
 
         if not matches:
-            errors.append(f"No Shortlist matches for title containing: {query!r}")
+            errors.append(f"No Shortlist matches for title containing (or resembling): {query!r}")
             continue
-        if len(matches) > 1:
-            lines = [f"Ambiguous title query {query!r}; matches:"]
-            for m in matches:
-                lines.append(f"- {m.title} | {m.source_url} | id={m.reader_doc_id}")
-            errors.append("\n".join(lines))
+        if len(matches) > 1 and matches[0].substring:
+            full = [m for m in matches if m.full]
+            if len(full) != 1:
+                errors.append(_describe_matches(f"Ambiguous title query {query!r}; matches:", matches))
+                continue
+            matches = full
+        elif len(matches) > 1 and matches[0].score - matches[1].score < AMBIGUITY_MARGIN:
+            errors.append(_describe_matches(f"Ambiguous title query {query!r}; closest matches:", matches[:5]))
             continue
 
-        targets.append(matches[0])
+        targets.append(target_from_shortlist_doc(matches[0].doc))
 
     return targets, errors
 
@@ -95,43 +138,169 @@ def frontmatter_for(
     }
 
 
+def note_path_for(target: TargetDoc) -> Tuple[str, str]:
+    slug = slugify(target.title)
+    return slug, os.path.join(ensure_dir(FINAL_NOTES_DIR), f"{slug}.md")
+
+
+def up_to_date_note_path(
+    target: TargetDoc,
+    resolver: BookResolver,
+    *,
+    skip_existing: bool,
+    skip_unchanged: bool,
+) -> Optional[str]:
+    """
+    Decide, without any network call, whether a target's note can be left alone.
+    Returns the existing note path if so.
+    """
+    slug, out_path = note_path_for(target)
+    if skip_existing and os.path.exists(out_path):
+        return out_path
+    if not skip_unchanged:
+        return None
+    book_id = resolver.resolve(target.reader_doc_id, target.source_url, target.title)
+    if book_id is None:
+        return None
+    fingerprint = source_fingerprint(
+        reader_doc_id=target.reader_doc_id,
+        reader_updated_at=target.updated_at,
+        book_id=book_id,
+        book=resolver.current_book(book_id),
+    )
+    return out_path if manifest_matches(slug, note_path=out_path, fingerprint=fingerprint) else None
+
+
 def make_note_for_doc(
     *,
     token: str,
     target: TargetDoc,
-    books: List[Dict[str, Any]],
+    resolver: BookResolver,
     debug: bool,
     skip_existing: bool,
+    prefetched_highlights: Optional[Dict[int, List[Dict[str, Any]]]] = None,
+    refresh_highlights: bool = False,
+    skip_unchanged: bool = False,
+    incremental: bool = False,
 ) -> Tuple[Optional[str], Optional[str]]:
-    reader_doc = fetch_reader_document(token=token, document_id=target.reader_doc_id, with_html_content=True)
-    if not reader_doc:
-        return None, f"Failed to fetch reader doc: {target.reader_doc_id}"
+    existing = up_to_date_note_path(target, resolver, skip_existing=skip_existing, skip_unchanged=skip_unchanged)
+    if existing:
+        return existing, None
 
-    book_id = resolve_book_id_for_source_url(books, target.source_url, target.title)
+    book_id = resolver.resolve(target.reader_doc_id, target.source_url, target.title)
     if book_id is None:
         return None, (
             "Could not resolve a Readwise book/article id for this Shortlist item "
             f"(title={target.title!r}, source_url={target.source_url!r})."
         )
 
-    raw_highlights = export_highlights_for_book_id(token=token, book_id=book_id)
+    outline = fetch_outline(token=token, target=target)
+    if outline is None:
+        return None, f"Failed to fetch reader doc: {target.reader_doc_id}"
+
+    if prefetched_highlights is not None and book_id in prefetched_highlights:
+        raw_highlights = prefetched_highlights[book_id]
+    else:
+        raw_highlights = sync_highlights_for_book_id(token=token, book_id=book_id, full_refresh=refresh_highlights)
+
+    return write_note_for_doc(
+        target=target,
+        outline=outline,
+        book_id=book_id,
+        resolver=resolver,
+        raw_highlights=raw_highlights,
+        debug=debug,
+        skip_existing=skip_existing,
+        incremental=incremental,
+    )
+
 
-    html = reader_doc.get("html_content") or ""
-    html = html if isinstance(html, str) else ""
-    headings = extract_headings_from_html(html)
-    html_stream = build_html_stream(html)
+def fetch_outline(*, token: str, target: TargetDoc) -> Optional[DocOutline]:
+    """
+    Headings + image-anchor stream for a Reader doc, re-downloading its HTML only when the
+    doc's `updated_at` no longer matches the cached outline.
+    """
+    updated_at = target.updated_at
+    if not updated_at:
+        meta = fetch_reader_document(token=token, document_id=target.reader_doc_id, with_html_content=False)
+        if not meta:
+            return None
+        updated_at = (meta.get("updated_at") or "").strip()
+
+    cached = load_outline(target.reader_doc_id, updated_at)
+    if cached is not None:
+        return cached
+
+    reader_doc = fetch_reader_document(
+        token=token, document_id=target.reader_doc_id, with_html_content=True, html_sink=HtmlAnalysisStream
+    )
+    if not reader_doc:
+        return None
+    outline = outline_from_reader_doc(reader_doc)
+    save_outline(outline)
+    return outline
 
-    highlights = sort_highlights_in_read_order(raw_highlights, html_stream)
-    highlights = dedupe_exact_highlights_in_place_order(highlights)
+
+def resolve_book_ids_for_targets(targets: List[TargetDoc], resolver: BookResolver) -> List[int]:
+    book_ids: List[int] = []
+    for t in targets:
+        book_id = resolver.resolve(t.reader_doc_id, t.source_url, t.title)
+        if book_id is not None:
+            book_ids.append(book_id)
+    return book_ids
+
+
+def prefetch_highlights_for_targets(
+    *,
+    token: str,
+    targets: List[TargetDoc],
+    resolver: BookResolver,
+    refresh_highlights: bool = False,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Resolve every target's book id up front and sync all their highlights in bulk.
+    """
+    return sync_highlights_for_book_ids(
+        token=token,
+        book_ids=resolve_book_ids_for_targets(targets, resolver),
+        full_refresh=refresh_highlights,
+    )
+
+
+def write_note_for_doc(
+    *,
+    target: TargetDoc,
+    outline: DocOutline,
+    book_id: int,
+    resolver: BookResolver,
+    raw_highlights: List[Dict[str, Any]],
+    debug: bool,
+    skip_existing: bool,
+    incremental: bool = False,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Sort, dedupe and render a doc's highlights into its note. With `incremental`, an existing
+    note whose manifest lists the highlights already in it only gets the new highlights
+    inserted (`update_markdown_note`), keeping the user's edits; otherwise it is re-rendered.
+    """
+    reader_doc = outline.reader_doc
+    headings = outline.headings
+    html_stream = outline.html_stream
+
+    placed = place_highlights_in_read_order(raw_highlights, html_stream)
+    position_of = {id(h): pos for pos, h in placed}
+    highlights = dedupe_exact_highlights_in_place_order([h for _, h in placed])
+    highlights = dedupe_near_duplicate_highlights(highlights, positions=[position_of[id(h)] for h in highlights])
+    section_tree = SectionTree.build(headings, outline.heading_offsets, html_stream)
+    section_of = {id(h): section_tree.section_at(pos) for pos, h in placed}
+    highlight_sections = [section_of[id(h)] for h in highlights]
 
     cover_image_url = (reader_doc.get("image_url") or "").strip()
-    book = book_by_id(books, book_id)
+    book = resolver.book_by_id(book_id, reader_doc_id=target.reader_doc_id)
     if not cover_image_url and book:
         cover_image_url = (book.get("cover_image_url") or "").strip()
 
-    out_dir = ensure_dir(FINAL_NOTES_DIR)
-    slug = slugify(target.title)
-    out_path = os.path.join(out_dir, f"{slug}.md")
+    slug, out_path = note_path_for(target)
 
     if skip_existing and os.path.exists(out_path):
         return out_path, None
@@ -139,7 +308,10 @@ def make_note_for_doc(
     if debug:
         dp = debug_paths_for_slug(slug)
         write_json(dp.reader_doc_json, reader_doc)
-        write_json(dp.headings_json, {"headings": headings, "html_stream": html_stream})
+        write_json(
+            dp.headings_json,
+            {"headings": headings, "heading_offsets": outline.heading_offsets, "html_stream": html_stream},
+        )
         write_json(dp.highlights_raw_json, raw_highlights)
         write_json(dp.highlights_sorted_json, highlights)
 
@@ -151,25 +323,347 @@ def make_note_for_doc(
         cover_image_url=cover_image_url,
     )
 
-    render_markdown_note(
-        path=out_path,
-        title=target.title,
-        source_url=target.source_url,
-        cover_image_url=cover_image_url,
-        frontmatter=frontmatter,
-        highlights=highlights,
-        headings=headings,
+    highlight_ids = [h["id"] for h in highlights if h.get("id") is not None]
+    rendered_ids = rendered_highlight_ids(slug, note_path=out_path) if incremental else None
+    if rendered_ids is not None:
+        update_markdown_note(
+            path=out_path,
+            title=target.title,
+            highlights=highlights,
+            headings=headings,
+            rendered_ids=set(rendered_ids),
+            section_tree=section_tree,
+            highlight_sections=highlight_sections,
+        )
+        # Ids of highlights deleted since stay listed: their text may still be in the note.
+        known = set(rendered_ids)
+        highlight_ids = rendered_ids + [i for i in highlight_ids if i not in known]
+    else:
+        render_markdown_note(
+            path=out_path,
+            title=target.title,
+            source_url=target.source_url,
+            cover_image_url=cover_image_url,
+            frontmatter=frontmatter,
+            highlights=highlights,
+            headings=headings,
+            section_tree=section_tree,
+            highlight_sections=highlight_sections,
+        )
+
+    write_note_manifest(
+        slug,
+        note_path=out_path,
+        fingerprint=source_fingerprint(
+            reader_doc_id=target.reader_doc_id,
+            reader_updated_at=(reader_doc.get("updated_at") or "").strip(),
+            book_id=book_id,
+            book=exported_book_state(book, raw_highlights),
+        ),
+        highlight_ids=highlight_ids,
     )
 
     return out_path, None
 
 
-def load_shortlist_and_books(*, token: str, top_level_only: bool) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    shortlist = fetch_reader_documents(
+def load_shortlist(*, token: str, top_level_only: bool) -> List[Dict[str, Any]]:
+    return fetch_reader_documents(
         token=token,
         location="shortlist",
         with_html_content=False,
         top_level_only=top_level_only,
     )
-    books = fetch_all_books(token=token, use_cache=True)
-    return shortlist, books
+
+
+def book_resolver(*, token: str, refresh_books: bool = False, catalog_max_age_seconds: int = 60 * 60) -> BookResolver:
+    """
+    Resolver over `11_cache/resolution_map.json`; the books catalog is only synced and queried when
+    a doc needs the catalog (see `BookResolver`). A catalog synced less than
+    `catalog_max_age_seconds` ago is used as is; 0 always runs the (cheap) delta sync.
+    """
+
+    async def _load_async(engine: AsyncEngine) -> SqliteBookCatalog:
+        store = await sync_books_catalog_async(
+            engine=engine, cache_max_age_seconds=catalog_max_age_seconds, full_refresh=refresh_books
+        )
+        return SqliteBookCatalog(store)
+
+    def _load() -> SqliteBookCatalog:
+        store = sync_books_catalog(token=token, cache_max_age_seconds=catalog_max_age_seconds, full_refresh=refresh_books)
+        return SqliteBookCatalog(store)
+
+    return BookResolver(load_catalog=_load, load_catalog_async=_load_async)
+
+
+@dataclass(frozen=True)
+class ShortlistStream:
+    """
+    Page through the Shortlist during the run instead of listing it up front.
+    """
+
+    top_level_only: bool
+    limit: Optional[int] = None
+
+
+def _targets_from_page(page: List[Dict[str, Any]], remaining: Optional[int]) -> List[TargetDoc]:
+    batch = [t for t in (target_from_shortlist_doc(d) for d in page) if t.title]
+    return batch if remaining is None else batch[: max(0, remaining)]
+
+
+def iter_shortlist_target_batches(
+    *,
+    token: str,
+    top_level_only: bool,
+    limit: Optional[int] = None,
+) -> Iterator[List[TargetDoc]]:
+    """
+    One batch of targets per Shortlist page, yielded as each page arrives.
+    """
+    emitted = 0
+    for page in iter_reader_document_pages(
+        token=token,
+        location="shortlist",
+        with_html_content=False,
+        top_level_only=top_level_only,
+    ):
+        batch = _targets_from_page(page, None if limit is None else limit - emitted)
+        emitted += len(batch)
+        if batch:
+            yield batch
+        if limit is not None and emitted >= limit:
+            return
+
+
+def split_up_to_date(
+    batch: List[TargetDoc],
+    resolver: BookResolver,
+    *,
+    skip_existing: bool,
+    skip_unchanged: bool,
+) -> Tuple[List[Tuple[TargetDoc, str]], List[TargetDoc]]:
+    """
+    Settle up-to-date notes first so they cost no requests and stay out of the bulk export.
+    """
+    settled: List[Tuple[TargetDoc, str]] = []
+    pending: List[TargetDoc] = []
+    for t in batch:
+        existing = up_to_date_note_path(t, resolver, skip_existing=skip_existing, skip_unchanged=skip_unchanged)
+        if existing:
+            settled.append((t, existing))
+        else:
+            pending.append(t)
+    return settled, pending
+
+
+async def fetch_outline_async(*, engine: AsyncEngine, target: TargetDoc) -> Optional[DocOutline]:
+    updated_at = target.updated_at
+    if not updated_at:
+        meta = await fetch_reader_document_async(engine=engine, document_id=target.reader_doc_id, with_html_content=False)
+        if not meta:
+            return None
+        updated_at = (meta.get("updated_at") or "").strip()
+
+    cached = load_outline(target.reader_doc_id, updated_at)
+    if cached is not None:
+        return cached
+
+    reader_doc = await fetch_reader_document_async(
+        engine=engine, document_id=target.reader_doc_id, with_html_content=True, html_sink=HtmlAnalysisStream
+    )
+    if not reader_doc:
+        return None
+    outline = outline_from_reader_doc(reader_doc)
+    save_outline(outline)
+    return outline
+
+
+async def make_note_for_doc_async(
+    *,
+    engine: AsyncEngine,
+    target: TargetDoc,
+    resolver: BookResolver,
+    debug: bool,
+    skip_existing: bool,
+    prefetched_highlights: Optional[Dict[int, List[Dict[str, Any]]]] = None,
+    refresh_highlights: bool = False,
+    skip_unchanged: bool = False,
+    incremental: bool = False,
+) -> Tuple[Optional[str], Optional[str]]:
+    existing = up_to_date_note_path(target, resolver, skip_existing=skip_existing, skip_unchanged=skip_unchanged)
+    if existing:
+        return existing, None
+
+    book_id = resolver.resolve(target.reader_doc_id, target.source_url, target.title)
+    if book_id is None:
+        return None, (
+            "Could not resolve a Readwise book/article id for this Shortlist item "
+            f"(title={target.title!r}, source_url={target.source_url!r})."
+        )
+
+    if prefetched_highlights is not None and book_id in prefetched_highlights:
+        outline = await fetch_outline_async(engine=engine, target=target)
+        raw_highlights = prefetched_highlights[book_id]
+    else:
+        # The Reader doc and the highlight export are independent, so fetch them together.
+        outline, synced = await asyncio.gather(
+            fetch_outline_async(engine=engine, target=target),
+            sync_highlights_for_book_ids_async(engine=engine, book_ids=[book_id], full_refresh=refresh_highlights),
+        )
+        raw_highlights = synced.get(book_id, [])
+    if outline is None:
+        return None, f"Failed to fetch reader doc: {target.reader_doc_id}"
+
+    # Sorting/rendering is CPU work; keep it off the event loop so other fetches progress.
+    return await asyncio.to_thread(
+        write_note_for_doc,
+        target=target,
+        outline=outline,
+        book_id=book_id,
+        resolver=resolver,
+        raw_highlights=raw_highlights,
+        debug=debug,
+        skip_existing=skip_existing,
+        incremental=incremental,
+    )
+
+
+async def _aiter_batches(batches: Iterable[List[TargetDoc]]) -> AsyncIterator[List[TargetDoc]]:
+    for batch in batches:
+        yield batch
+
+
+async def _make_notes_async(
+    *,
+    token: str,
+    targets: Optional[List[TargetDoc]],
+    shortlist_stream: Optional[ShortlistStream],
+    resolver: BookResolver,
+    debug: bool,
+    skip_existing: bool,
+    skip_unchanged: bool,
+    concurrency: int,
+    bulk_export: bool,
+    refresh_highlights: bool,
+    incremental: bool,
+) -> List[Tuple[TargetDoc, Optional[str], Optional[str]]]:
+    async def run(
+        engine: AsyncEngine,
+        t: TargetDoc,
+        prefetched: Optional[Dict[int, List[Dict[str, Any]]]],
+    ) -> Tuple[TargetDoc, Optional[str], Optional[str]]:
+        try:
+            out_path, err = await make_note_for_doc_async(
+                engine=engine,
+                target=t,
+                resolver=resolver,
+                debug=debug,
+                skip_existing=skip_existing,
+                prefetched_highlights=prefetched,
+                refresh_highlights=refresh_highlights,
+                incremental=incremental,
+            )
+        except Exception as e:
+            out_path, err = None, str(e) or type(e).__name__
+        return t, out_path, err
+
+    results: List[Tuple[TargetDoc, Optional[str], Optional[str]]] = []
+    tasks: List[asyncio.Task] = []
+    async with AsyncEngine(token=token, concurrency=concurrency) as engine:
+        if shortlist_stream is not None:
+            batches = aiter_shortlist_target_batches(
+                engine=engine,
+                top_level_only=shortlist_stream.top_level_only,
+                limit=shortlist_stream.limit,
+            )
+        else:
+            batches = _aiter_batches([targets or []])
+
+        # Notes for a page start as soon as it arrives; later pages keep loading meanwhile.
+        async for batch in batches:
+            # Catalog loads happen here, on the loop, rather than blocking it inside a task.
+            if skip_unchanged:
+                await resolver.catalog_async(engine)
+            settled, pending = split_up_to_date(
+                batch, resolver, skip_existing=skip_existing, skip_unchanged=skip_unchanged
+            )
+            results.extend((t, out_path, None) for t, out_path in settled)
+            if not pending:
+                continue
+            if resolver.needs_catalog(pending):
+                await resolver.catalog_async(engine)
+            prefetched = None
+            if bulk_export:
+                prefetched = await sync_highlights_for_book_ids_async(
+                    engine=engine,
+                    book_ids=resolve_book_ids_for_targets(pending, resolver),
+                    full_refresh=refresh_highlights,
+                )
+            tasks.extend(asyncio.create_task(run(engine, t, prefetched)) for t in pending)
+
+        results.extend(await asyncio.gather(*tasks))
+    return results
+
+
+def make_notes_async(
+    *,
+    token: str,
+    resolver: BookResolver,
+    debug: bool,
+    skip_existing: bool,
+    targets: Optional[List[TargetDoc]] = None,
+    shortlist_stream: Optional[ShortlistStream] = None,
+    skip_unchanged: bool = False,
+    concurrency: int = 64,
+    bulk_export: bool = True,
+    refresh_highlights: bool = False,
+    incremental: bool = False,
+) -> List[Tuple[TargetDoc, Optional[str], Optional[str]]]:
+    return asyncio.run(
+        _make_notes_async(
+            token=token,
+            targets=targets,
+            shortlist_stream=shortlist_stream,
+            resolver=resolver,
+            debug=debug,
+            skip_existing=skip_existing,
+            skip_unchanged=skip_unchanged,
+            concurrency=concurrency,
+            bulk_export=bulk_export,
+            refresh_highlights=refresh_highlights,
+            incremental=incremental,
+        )
+    )
+
+
+async def aiter_shortlist_target_batches(
+    *,
+    engine: AsyncEngine,
+    top_level_only: bool,
+    limit: Optional[int] = None,
+) -> AsyncIterator[List[TargetDoc]]:
+    emitted = 0
+    async for page in aiter_reader_document_pages(
+        engine=engine,
+        location="shortlist",
+        with_html_content=False,
+        top_level_only=top_level_only,
+    ):
+        batch = _targets_from_page(page, None if limit is None else limit - emitted)
+        emitted += len(batch)
+        if batch:
+            yield batch
+        if limit is not None and emitted >= limit:
+            return
+
+
+def load_shortlist_async(*, token: str, top_level_only: bool) -> List[Dict[str, Any]]:
+    async def _load() -> List[Dict[str, Any]]:
+        async with AsyncEngine(token=token) as engine:
+            return await fetch_reader_documents_async(
+                engine=engine,
+                location="shortlist",
+                with_html_content=False,
+                top_level_only=top_level_only,
+            )
+
+    return asyncio.run(_load())
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from rwhtn.config import cache_dir, ensure_dir, write_json_atomic
+from rwhtn.transform import HtmlAnalysis, analyze_html
+
+
+# Bump when the derived artifacts change shape or meaning, so stale entries are ignored.
+# 2: heading offsets, and html_stream keeps text after the last tag (the parser is closed).
+OUTLINE_CACHE_VERSION = 2
+
+
+@dataclass(frozen=True)
+class DocOutline:
+    """
+    What a note needs from a Reader document: its metadata (without `html_content`) plus the
+    artifacts derived from the HTML.
+    """
+
+    reader_doc: Dict[str, Any]
+    headings: List[Tuple[int, str]]
+    html_stream: str
+    heading_offsets: List[int] = field(default_factory=list)
+
+
+def outline_from_reader_doc(reader_doc: Dict[str, Any]) -> DocOutline:
+    """
+    `html_content` is either the HTML string or, when the doc was fetched with
+    `html_sink=HtmlAnalysisStream`, its analysis already computed while streaming.
+    """
+    html = reader_doc.get("html_content") or ""
+    if isinstance(html, HtmlAnalysis):
+        analysis = html
+    else:
+        analysis = analyze_html(html if isinstance(html, str) else "")
+    return DocOutline(
+        reader_doc={k: v for k, v in reader_doc.items() if k != "html_content"},
+        headings=analysis.headings,
+        html_stream=analysis.html_stream,
+        heading_offsets=analysis.heading_offsets,
+    )
+
+
+def _outline_path(reader_doc_id: str) -> str:
+    return os.path.join(ensure_dir(cache_dir("outlines")), f"{reader_doc_id}.json")
+
+
+def load_outline(reader_doc_id: str, updated_at: str) -> Optional[DocOutline]:
+    if not reader_doc_id or not updated_at:
+        return None
+    try:
+        with open(_outline_path(reader_doc_id), "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if payload.get("version") != OUTLINE_CACHE_VERSION or payload.get("updated_at") != updated_at:
+        return None
+    reader_doc = payload.get("reader_doc")
+    headings = payload.get("headings")
+    html_stream = payload.get("html_stream")
+    heading_offsets = payload.get("heading_offsets")
+    if not isinstance(reader_doc, dict) or not isinstance(headings, list) or not isinstance(html_stream, str):
+        return None
+    if not isinstance(heading_offsets, list) or len(heading_offsets) != len(headings):
+        return None
+    return DocOutline(
+        reader_doc=reader_doc,
+        headings=[(int(lvl), str(txt)) for (lvl, txt) in headings],
+        html_stream=html_stream,
+        heading_offsets=[int(o) for o in heading_offsets],
+    )
+
+
+def save_outline(outline: DocOutline) -> None:
+    reader_doc_id = (outline.reader_doc.get("id") or "").strip()
+    updated_at = (outline.reader_doc.get("updated_at") or "").strip()
+    if not reader_doc_id or not updated_at:
+        return
+    write_json_atomic(
+        _outline_path(reader_doc_id),
+        {
+            "version": OUTLINE_CACHE_VERSION,
+            "updated_at": updated_at,
+            "reader_doc": outline.reader_doc,
+            "headings": outline.headings,
+            "html_stream": outline.html_stream,
+            "heading_offsets": outline.heading_offsets,
+        },
+    )
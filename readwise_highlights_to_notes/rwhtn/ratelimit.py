@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from rwhtn.config import cache_dir, ensure_dir, write_json_atomic
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+
+# Documented per-token limits (requests per minute). The Reader list endpoint and the
+# Readwise books list are the tight ones; the export endpoint shares the general v2 budget.
+DEFAULT_RATE_LIMITS_PER_MINUTE: Dict[str, int] = {
+    "https://readwise.io/api/v3/list/": 20,
+    "https://readwise.io/api/v2/books/": 20,
+    "https://readwise.io/api/v2/export/": 240,
+}
+FALLBACK_RATE_PER_MINUTE = 240
+
+# Shared (cross-process) limiter tuning. The learned rate drops multiplicatively on each 429
+# episode and climbs back linearly, never above the documented limit. Recovery slows down with
+# the number of 429 episodes in the last RECENT_429_WINDOW_SECONDS, so an endpoint that keeps
+# hitting its limit settles below it instead of oscillating.
+SHARED_STATE_FILENAME = "ratelimit.json"
+SHARED_BURST_SECONDS = 10.0
+MIN_RATE_PER_MINUTE = 2.0
+RATE_DECREASE_FACTOR = 0.7
+RATE_RECOVERY_PER_MINUTE = 1.0
+RECENT_429_WINDOW_SECONDS = 10 * 60
+
+
+class TokenBucket:
+    def __init__(self, *, rate_per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate_per_second = max(0.001, float(rate_per_minute) / 60.0)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, float(rate_per_minute))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """
+        Take one token and return how long the caller must wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_second
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def drain(self, seconds: float) -> None:
+        """
+        Push the bucket into debt after a 429 so every thread sharing it pauses together.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -float(seconds) * self.rate_per_second)
+
+
+class RateLimiter:
+    def __init__(self, limits_per_minute: Optional[Dict[str, int]] = None, *, enabled: bool = True) -> None:
+        self.limits_per_minute = dict(DEFAULT_RATE_LIMITS_PER_MINUTE if limits_per_minute is None else limits_per_minute)
+        self.enabled = enabled
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _key_and_rate(self, url: str) -> Tuple[str, int]:
+        for prefix, rate in self.limits_per_minute.items():
+            if url.startswith(prefix):
+                return prefix, rate
+        return "", FALLBACK_RATE_PER_MINUTE
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        key, rate = self._key_and_rate(url)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(rate_per_minute=rate)
+                self._buckets[key] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> None:
+        if self.enabled:
+            self.bucket_for(url).acquire()
+
+    def reserve(self, url: str) -> float:
+        return self.bucket_for(url).reserve() if self.enabled else 0.0
+
+    def penalize(self, url: str, seconds: float) -> None:
+        if self.enabled and seconds > 0:
+            self.bucket_for(url).drain(seconds)
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            import msvcrt  # type: ignore
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Rate limiter whose state lives in `11_cache/ratelimit.json` behind a file lock, so every
+    rwhtn process on the machine (cron sync, manual runs) paces against the same budget.
+
+    Each endpoint keeps a learned rate (starting at the documented limit) and a theoretical
+    arrival time: a request is scheduled at most `SHARED_BURST_SECONDS` worth of requests
+    ahead of the learned pace. A 429 blocks the endpoint for every process until its
+    `Retry-After` elapses and lowers the learned rate; clean minutes raise it again.
+    """
+
+    def __init__(
+        self,
+        limits_per_minute: Optional[Dict[str, int]] = None,
+        *,
+        enabled: bool = True,
+        state_path: Optional[str] = None,
+    ) -> None:
+        super().__init__(limits_per_minute, enabled=enabled)
+        self.state_path = state_path
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, Any]]:
+        path = self.state_path or os.path.join(ensure_dir(cache_dir()), SHARED_STATE_FILENAME)
+        with self._thread_lock, _file_lock(f"{path}.lock"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except Exception:
+                state = {}
+            state = state if isinstance(state, dict) else {}
+            yield state
+            write_json_atomic(path, state)
+
+    def _endpoint(self, state: Dict[str, Any], url: str, now: float) -> Dict[str, Any]:
+        key, ceiling = self._key_and_rate(url)
+        entry = state.get(key or "*")
+        if not isinstance(entry, dict):
+            entry = {"rate_per_minute": float(ceiling), "tat": 0.0, "blocked_until": 0.0, "adjusted_at": now}
+            state[key or "*"] = entry
+        entry["ceiling_per_minute"] = float(ceiling)
+        entry["recent_429s"] = [
+            t for t in entry.get("recent_429s") or [] if now - float(t) < RECENT_429_WINDOW_SECONDS
+        ]
+        # Additive recovery for the time elapsed since the last adjustment, once clear of 429s.
+        if now >= float(entry.get("blocked_until") or 0) + 60:
+            elapsed_minutes = max(0.0, now - float(entry.get("adjusted_at") or now)) / 60.0
+            recovery = RATE_RECOVERY_PER_MINUTE / (1 + len(entry["recent_429s"]))
+            entry["rate_per_minute"] = min(
+                float(ceiling), float(entry.get("rate_per_minute") or ceiling) + elapsed_minutes * recovery
+            )
+            entry["adjusted_at"] = now
+        return entry
+
+    def reserve(self, url: str) -> float:
+        if not self.enabled:
+            return 0.0
+        with self._state() as state:
+            now = time.time()
+            entry = self._endpoint(state, url, now)
+            interval = 60.0 / max(MIN_RATE_PER_MINUTE, float(entry["rate_per_minute"]))
+            tolerance = max(0.0, SHARED_BURST_SECONDS - interval)
+            tat = max(float(entry.get("tat") or 0), now)
+            start = max(now, tat - tolerance, float(entry.get("blocked_until") or 0))
+            entry["tat"] = max(tat, start) + interval
+            return start - now
+
+    def acquire(self, url: str) -> None:
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, url: str, seconds: float) -> None:
+        if not self.enabled or seconds <= 0:
+            return
+        with self._state() as state:
+            now = time.time()
+            entry = self._endpoint(state, url, now)
+            # Concurrent requests that all hit the same limit window count as one episode.
+            if now >= float(entry.get("blocked_until") or 0):
+                entry["rate_per_minute"] = max(MIN_RATE_PER_MINUTE, float(entry["rate_per_minute"]) * RATE_DECREASE_FACTOR)
+                entry["recent_429s"].append(now)
+            entry["blocked_until"] = max(float(entry.get("blocked_until") or 0), now + float(seconds))
+            entry["adjusted_at"] = now
+
+
+_limiter: RateLimiter = SharedRateLimiter()
+
+
+def rate_limiter() -> RateLimiter:
+    return _limiter
+
+
+def configure_rate_limiter(
+    *,
+    enabled: Optional[bool] = None,
+    shared: Optional[bool] = None,
+    limits_per_minute: Optional[Dict[str, int]] = None,
+) -> RateLimiter:
+    """
+    `shared=False` keeps pacing inside this process only (in-memory token buckets).
+    """
+    global _limiter
+    limits = limits_per_minute if limits_per_minute is not None else _limiter.limits_per_minute
+    enabled = _limiter.enabled if enabled is None else enabled
+    shared = isinstance(_limiter, SharedRateLimiter) if shared is None else shared
+    _limiter = SharedRateLimiter(limits, enabled=enabled) if shared else RateLimiter(limits, enabled=enabled)
+    return _limiter
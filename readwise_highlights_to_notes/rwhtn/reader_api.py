@@ -1,50 +1,74 @@
 from __future__ import annotations
 
-import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-import requests
-from requests import exceptions as req_exc
+from rwhtn.json_stream import ReaderPayloadDecoder, TextSink
+from rwhtn.transport import get_json, stream_json
 
 
 READER_LIST_URL = "https://readwise.io/api/v3/list/"
 
 
-def _sleep_backoff(attempt: int, retry_after_seconds: Optional[int]) -> None:
-    if retry_after_seconds is not None and retry_after_seconds > 0:
-        time.sleep(retry_after_seconds)
-        return
-    time.sleep(min(30, 1.5**attempt))
-
-
 def _get_json(
     *,
     url: str,
     token: str,
     params: Dict[str, Any],
-    timeout: int = 60,
-    max_retries: int = 10,
+    html_sink: Optional[Callable[[], TextSink]] = None,
 ) -> Dict[str, Any]:
-    attempt = 0
-    while True:
-        try:
-            resp = requests.get(url, params=params, headers={"Authorization": f"Token {token}"}, timeout=timeout)
-        except req_exc.RequestException as e:
-            raise RuntimeError(f"Reader API request failed: {e}") from e
-        if resp.status_code == 429:
-            retry_after = resp.headers.get("Retry-After")
-            retry_after_seconds = int(retry_after) if retry_after and retry_after.isdigit() else None
-            attempt += 1
-            if attempt > max_retries:
-                raise RuntimeError("Hit rate limit repeatedly (429); aborting.")
-            _sleep_backoff(attempt, retry_after_seconds)
-            continue
-        resp.raise_for_status()
-        payload = resp.json()
-        return payload if isinstance(payload, dict) else {"results": payload}
+    if html_sink is not None and params.get("withHtmlContent") == "true":
+        decoder = ReaderPayloadDecoder(html_sink=html_sink)
+        return stream_json(url=url, token=token, params=params, decoder=decoder, api_name="Reader")
+    return get_json(url=url, token=token, params=params, api_name="Reader")
 
 
-def fetch_reader_documents(
+def _list_params(
+    *,
+    page_cursor: Optional[str],
+    location: Optional[str],
+    updated_after: Optional[str],
+    category: Optional[str],
+    tags: Tuple[str, ...],
+    with_html_content: bool,
+) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    if page_cursor:
+        params["pageCursor"] = page_cursor
+    if location:
+        params["location"] = location
+    if updated_after:
+        params["updatedAfter"] = updated_after
+    if category:
+        params["category"] = category
+    if tags:
+        params["tag"] = list(tags)
+    if with_html_content:
+        params["withHtmlContent"] = "true"
+    return params
+
+
+def _page_documents(payload: Dict[str, Any], *, top_level_only: bool) -> List[Dict[str, Any]]:
+    page_items = payload.get("results", [])
+    if not isinstance(page_items, list):
+        raise RuntimeError(f"Unexpected payload shape: {type(page_items)}")
+    if top_level_only:
+        page_items = [d for d in page_items if d.get("parent_id") in (None, "")]
+    return [d for d in page_items if isinstance(d, dict)]
+
+
+def _document_params(document_id: str, with_html_content: bool) -> Dict[str, Any]:
+    return {"id": document_id, "withHtmlContent": "true" if with_html_content else "false"}
+
+
+def _first_document(payload: Dict[str, Any]) -> Dict[str, Any]:
+    results = payload.get("results") or []
+    if not results or not isinstance(results, list):
+        return {}
+    first = results[0]
+    return first if isinstance(first, dict) else {}
+
+
+def iter_reader_document_pages(
     *,
     token: str,
     location: Optional[str] = None,
@@ -54,8 +78,16 @@ def fetch_reader_documents(
     with_html_content: bool = False,
     top_level_only: bool = False,
     page_limit: Optional[int] = None,
-) -> List[Dict[str, Any]]:
-    results: List[Dict[str, Any]] = []
+    html_sink: Optional[Callable[[], TextSink]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the listing one page at a time, so callers can start on the first documents while
+    later pages are still being requested (the next page is only fetched when asked for).
+
+    With `html_sink` (and `with_html_content`), responses are decoded as they stream in and
+    each document's `html_content` is fed to a fresh sink and replaced by its `close()`
+    result (e.g. `transform.HtmlAnalysisStream`), instead of being held as one string.
+    """
     next_page_cursor: Optional[str] = None
     page_count = 0
 
@@ -64,33 +96,46 @@ def fetch_reader_documents(
             break
         page_count += 1
 
-        params: Dict[str, Any] = {}
-        if next_page_cursor:
-            params["pageCursor"] = next_page_cursor
-        if location:
-            params["location"] = location
-        if updated_after:
-            params["updatedAfter"] = updated_after
-        if category:
-            params["category"] = category
-        if tags:
-            params["tag"] = list(tags)
-        if with_html_content:
-            params["withHtmlContent"] = "true"
-
-        payload = _get_json(url=READER_LIST_URL, token=token, params=params)
-        page_items = payload.get("results", [])
-        if not isinstance(page_items, list):
-            raise RuntimeError(f"Unexpected payload shape: {type(page_items)}")
-
-        if top_level_only:
-            page_items = [d for d in page_items if d.get("parent_id") in (None, "")]
-
-        results.extend([d for d in page_items if isinstance(d, dict)])
+        params = _list_params(
+            page_cursor=next_page_cursor,
+            location=location,
+            updated_after=updated_after,
+            category=category,
+            tags=tags,
+            with_html_content=with_html_content,
+        )
+        payload = _get_json(url=READER_LIST_URL, token=token, params=params, html_sink=html_sink)
+        yield _page_documents(payload, top_level_only=top_level_only)
         next_page_cursor = payload.get("nextPageCursor")
         if not next_page_cursor:
             break
 
+
+def fetch_reader_documents(
+    *,
+    token: str,
+    location: Optional[str] = None,
+    updated_after: Optional[str] = None,
+    category: Optional[str] = None,
+    tags: Tuple[str, ...] = (),
+    with_html_content: bool = False,
+    top_level_only: bool = False,
+    page_limit: Optional[int] = None,
+    html_sink: Optional[Callable[[], TextSink]] = None,
+) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    for page in iter_reader_document_pages(
+        token=token,
+        location=location,
+        updated_after=updated_after,
+        category=category,
+        tags=tags,
+        with_html_content=with_html_content,
+        top_level_only=top_level_only,
+        page_limit=page_limit,
+        html_sink=html_sink,
+    ):
+        results.extend(page)
     return results
 
 
@@ -99,14 +144,12 @@ def fetch_reader_document(
     token: str,
     document_id: str,
     with_html_content: bool = False,
+    html_sink: Optional[Callable[[], TextSink]] = None,
 ) -> Dict[str, Any]:
     payload = _get_json(
         url=READER_LIST_URL,
         token=token,
-        params={"id": document_id, "withHtmlContent": "true" if with_html_content else "false"},
+        params=_document_params(document_id, with_html_content),
+        html_sink=html_sink,
     )
-    results = payload.get("results") or []
-    if not results or not isinstance(results, list):
-        return {}
-    first = results[0]
-    return first if isinstance(first, dict) else {}
+    return _first_document(payload)
@@ -2,148 +2,231 @@ from __future__ import annotations
 
 import os
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
-import requests
-from requests import exceptions as req_exc
-
-from rwhtn.config import CACHE_DIR, ensure_dir, write_json
+from rwhtn.catalog_store import CatalogStore
+from rwhtn.config import cache_dir, latest_timestamp
+from rwhtn.transport import get_json
 
 
 READWISE_BOOKS_URL = "https://readwise.io/api/v2/books/"
 READWISE_EXPORT_URL = "https://readwise.io/api/v2/export/"
+EXPORT_IDS_PER_REQUEST = 100
+BOOKS_PAGE_SIZE = 1000
 
 
-def _sleep_backoff(attempt: int, retry_after_seconds: Optional[int]) -> None:
-    if retry_after_seconds is not None and retry_after_seconds > 0:
-        time.sleep(retry_after_seconds)
-        return
-    time.sleep(min(30, 1.5**attempt))
+def _get_json(*, url: str, token: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    return get_json(url=url, token=token, params=params, api_name="Readwise")
 
 
-def _get_json(
-    *,
-    url: str,
-    token: str,
-    params: Dict[str, Any],
-    timeout: int = 60,
-    max_retries: int = 10,
-) -> Dict[str, Any]:
-    attempt = 0
-    while True:
-        try:
-            resp = requests.get(url, params=params, headers={"Authorization": f"Token {token}"}, timeout=timeout)
-        except req_exc.RequestException as e:
-            raise RuntimeError(f"Readwise API request failed: {e}") from e
-        if resp.status_code == 429:
-            retry_after = resp.headers.get("Retry-After")
-            retry_after_seconds = int(retry_after) if retry_after and retry_after.isdigit() else None
-            attempt += 1
-            if attempt > max_retries:
-                raise RuntimeError("Hit rate limit repeatedly (429); aborting.")
-            _sleep_backoff(attempt, retry_after_seconds)
-            continue
-        resp.raise_for_status()
-        payload = resp.json()
-        return payload if isinstance(payload, dict) else {"results": payload}
+def _legacy_books_json_path() -> str:
+    return os.path.join(cache_dir(), "books.json")
 
 
-def _books_cache_path() -> str:
-    ensure_dir(CACHE_DIR)
-    return os.path.join(CACHE_DIR, "books.json")
-
-
-def _books_cache_is_fresh(path: str, max_age_seconds: int) -> bool:
+def _import_legacy_books_json(store: CatalogStore) -> None:
+    """
+    One-time migration from the old `11_cache/books.json` so the first run keeps its delta sync.
+    """
+    path = _legacy_books_json_path()
+    if store.count_books() or not os.path.exists(path):
+        return
     try:
-        st = os.stat(path)
-        return (time.time() - st.st_mtime) <= max_age_seconds
-    except Exception:
-        return False
+        import json
 
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except Exception:
+        return
+    results = [b for b in (cached or {}).get("results") or [] if isinstance(b, dict)] if isinstance(cached, dict) else []
+    if not results:
+        return
+    store.replace_books(results)
+    fetched_at = cached.get("fetched_at")
+    store.set_meta(
+        {
+            "books_fetched_at": str(fetched_at) if isinstance(fetched_at, (int, float)) else None,
+            "books_high_water_mark": cached.get("high_water_mark") or _books_high_water_mark(results),
+        }
+    )
+
+
+def _books_high_water_mark(books: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Latest server-side `updated` timestamp in the catalog; the next delta asks for anything newer.
+    Using the server's own value (not the local clock) keeps the mark immune to clock skew.
+    """
+    return latest_timestamp(books, "updated")
+
+
+def _plan_books_sync(store: CatalogStore, *, max_age_seconds: int, full_refresh: bool) -> Tuple[str, Optional[str]]:
+    """
+    ("fresh", None) if the stored catalog is recent enough, ("delta", mark) if only books
+    updated after `mark` are needed, else ("full", None).
+    """
+    if full_refresh:
+        return "full", None
+    _import_legacy_books_json(store)
+    if not store.count_books():
+        return "full", None
+    try:
+        fetched_at = float(store.get_meta("books_fetched_at") or 0)
+    except ValueError:
+        fetched_at = 0.0
+    if time.time() - fetched_at <= max_age_seconds:
+        return "fresh", None
+    mark = store.get_meta("books_high_water_mark")
+    return ("delta", mark) if mark else ("full", None)
+
+
+def _apply_books_sync(store: CatalogStore, mode: str, mark: Optional[str], books: List[Dict[str, Any]]) -> None:
+    if mode == "full":
+        store.replace_books(books)
+        new_mark = _books_high_water_mark(books)
+    else:
+        store.upsert_books(books)
+        new_mark = latest_timestamp(books + [{"updated": mark}], "updated")
+    store.set_meta({"books_fetched_at": str(time.time()), "books_high_water_mark": new_mark})
+
+
+def _books_params(page: int, updated_after: Optional[str]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"page": page, "page_size": BOOKS_PAGE_SIZE}
+    if updated_after:
+        params["updated__gt"] = updated_after
+    return params
+
+
+def _page_books(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    page_results = payload.get("results") or []
+    if not isinstance(page_results, list):
+        return []
+    return [b for b in page_results if isinstance(b, dict)]
 
-def fetch_all_books(
-    *,
-    token: str,
-    max_pages: int = 200,
-    use_cache: bool = True,
-    cache_max_age_seconds: int = 24 * 60 * 60,
-) -> List[Dict[str, Any]]:
-    cache_path = _books_cache_path()
-    if use_cache and _books_cache_is_fresh(cache_path, cache_max_age_seconds):
-        try:
-            import json
-
-            with open(cache_path, "r", encoding="utf-8") as f:
-                cached = json.load(f)
-            if isinstance(cached, dict) and isinstance(cached.get("results"), list):
-                return [b for b in cached["results"] if isinstance(b, dict)]
-        except Exception:
-            pass
 
+def _fetch_book_pages(*, token: str, max_pages: int, updated_after: Optional[str]) -> List[Dict[str, Any]]:
     results: List[Dict[str, Any]] = []
     page = 1
     while page <= max_pages:
-        payload = _get_json(url=READWISE_BOOKS_URL, token=token, params={"page": page})
-        page_results = payload.get("results") or []
-        if not isinstance(page_results, list) or not page_results:
+        payload = _get_json(url=READWISE_BOOKS_URL, token=token, params=_books_params(page, updated_after))
+        page_results = _page_books(payload)
+        if not page_results:
             break
-        results.extend([b for b in page_results if isinstance(b, dict)])
+        results.extend(page_results)
         if not payload.get("next"):
             break
         page += 1
-
-    if use_cache:
-        write_json(cache_path, {"fetched_at": time.time(), "results": results})
-
     return results
 
 
-def resolve_book_id_for_source_url(books: List[Dict[str, Any]], source_url: str, title: str) -> Optional[int]:
-    source_url_norm = (source_url or "").strip()
-    title_norm = (title or "").strip().lower()
-
-    for b in books:
-        if (b.get("source_url") or "").strip() == source_url_norm and source_url_norm:
-            try:
-                return int(b["id"])
-            except Exception:
-                return None
+def sync_books_catalog(
+    *,
+    token: str,
+    max_pages: int = 200,
+    cache_max_age_seconds: int = 60 * 60,
+    full_refresh: bool = False,
+) -> CatalogStore:
+    """
+    Bring `11_cache/catalog.sqlite` up to date and return it. Only books updated since the
+    stored high-water mark are fetched and upserted; the whole catalog is re-listed only on
+    `full_refresh` (or when the store is empty).
+    """
+    store = CatalogStore()
+    mode, mark = _plan_books_sync(store, max_age_seconds=cache_max_age_seconds, full_refresh=full_refresh)
+    if mode != "fresh":
+        books = _fetch_book_pages(token=token, max_pages=max_pages, updated_after=mark)
+        _apply_books_sync(store, mode, mark, books)
+    return store
+
+
+def _export_params(
+    book_id: Union[int, Iterable[int]],
+    page_cursor: Optional[str],
+    updated_after: Optional[str] = None,
+) -> Dict[str, Any]:
+    ids = [book_id] if isinstance(book_id, int) else list(book_id)
+    params: Dict[str, Any] = {"ids": ",".join(str(int(i)) for i in ids)}
+    if updated_after:
+        params["updatedAfter"] = updated_after
+    if page_cursor:
+        params["pageCursor"] = page_cursor
+    return params
 
-    for b in books:
-        if (b.get("title") or "").strip().lower() == title_norm and title_norm:
-            try:
-                return int(b["id"])
-            except Exception:
-                return None
 
-    return None
+def _page_export_results(payload: Dict[str, Any]) -> List[Any]:
+    return payload.get("results", []) if isinstance(payload.get("results"), list) else []
 
 
-def book_by_id(books: List[Dict[str, Any]], book_id: int) -> Optional[Dict[str, Any]]:
-    for b in books:
-        try:
-            if int(b.get("id")) == int(book_id):
-                return b
-        except Exception:
-            continue
-    return None
+def _highlights_from_export(results: List[Any]) -> List[Dict[str, Any]]:
+    if not results:
+        return []
+    first = results[0] if isinstance(results[0], dict) else {}
+    highlights = first.get("highlights") or []
+    return highlights if isinstance(highlights, list) else []
 
 
 def export_highlights_for_book_id(*, token: str, book_id: int) -> List[Dict[str, Any]]:
     results: List[Dict[str, Any]] = []
     next_page_cursor: Optional[str] = None
     while True:
-        params: Dict[str, Any] = {"ids": str(book_id)}
-        if next_page_cursor:
-            params["pageCursor"] = next_page_cursor
-        payload = _get_json(url=READWISE_EXPORT_URL, token=token, params=params)
-        results.extend(payload.get("results", []) if isinstance(payload.get("results"), list) else [])
+        payload = _get_json(url=READWISE_EXPORT_URL, token=token, params=_export_params(book_id, next_page_cursor))
+        results.extend(_page_export_results(payload))
         next_page_cursor = payload.get("nextPageCursor")
         if not next_page_cursor:
             break
 
-    if not results:
-        return []
-    first = results[0] if isinstance(results[0], dict) else {}
-    highlights = first.get("highlights") or []
-    return highlights if isinstance(highlights, list) else []
+    return _highlights_from_export(results)
+
+
+def _chunk_book_ids(book_ids: Iterable[int], chunk_size: int) -> List[List[int]]:
+    unique: List[int] = []
+    seen: set[int] = set()
+    for b in book_ids:
+        b = int(b)
+        if b in seen:
+            continue
+        seen.add(b)
+        unique.append(b)
+    size = max(1, int(chunk_size))
+    return [unique[i : i + size] for i in range(0, len(unique), size)]
+
+
+def _split_export_by_book(results: List[Any], book_ids: Iterable[int]) -> Dict[int, List[Dict[str, Any]]]:
+    by_book: Dict[int, List[Dict[str, Any]]] = {int(b): [] for b in book_ids}
+    for r in results:
+        if not isinstance(r, dict):
+            continue
+        try:
+            book_id = int(r.get("user_book_id"))
+        except Exception:
+            continue
+        highlights = r.get("highlights") or []
+        if isinstance(highlights, list):
+            by_book.setdefault(book_id, []).extend(highlights)
+    return by_book
+
+
+def export_highlights_for_book_ids(
+    *,
+    token: str,
+    book_ids: Iterable[int],
+    chunk_size: int = EXPORT_IDS_PER_REQUEST,
+    updated_after: Optional[str] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Export highlights for many books in one paginated sweep per chunk of ids.
+    Every requested id is present in the result (empty list if it has no highlights).
+    With `updated_after`, only highlights changed since then are returned (deletions included,
+    flagged with `is_deleted`).
+    """
+    by_book: Dict[int, List[Dict[str, Any]]] = {}
+    for chunk in _chunk_book_ids(book_ids, chunk_size):
+        results: List[Any] = []
+        next_page_cursor: Optional[str] = None
+        while True:
+            params = _export_params(chunk, next_page_cursor, updated_after)
+            payload = _get_json(url=READWISE_EXPORT_URL, token=token, params=params)
+            results.extend(_page_export_results(payload))
+            next_page_cursor = payload.get("nextPageCursor")
+            if not next_page_cursor:
+                break
+        by_book.update(_split_export_by_book(results, chunk))
+    return by_book
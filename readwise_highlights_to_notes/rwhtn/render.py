@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import glob
+import hashlib
+import io
 import json
-from typing import Any, Dict, List, Optional, Tuple
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from rwhtn.config import iso_now
+from rwhtn.config import iso_now, write_text_atomic
+from rwhtn.sections import SectionTree
+from rwhtn.templates import HIGHLIGHT_FIELDS, NoteTemplate, load_note_template
 from rwhtn.transform import is_image_only_highlight, norm, norm_heading, strip_heading_prefix
 
 
+STALE_TEMP_SECONDS = 10 * 60
+
+
 def _yaml_quote(value: str) -> str:
     escaped = value.replace("\\", "\\\\").replace('"', '\\"')
     return f'"{escaped}"'
@@ -26,6 +37,139 @@ def _yaml_line(key: str, value: Any) -> Optional[str]:
     return f"{key}: {_yaml_quote(json.dumps(value, ensure_ascii=False))}"
 
 
+class HeadingMatcher:
+    """
+    Matches highlight text to document headings by normalized text.
+
+    Positions of each normalized heading are indexed once, so a lookup is a dict hit plus a
+    bisect: the next occurrence at or after the cursor (advancing it), else the first
+    occurrence anywhere (cursor unchanged).
+    """
+
+    def __init__(self, headings: List[Tuple[int, str]]) -> None:
+        self.headings = headings
+        self._positions: Dict[str, List[int]] = {}
+        for j, (_, txt) in enumerate(headings):
+            self._positions.setdefault(norm_heading(txt), []).append(j)
+        self.cursor = 0
+
+    def match(self, text_norm: str) -> Optional[Tuple[int, str]]:
+        positions = self._positions.get(text_norm)
+        if not positions:
+            return None
+        k = bisect_left(positions, self.cursor)
+        if k < len(positions):
+            j = positions[k]
+            self.cursor = j + 1
+        else:
+            j = positions[0]
+        return self.headings[j]
+
+
+def _heading_text(template: NoteTemplate, html_level: int, heading_text: str, title: str) -> str:
+    # The document's own title heading is already the note's `# title`.
+    if html_level == 1 and norm(heading_text) == norm(title):
+        return ""
+    md_level = min(6, html_level + 1)
+    return template.render(
+        "heading", {"heading": strip_heading_prefix(heading_text), "level": md_level, "hashes": "#" * md_level}
+    )
+
+
+def _headings_text(tree: Optional[SectionTree], section_path: List[int], template: NoteTemplate, title: str) -> List[str]:
+    if tree is None:
+        return []
+    return [_heading_text(template, tree.sections[j].level, tree.sections[j].title, title) for j in section_path]
+
+
+def _shared_prefix(a: List[int], b: List[int]) -> int:
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    return n
+
+
+def _highlight_values(h: Dict[str, Any], text: str) -> Dict[str, Any]:
+    values = {k: ("" if h.get(k) is None else h.get(k)) for k in HIGHLIGHT_FIELDS}
+    values["text"] = text
+    return values
+
+
+def _note_pieces(
+    *,
+    title: str,
+    highlights: List[Dict[str, Any]],
+    headings: List[Tuple[int, str]],
+    tree: Optional[SectionTree],
+    highlight_sections: Optional[List[Optional[int]]],
+    template: NoteTemplate,
+) -> Iterator[Tuple[int, List[int], str]]:
+    """
+    (highlight index, section path, rendered block) for each highlight with text, in order.
+    The block is empty for a highlight folded into its section's heading.
+    """
+    matcher = HeadingMatcher(headings)
+    for i, h in enumerate(highlights):
+        text = h.get("text") or ""
+        if not isinstance(text, str):
+            continue
+        text = " ".join(text.split())
+        if not text:
+            continue
+        section_path: List[int] = []
+        if tree is not None and highlight_sections is not None:
+            section_path = tree.path(highlight_sections[i])
+            if section_path and norm_heading(text) == norm_heading(tree.sections[section_path[-1]].title):
+                yield i, section_path, ""
+                continue
+        else:
+            matched = matcher.match(norm_heading(text))
+            if matched:
+                yield i, section_path, _heading_text(template, matched[0], matched[1], title)
+                continue
+        fragment = "image" if is_image_only_highlight(text) else "bullet"
+        yield i, section_path, template.render(fragment, _highlight_values(h, text))
+
+
+def _content_hash(lines: Iterable[str], is_volatile: Callable[[str], bool]) -> str:
+    digest = hashlib.sha256()
+    for line in lines:
+        if not is_volatile(line):
+            digest.update(line.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _remove_stale_temp_files(path: str) -> None:
+    # Leftovers of a writer that died between writing its temp file and renaming it. A live
+    # writer holds its temp file for milliseconds, so anything this old is abandoned.
+    cutoff = time.time() - STALE_TEMP_SECONDS
+    for tmp_path in glob.glob(f"{glob.escape(path)}.*.tmp"):
+        try:
+            if os.stat(tmp_path).st_mtime < cutoff:
+                os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def write_note_if_changed(path: str, content: str, *, is_volatile: Optional[Callable[[str], bool]] = None) -> bool:
+    """
+    Replace the note at `path` only if `content` differs from it beyond volatile lines (the
+    export timestamp; default: as rendered by the built-in template), so unchanged notes keep
+    their bytes and mtime for sync tools and git. Writes go through a temp file and rename,
+    so a crash never leaves a partial note.
+    """
+    is_volatile = is_volatile or load_note_template("").is_volatile_line  # "": built-in fragments
+    _remove_stale_temp_files(path)
+    try:
+        with open(path, "r", encoding="utf-8") as existing:
+            if _content_hash(existing, is_volatile) == _content_hash(io.StringIO(content), is_volatile):
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    write_text_atomic(path, content)
+    return True
+
+
 def render_markdown_note(
     *,
     path: str,
@@ -35,63 +179,193 @@ def render_markdown_note(
     frontmatter: Dict[str, Any],
     highlights: List[Dict[str, Any]],
     headings: List[Tuple[int, str]],
-) -> None:
-    ordered_headings = [(lvl, txt, norm_heading(txt)) for (lvl, txt) in headings]
+    section_tree: Optional[SectionTree] = None,
+    highlight_sections: Optional[List[Optional[int]]] = None,
+    template: Optional[NoteTemplate] = None,
+) -> bool:
+    """
+    Render the note with `template` (default: the configured one, see
+    `templates.configure_note_template`) and write it with `write_note_if_changed`; returns
+    whether the file changed.
 
-    with open(path, "w", encoding="utf-8") as f:
-        f.write("---\n")
-        for k in sorted(frontmatter.keys()):
-            line = _yaml_line(k, frontmatter.get(k))
-            if line:
-                f.write(line + "\n")
-        f.write("---\n\n")
+    With `section_tree` and `highlight_sections` (each highlight's enclosing section, see
+    `SectionTree.section_at`), every highlight is written under its full section path, and a
+    highlight of a section's own heading is dropped in favour of it. Otherwise headings appear
+    only where a highlight's text is a heading (`HeadingMatcher`).
+    """
+    template = template or load_note_template()
+    tree = section_tree if section_tree and len(highlight_sections or ()) == len(highlights) else None
+    written_path: List[int] = []
 
-        f.write(f"# {title}\n\n")
+    yaml_lines = (_yaml_line(k, frontmatter.get(k)) for k in sorted(frontmatter.keys()))
+    note_values = {
+        "title": title,
+        "source_url": source_url,
+        "cover_image_url": cover_image_url,
+        "exported_at": iso_now(),
+        "frontmatter": "".join(f"{line}\n" for line in yaml_lines if line),
+    }
 
+    with io.StringIO() as f:
+        f.write(template.render("frontmatter", note_values))
+        f.write(template.render("title", note_values))
         if cover_image_url:
-            f.write('<div align="center">\n')
-            f.write(f'  <img src="{cover_image_url}" width="220" />\n')
-            f.write("</div>\n\n")
-
+            f.write(template.render("cover", note_values))
         if source_url:
-            f.write(f"Source: {source_url}\n\n")
+            f.write(template.render("source", note_values))
+        f.write(template.render("exported", note_values))
 
-        f.write(f"Exported at: `{iso_now()}`\n\n")
+        pieces = _note_pieces(
+            title=title,
+            highlights=highlights,
+            headings=headings,
+            tree=tree,
+            highlight_sections=highlight_sections,
+            template=template,
+        )
+        for _, section_path, block in pieces:
+            shared = _shared_prefix(section_path, written_path)
+            f.write("".join(_headings_text(tree, section_path[shared:], template, title)))
+            written_path = section_path
+            f.write(block)
 
-        heading_index = 0
-        for h in highlights:
-            text = h.get("text") or ""
-            if not isinstance(text, str):
-                continue
-            text = " ".join(text.split())
-            if not text:
-                continue
-            text_norm = norm_heading(text)
-
-            matched: Optional[Tuple[int, str]] = None
-            if ordered_headings:
-                for j in range(heading_index, len(ordered_headings)):
-                    lvl, heading_text, heading_norm = ordered_headings[j]
-                    if heading_norm == text_norm:
-                        matched = (lvl, heading_text)
-                        heading_index = j + 1
-                        break
-                if matched is None:
-                    for lvl, heading_text, heading_norm in ordered_headings:
-                        if heading_norm == text_norm:
-                            matched = (lvl, heading_text)
-                            break
+        return write_note_if_changed(path, f.getvalue(), is_volatile=template.is_volatile_line)
 
-            if matched:
-                html_level, heading_text = matched
-                if html_level == 1 and norm(heading_text) == norm(title):
-                    continue
-                md_level = min(6, html_level + 1)
-                f.write(f"\n{'#' * md_level} {strip_heading_prefix(heading_text)}\n\n")
-                continue
 
-            if is_image_only_highlight(text):
-                f.write(f"\n{text}\n\n")
+def _find_block(note: str, block: str, start: int) -> int:
+    # A rendered block only counts where it starts a line (not inside a longer bullet).
+    i = note.find(block, start)
+    while i > 0 and note[i - 1] != "\n":
+        i = note.find(block, i + 1)
+    return i
+
+
+def _item_end(note: str, pos: int) -> int:
+    # Indented lines right after a highlight (the user's notes on it) stay attached to it.
+    while pos < len(note) and note[pos] in " \t":
+        newline = note.find("\n", pos)
+        if newline < 0 or not note[pos:newline].strip():
+            break
+        pos = newline + 1
+    return pos
+
+
+def update_markdown_note(
+    *,
+    path: str,
+    title: str,
+    highlights: List[Dict[str, Any]],
+    headings: List[Tuple[int, str]],
+    rendered_ids: Collection[Any],
+    section_tree: Optional[SectionTree] = None,
+    highlight_sections: Optional[List[Optional[int]]] = None,
+    template: Optional[NoteTemplate] = None,
+) -> bool:
+    """
+    Insert the highlights whose `id` is not in `rendered_ids` into the existing note at `path`
+    and leave the rest of the file, including the user's edits, as it is. Returns whether the
+    file changed.
+
+    Already-rendered highlights are located by their rendered headings and block, in order.
+    A new highlight goes before the next one of them, after the section headings the two
+    share, else after the previous one, with whatever headings of its own section path the
+    note lacks there; the result matches a full render. A rendered highlight the user edited
+    no longer matches and is simply not used as an anchor.
+    """
+    template = template or load_note_template()
+    tree = section_tree if section_tree and len(highlight_sections or ()) == len(highlights) else None
+    with open(path, "r", encoding="utf-8") as fh:
+        note = fh.read()
+
+    pieces = list(
+        _note_pieces(
+            title=title,
+            highlights=highlights,
+            headings=headings,
+            tree=tree,
+            highlight_sections=highlight_sections,
+            template=template,
+        )
+    )
+    is_new = [highlights[i].get("id") is not None and highlights[i].get("id") not in rendered_ids for i, _, _ in pieces]
+    if not any(is_new):
+        return False
+    visible = [False] * len(pieces)  # rendered pieces that wrote anything into the note
+
+    # For each rendered piece: its nearest rendered predecessor, the headings written before it
+    # (relative to that predecessor), and where those headings start / its block ends in `note`.
+    old_prev: List[Optional[int]] = [None] * len(pieces)
+    runs: List[List[str]] = [[] for _ in pieces]
+    run_start: List[Optional[int]] = [None] * len(pieces)
+    end: List[Optional[int]] = [None] * len(pieces)
+    last: Optional[int] = None
+    cursor = 0
+    for k, (_, section_path, block) in enumerate(pieces):
+        if is_new[k]:
+            continue
+        old_prev[k] = last
+        shared = _shared_prefix(section_path, pieces[last][1] if last is not None else [])
+        runs[k] = _headings_text(tree, section_path[shared:], template, title)
+        run = "".join(runs[k])
+        visible[k] = bool(run or block)
+        if visible[k]:
+            start = _find_block(note, run + block, cursor)
+            if start >= 0:
+                run_start[k] = start
+                end[k] = cursor = _item_end(note, start + len(run) + len(block))
             else:
-                f.write(f"- {text}\n")
+                # The user edited the highlight or its headings; anchor on what is left.
+                if run:
+                    start = _find_block(note, run, cursor)
+                    if start >= 0:
+                        run_start[k] = start
+                        cursor = start + len(run)
+                if block:
+                    start = _find_block(note, block, cursor)
+                    if start >= 0:
+                        end[k] = cursor = _item_end(note, start + len(block))
+        last = k
+
+    inserts: List[Tuple[int, int, str]] = []  # (offset in `note`, piece, text)
+    placed: Dict[int, int] = {}
+    for k, (_, section_path, block) in enumerate(pieces):
+        if not is_new[k]:
+            continue
+        prev_path = pieces[k - 1][1] if k > 0 else []
+        heading_from = _shared_prefix(section_path, prev_path)
+        before = next((j for j in range(k - 1, -1, -1) if is_new[j] or visible[j]), None)
+        after = next((j for j in range(k + 1, len(pieces)) if visible[j]), None)
+        pos: Optional[int]
+        if after is not None and run_start[after] is not None:
+            # Split the next piece's heading run: the headings it shares with this one stay
+            # above the insertion, the rest stay with it.
+            after_prev = old_prev[after]
+            x = _shared_prefix(pieces[after][1], pieces[after_prev][1] if after_prev is not None else [])
+            shared = _shared_prefix(section_path, pieces[after][1])
+            pos = run_start[after] + sum(len(t) for t in runs[after][: max(0, shared - x)])  # type: ignore[operator]
+            heading_from = max(heading_from, shared)
+        elif before is not None and before in placed:
+            pos = placed[before]
+        elif before is not None and end[before] is not None:
+            pos = end[before]
+        else:
+            pos = len(note)
+            if before is not None:
+                heading_from = 0
+        placed[k] = pos  # type: ignore[assignment]
+        text = "".join(_headings_text(tree, section_path[heading_from:], template, title)) + block
+        if text:
+            inserts.append((pos, k, text))  # type: ignore[arg-type]
 
+    if not inserts:
+        return False
+    out: List[str] = []
+    prev_pos = 0
+    for pos, _, text in sorted(inserts):
+        if pos > 0 and note[pos - 1] != "\n" and pos > prev_pos:
+            text = "\n" + text
+        out.append(note[prev_pos:pos])
+        out.append(text)
+        prev_pos = pos
+    out.append(note[prev_pos:])
+    return write_note_if_changed(path, "".join(out), is_volatile=template.is_volatile_line)
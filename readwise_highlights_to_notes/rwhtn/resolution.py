@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from rwhtn.catalog import BookLookup
+from rwhtn.config import cache_dir, ensure_dir, iso_now, write_json_atomic
+
+
+RESOLUTION_MAP_VERSION = 1
+
+# Book fields a note renders from. Kept in the map so a known doc can be rendered without the
+# catalog; timestamps are deliberately left out (they go stale and feed `--skip-unchanged`).
+SNAPSHOT_BOOK_FIELDS = ("id", "title", "author", "category", "source_url", "cover_image_url", "published_date")
+
+
+def _map_path() -> str:
+    return os.path.join(ensure_dir(cache_dir()), "resolution_map.json")
+
+
+def _read_entries(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception:
+        return {}
+    if not isinstance(payload, dict) or payload.get("version") != RESOLUTION_MAP_VERSION:
+        return {}
+    entries = payload.get("entries")
+    return {k: v for k, v in entries.items() if isinstance(v, dict)} if isinstance(entries, dict) else {}
+
+
+class ResolutionMap:
+    """
+    Persistent `reader_doc_id -> book_id` map in `11_cache/resolution_map.json`.
+
+    Each entry records how the doc resolved: `hit` (one candidate), `ambiguous` (several;
+    the first is used) or `miss` (none). Entries remember the source URL and title they were
+    resolved from, so a doc whose URL or title changes is resolved again.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or _map_path()
+        self._entries = _read_entries(self.path)
+        self._changed: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def entry(self, reader_doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(reader_doc_id)
+
+    def lookup(self, reader_doc_id: str, *, source_url: str, title: str) -> Optional[Dict[str, Any]]:
+        entry = self.entry(reader_doc_id)
+        if not entry:
+            return None
+        if entry.get("source_url") != (source_url or "") or entry.get("title") != (title or ""):
+            return None
+        return entry
+
+    def record(
+        self,
+        reader_doc_id: str,
+        *,
+        source_url: str,
+        title: str,
+        candidates: List[int],
+        matched_by: Optional[str],
+        book: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        status = "miss" if not candidates else ("hit" if len(candidates) == 1 else "ambiguous")
+        entry: Dict[str, Any] = {
+            "status": status,
+            "book_id": candidates[0] if candidates else None,
+            "matched_by": matched_by,
+            "source_url": source_url or "",
+            "title": title or "",
+            "resolved_at": iso_now(),
+        }
+        if status == "ambiguous":
+            entry["candidates"] = candidates
+        if book:
+            entry["book"] = {k: book.get(k) for k in SNAPSHOT_BOOK_FIELDS if book.get(k) is not None}
+        with self._lock:
+            self._entries[reader_doc_id] = entry
+            self._changed[reader_doc_id] = entry
+        return entry
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            entries = list(self._entries.values())
+        out = {"hit": 0, "ambiguous": 0, "miss": 0}
+        for e in entries:
+            status = e.get("status")
+            if status in out:
+                out[status] += 1
+        return out
+
+    def save(self) -> None:
+        """
+        Merge this run's entries into the file on disk (another process may have added its own).
+        """
+        with self._lock:
+            if not self._changed:
+                return
+            entries = _read_entries(self.path)
+            entries.update(self._changed)
+            write_json_atomic(self.path, {"version": RESOLUTION_MAP_VERSION, "entries": entries})
+            self._entries = entries
+            self._changed = {}
+
+
+class BookResolver:
+    """
+    Resolves Reader docs to Readwise books through the resolution map, loading the books
+    catalog (`load_catalog`) only when a doc is unknown, was a miss, or a caller needs the
+    catalog's current timestamps. A warm map lets single-doc runs skip the books catalog entirely.
+    """
+
+    def __init__(
+        self,
+        *,
+        load_catalog: Callable[[], BookLookup],
+        load_catalog_async: Optional[Callable[[Any], Awaitable[BookLookup]]] = None,
+        resolution_map: Optional[ResolutionMap] = None,
+        catalog: Optional[BookLookup] = None,
+    ) -> None:
+        self.resolution_map = resolution_map if resolution_map is not None else ResolutionMap()
+        self._load_catalog = load_catalog
+        self._load_catalog_async = load_catalog_async
+        self._catalog = catalog
+        self._lock = threading.Lock()
+
+    @property
+    def catalog_loaded(self) -> bool:
+        return self._catalog is not None
+
+    def set_catalog(self, catalog: BookLookup) -> None:
+        with self._lock:
+            self._catalog = catalog
+
+    def catalog(self) -> BookLookup:
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = self._load_catalog()
+            return self._catalog
+
+    async def catalog_async(self, engine: Any) -> BookLookup:
+        """
+        Load the catalog on the event loop (e.g. concurrent book pages) instead of blocking it.
+        """
+        if self._catalog is None:
+            if self._load_catalog_async is None:
+                return self.catalog()
+            catalog = await self._load_catalog_async(engine)
+            self.set_catalog(catalog)
+        return self._catalog  # type: ignore[return-value]
+
+    def _known(self, reader_doc_id: str, source_url: str, title: str) -> Optional[Dict[str, Any]]:
+        if not reader_doc_id:
+            return None
+        entry = self.resolution_map.lookup(reader_doc_id, source_url=source_url, title=title)
+        # Misses are retried: the book may have been created since (first highlight).
+        return entry if entry and entry.get("status") != "miss" else None
+
+    def needs_catalog(self, targets: Iterable[Any]) -> bool:
+        if self.catalog_loaded:
+            return False
+        return any(self._known(t.reader_doc_id, t.source_url, t.title) is None for t in targets)
+
+    def resolve(self, reader_doc_id: str, source_url: str, title: str) -> Optional[int]:
+        entry = self._known(reader_doc_id, source_url, title)
+        if entry is not None:
+            return int(entry["book_id"])
+        catalog = self.catalog()
+        candidates, matched_by = catalog.match(source_url, title)
+        if reader_doc_id:
+            self.resolution_map.record(
+                reader_doc_id,
+                source_url=source_url,
+                title=title,
+                candidates=candidates,
+                matched_by=matched_by,
+                book=catalog.book_by_id(candidates[0]) if candidates else None,
+            )
+        return candidates[0] if candidates else None
+
+    def book_by_id(self, book_id: int, *, reader_doc_id: str = "") -> Optional[Dict[str, Any]]:
+        """
+        The catalog's book if the catalog is loaded; otherwise the snapshot stored in the map.
+        """
+        if self._catalog is not None:
+            return self._catalog.book_by_id(book_id)
+        entry = self.resolution_map.entry(reader_doc_id) if reader_doc_id else None
+        book = (entry or {}).get("book")
+        return book if isinstance(book, dict) and book.get("id") == book_id else None
+
+    def current_book(self, book_id: int) -> Optional[Dict[str, Any]]:
+        """
+        The book with its live timestamps; always consults (and if needed loads) the catalog.
+        """
+        return self.catalog().book_by_id(book_id)
+
+    def save(self) -> None:
+        self.resolution_map.save()
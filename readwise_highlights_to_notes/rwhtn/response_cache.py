@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from rwhtn.config import RawPayloadWriter, cache_dir
+
+
+CACHE_MODES = ("use", "refresh", "bypass")
+
+# Seconds a cached response stays valid, per endpoint kind (see `endpoint_kind`).
+DEFAULT_TTLS: Dict[str, int] = {
+    "reader_list": 10 * 60,
+    "reader_doc": 60 * 60,
+    "books": 60 * 60,
+    "export": 10 * 60,
+}
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# A writer holds its temp file for the length of one download; older ones were abandoned.
+STALE_TEMP_SECONDS = 60 * 60
+
+
+@dataclass(frozen=True)
+class ResponseCacheSettings:
+    mode: str = "use"
+    ttls: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_TTLS))
+    root: Optional[str] = None  # default: cache_dir("http")
+    max_bytes: int = DEFAULT_MAX_BYTES  # `prune` trims the oldest entries beyond this; 0: no cap
+
+
+_settings = ResponseCacheSettings()
+
+
+def configure_response_cache(
+    *,
+    mode: Optional[str] = None,
+    ttls: Optional[Dict[str, int]] = None,
+    root: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+) -> ResponseCacheSettings:
+    global _settings
+    if mode is not None and mode not in CACHE_MODES:
+        raise ValueError(f"Invalid cache mode {mode!r}; expected one of {CACHE_MODES}.")
+    merged_ttls = dict(_settings.ttls)
+    if ttls:
+        unknown = sorted(set(ttls) - set(DEFAULT_TTLS))
+        if unknown:
+            raise ValueError(f"Unknown cache endpoint(s) {unknown}; expected {sorted(DEFAULT_TTLS)}.")
+        merged_ttls.update({k: int(v) for k, v in ttls.items()})
+    _settings = replace(
+        _settings,
+        mode=_settings.mode if mode is None else mode,
+        ttls=merged_ttls,
+        root=_settings.root if root is None else root,
+        max_bytes=_settings.max_bytes if max_bytes is None else max(0, int(max_bytes)),
+    )
+    return _settings
+
+
+def parse_ttl_override(value: str) -> Dict[str, int]:
+    """
+    argparse type for `--cache-ttl endpoint=seconds`.
+    """
+    import argparse
+
+    name, sep, seconds = (value or "").partition("=")
+    name = name.strip()
+    if not sep or name not in DEFAULT_TTLS or not seconds.strip().isdigit():
+        raise argparse.ArgumentTypeError(f"Expected <{'|'.join(DEFAULT_TTLS)}>=<seconds>, got {value!r}")
+    return {name: int(seconds)}
+
+
+def endpoint_kind(url: str, params: Dict[str, Any]) -> Optional[str]:
+    if "/api/v3/list/" in url:
+        return "reader_doc" if params.get("id") else "reader_list"
+    if "/api/v2/books/" in url:
+        return "books"
+    if "/api/v2/export/" in url:
+        # A delta export (`updatedAfter`) is cheap and its key only changes once updates
+        # arrive, so a cached "nothing new" page would hide them for the whole TTL.
+        return None if params.get("updatedAfter") else "export"
+    return None
+
+
+def _cache_key(url: str, token: str, params: Dict[str, Any]) -> str:
+    # The token is part of the key (hashed) so two accounts never share entries.
+    material = json.dumps(
+        {"url": url, "params": params, "token": hashlib.sha256(token.encode("utf-8")).hexdigest()},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _root() -> str:
+    return _settings.root or cache_dir("http")
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(_root(), key[:2], f"{key}.json")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def lookup_path(url: str, token: str, params: Dict[str, Any]) -> Optional[str]:
+    """
+    Path of a fresh entry for the request (expired ones are deleted), for streaming its
+    payload with `config.iter_raw_payload` instead of loading it with `lookup`.
+    """
+    if _settings.mode != "use":
+        return None
+    kind = endpoint_kind(url, params)
+    ttl = _settings.ttls.get(kind or "", 0)
+    if ttl <= 0:
+        return None
+    path = _entry_path(_cache_key(url, token, params))
+    try:
+        if time.time() - os.stat(path).st_mtime > ttl:
+            _remove(path)
+            return None
+    except OSError:
+        return None
+    return path
+
+
+def discard(path: str) -> None:
+    """
+    Drop an entry that turned out to be unreadable.
+    """
+    _remove(path)
+
+
+def lookup(url: str, token: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    path = lookup_path(url, token, params)
+    if path is None:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except Exception:
+        return None
+    payload = entry.get("payload") if isinstance(entry, dict) else None
+    return payload if isinstance(payload, dict) else None
+
+
+def store(url: str, token: str, params: Dict[str, Any], payload: Dict[str, Any]) -> None:
+    if _settings.mode == "bypass" or _settings.ttls.get(endpoint_kind(url, params) or "", 0) <= 0:
+        return
+    path = _entry_path(_cache_key(url, token, params))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "params": params, "fetched_at": time.time(), "payload": payload}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        pass
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def open_writer(url: str, token: str, params: Dict[str, Any]) -> Optional[RawPayloadWriter]:
+    """
+    `store` for a response that is being streamed: the raw body is written as it arrives.
+    """
+    if _settings.mode == "bypass" or _settings.ttls.get(endpoint_kind(url, params) or "", 0) <= 0:
+        return None
+    path = _entry_path(_cache_key(url, token, params))
+    return RawPayloadWriter(path, {"url": url, "params": params, "fetched_at": time.time()}, strict=False)
+
+
+def prune_response_cache() -> Tuple[int, int]:
+    """
+    Delete entries older than the longest TTL (no lookup can serve them), abandoned temp
+    files, and then the oldest entries until the cache fits `max_bytes`. Returns the number
+    of files and bytes removed.
+    """
+    root = _root()
+    now = time.time()
+    max_age = max(_settings.ttls.values(), default=0)
+    kept: List[Tuple[float, int, str]] = []
+    removed = freed = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            age = now - st.st_mtime
+            if name.endswith(".tmp"):
+                expired = age > STALE_TEMP_SECONDS
+            else:
+                expired = name.endswith(".json") and age > max_age
+            if expired:
+                _remove(path)
+                removed += 1
+                freed += st.st_size
+            elif name.endswith(".json"):
+                kept.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in kept)
+    if _settings.max_bytes:
+        for _, size, path in sorted(kept):
+            if total <= _settings.max_bytes:
+                break
+            _remove(path)
+            removed += 1
+            freed += size
+            total -= size
+    return removed, freed
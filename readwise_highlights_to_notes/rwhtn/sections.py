@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from rwhtn.anchoring import anchor_tokens
+
+
+@dataclass
+class Section:
+    level: int
+    title: str
+    offset: int  # character offset of the heading in `html_stream`
+    token: int  # token offset of the heading in `anchor_tokens(html_stream)`
+    parent: Optional[int] = None  # index of the enclosing section
+    children: List[int] = field(default_factory=list)
+
+
+class SectionTree:
+    """
+    The document outline: one section per heading, nested by heading level, in document order.
+
+    Highlights are placed by token position (see `transform.place_highlights_in_read_order`);
+    the section enclosing a position is the last heading starting at or before it, found by
+    binary search over the headings' token offsets.
+    """
+
+    def __init__(self, sections: List[Section]) -> None:
+        self.sections = sections
+        self.roots = [i for i, s in enumerate(sections) if s.parent is None]
+        self._tokens = [s.token for s in sections]
+
+    @classmethod
+    def build(cls, headings: Sequence[Tuple[int, str]], heading_offsets: Sequence[int], html_stream: str) -> "SectionTree":
+        if len(headings) != len(heading_offsets):
+            return cls([])
+        sections: List[Section] = []
+        stack: List[int] = []
+        token = 0
+        prev = 0
+        for (level, title), offset in zip(headings, heading_offsets):
+            # Offsets fall on part boundaries, so counting tokens segment by segment matches
+            # tokenizing the whole stream.
+            token += len(anchor_tokens(html_stream[prev:offset]))
+            prev = max(prev, offset)
+            while stack and sections[stack[-1]].level >= level:
+                stack.pop()
+            parent = stack[-1] if stack else None
+            index = len(sections)
+            sections.append(Section(level=level, title=title, offset=offset, token=token, parent=parent))
+            if parent is not None:
+                sections[parent].children.append(index)
+            stack.append(index)
+        return cls(sections)
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def section_at(self, token: Optional[int]) -> Optional[int]:
+        if token is None or token < 0:
+            return None
+        i = bisect_right(self._tokens, token) - 1
+        return i if i >= 0 else None
+
+    def path(self, index: Optional[int]) -> List[int]:
+        """
+        Section indices from the outermost enclosing section down to `index`.
+        """
+        out: List[int] = []
+        while index is not None:
+            out.append(index)
+            index = self.sections[index].parent
+        out.reverse()
+        return out
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import string
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# Fields each fragment may use, as `{name}` (str.format syntax, including `{name:spec}`).
+NOTE_FIELDS = ("title", "source_url", "cover_image_url", "exported_at", "frontmatter")
+HEADING_FIELDS = ("heading", "level", "hashes")
+HIGHLIGHT_FIELDS = ("text", "note", "location", "highlighted_at", "url", "id", "color")
+
+# Fragment name -> (fields, built-in source). A template directory overrides any of them with
+# `<name>.md`; missing files keep the built-in fragment.
+FRAGMENTS: Dict[str, Tuple[Sequence[str], str]] = {
+    "frontmatter": (NOTE_FIELDS, "---\n{frontmatter}---\n\n"),
+    "title": (NOTE_FIELDS, "# {title}\n\n"),
+    "cover": (NOTE_FIELDS, '<div align="center">\n  <img src="{cover_image_url}" width="220" />\n</div>\n\n'),
+    "source": (NOTE_FIELDS, "Source: {source_url}\n\n"),
+    "exported": (NOTE_FIELDS, "Exported at: `{exported_at}`\n\n"),
+    "heading": (HEADING_FIELDS, "\n{hashes} {heading}\n\n"),
+    "bullet": (HIGHLIGHT_FIELDS, "- {text}\n"),
+    "image": (HIGHLIGHT_FIELDS, "\n{text}\n\n"),
+}
+
+_CONVERSIONS: Dict[str, Callable[[Any], str]] = {"r": repr, "s": str, "a": ascii}
+
+# (literal, field or None, conversion or None, format spec) for each piece of a fragment.
+Part = Tuple[str, Optional[str], Optional[str], str]
+
+
+def compile_fragment(source: str, fields: Sequence[str], origin: str = "<template>") -> Tuple[Part, ...]:
+    """
+    Parse and validate a `str.format`-style fragment once, so rendering is a loop over
+    literals and `format()` calls (see `render_fragment`).
+    """
+    try:
+        parsed = list(string.Formatter().parse(source))
+    except ValueError as e:
+        raise ValueError(f"{origin}: {e}") from e
+    parts: List[Part] = []
+    for literal, field, spec, conversion in parsed:
+        if field is not None:
+            if field not in fields:
+                raise ValueError(f"{origin}: unknown field {{{field}}}; available: {', '.join(fields)}")
+            if spec and "{" in spec:
+                raise ValueError(f"{origin}: nested fields in a format spec are not supported ({{{field}:{spec}}})")
+            if conversion and conversion not in _CONVERSIONS:
+                raise ValueError(f"{origin}: unknown conversion !{conversion} in {{{field}}}")
+        parts.append((literal, field, conversion, spec or ""))
+    return tuple(parts)
+
+
+def render_fragment(parts: Tuple[Part, ...], values: Dict[str, Any]) -> str:
+    out: List[str] = []
+    for literal, field, conversion, spec in parts:
+        if literal:
+            out.append(literal)
+        if field is None:
+            continue
+        value = values[field]
+        if conversion:
+            value = _CONVERSIONS[conversion](value)
+        out.append(format(value, spec))
+    return "".join(out)
+
+
+def _volatile_line_pattern(source: str) -> Optional["re.Pattern[str]"]:
+    # Lines of the rendered `exported` fragment that carry the timestamp, with any field
+    # matching anything: they change on every render without the note changing.
+    lines: List[str] = []
+    for line in source.splitlines():
+        if "{exported_at" not in line:
+            continue
+        pattern = ""
+        for literal, field, _, _ in string.Formatter().parse(line):
+            pattern += re.escape(literal)
+            if field is not None:
+                pattern += ".*?"
+        lines.append(pattern)
+    return re.compile("|".join(f"(?:{p})" for p in lines)) if lines else None
+
+
+@dataclass(frozen=True)
+class NoteTemplate:
+    origin: str
+    fragments: Dict[str, Tuple[Part, ...]]
+    volatile_pattern: Optional["re.Pattern[str]"]
+    fingerprint: str  # hash of the overriding fragment files; "" for the built-in layout
+
+    def render(self, fragment: str, values: Dict[str, Any]) -> str:
+        return render_fragment(self.fragments[fragment], values)
+
+    def is_volatile_line(self, line: str) -> bool:
+        return bool(self.volatile_pattern and self.volatile_pattern.fullmatch(line.rstrip("\r\n")))
+
+
+def _build(directory: Optional[str], sources: Dict[str, Tuple[str, str]], overridden: Sequence[str]) -> NoteTemplate:
+    fragments = {
+        name: compile_fragment(source, FRAGMENTS[name][0], origin) for name, (source, origin) in sources.items()
+    }
+    digest = hashlib.sha256()
+    for name in overridden:
+        digest.update(f"{name}\0{sources[name][0]}\0".encode("utf-8"))
+    return NoteTemplate(
+        origin=directory or "<built-in>",
+        fragments=fragments,
+        volatile_pattern=_volatile_line_pattern(sources["exported"][0]),
+        fingerprint=digest.hexdigest() if overridden else "",
+    )
+
+
+_directory: Optional[str] = None
+_cache: Dict[Optional[str], Tuple[Tuple[Any, ...], NoteTemplate]] = {}
+_lock = threading.Lock()
+
+
+def configure_note_template(directory: Optional[str]) -> None:
+    """
+    Render notes with the fragments in `directory` (None: the built-in layout).
+    """
+    global _directory
+    if directory and not os.path.isdir(directory):
+        raise RuntimeError(f"Template directory not found: {directory!r}")
+    _directory = os.path.abspath(directory) if directory else None
+    if directory:
+        load_note_template(_directory)  # surface template errors before any note is rendered
+
+
+def load_note_template(directory: Optional[str] = None) -> NoteTemplate:
+    """
+    The compiled template for `directory` (default: the configured one). Compiled once per
+    process and reused until a fragment file's mtime or size changes, so each note only pays
+    a few `stat` calls.
+    """
+    directory = _directory if directory is None else directory
+    signature: List[Any] = []
+    paths: Dict[str, str] = {}
+    if directory:
+        for name in FRAGMENTS:
+            path = os.path.join(directory, f"{name}.md")
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+                continue
+            paths[name] = path
+            signature.append((st.st_mtime_ns, st.st_size))
+    key = tuple(signature)
+
+    with _lock:
+        cached = _cache.get(directory)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+    sources: Dict[str, Tuple[str, str]] = {}
+    for name, (_, builtin) in FRAGMENTS.items():
+        if name in paths:
+            with open(paths[name], "r", encoding="utf-8") as f:
+                sources[name] = (f.read(), paths[name])
+        else:
+            sources[name] = (builtin, f"<built-in {name}>")
+    template = _build(directory, sources, sorted(paths))
+    with _lock:
+        _cache[directory] = (key, template)
+    return template
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Set
+
+from rwhtn.catalog import normalize_title
+
+
+# Minimum share of a query's trigrams a title must contain to count as a fuzzy match.
+DEFAULT_MATCH_THRESHOLD = 0.6
+# A fuzzy winner must beat the runner-up by this much, otherwise the query is ambiguous.
+AMBIGUITY_MARGIN = 0.1
+
+
+def normalize_for_matching(text: str) -> str:
+    """
+    `normalize_title` plus punctuation folded to spaces, so "Foo: Bar" and "foo bar" compare equal.
+    """
+    return re.sub(r"\s+", " ", re.sub(r"[\W_]+", " ", normalize_title(text))).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass(frozen=True)
+class TitleMatch:
+    doc: Dict[str, Any]
+    score: float
+    substring: bool  # the query occurs verbatim (after normalization) in the title
+    full: bool  # the query is the whole title
+
+
+class TitleIndex:
+    """
+    Trigram index over Shortlist titles, built once per run.
+
+    A query first looks for titles containing it (the original substring semantics, now
+    answered from the postings instead of a scan); failing that, titles are ranked by the
+    share of the query's trigrams they contain, which tolerates typos and punctuation.
+    """
+
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = [d for d in docs if (d.get("title") or "").strip()]
+        self._titles = [normalize_for_matching(d.get("title") or "") for d in self.docs]
+        self._postings: Dict[str, List[int]] = {}
+        for i, title in enumerate(self._titles):
+            # Padding lets word starts/ends carry weight without affecting substring lookups.
+            for gram in _trigrams(f"  {title} "):
+                self._postings.setdefault(gram, []).append(i)
+
+    def search(self, query: str, *, threshold: float = DEFAULT_MATCH_THRESHOLD) -> List[TitleMatch]:
+        """
+        Substring matches (score 1.0) in Shortlist order if there are any, otherwise fuzzy
+        matches at or above `threshold`, best first.
+        """
+        q = normalize_for_matching(query)
+        if not q:
+            return []
+        grams = _trigrams(q)
+        if not grams:
+            # One- or two-character queries: nothing to index on, scan instead.
+            return [self._match(i, 1.0, q) for i, title in enumerate(self._titles) if q in title]
+
+        counts: Counter = Counter()
+        for gram in grams:
+            counts.update(self._postings.get(gram, ()))
+
+        substring = sorted(i for i, c in counts.items() if c == len(grams) and q in self._titles[i])
+        if substring:
+            return [self._match(i, 1.0, q) for i in substring]
+
+        # Ties go to the shorter title (closer to the query), then to Shortlist order.
+        ranked = sorted(
+            (i for i, c in counts.items() if c / len(grams) >= threshold),
+            key=lambda i: (-counts[i], len(self._titles[i]), i),
+        )
+        return [self._match(i, counts[i] / len(grams), q) for i in ranked]
+
+    def _match(self, i: int, score: float, q: str) -> TitleMatch:
+        title = self._titles[i]
+        return TitleMatch(doc=self.docs[i], score=score, substring=q in title, full=q == title)
@@ -3,16 +3,21 @@ from __future__ import annotations
 import os
 import re
 import urllib.parse
+from dataclasses import dataclass
 from html.parser import HTMLParser
 from typing import Any, Dict, List, Optional, Tuple
 
+from rwhtn.anchoring import PATTERN_WORDS, anchor_positions, anchor_tokens
 from rwhtn.config import compact_whitespace
 
 
+def _strip_markdown_links(text: str) -> str:
+    text = re.sub(r"!\[[^\]]*\]\([^)]+\)", "", text or "")  # images
+    return re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)  # links
+
+
 def strip_markdown(text: str) -> str:
-    text = text or ""
-    text = re.sub(r"!\[[^\]]*\]\([^)]+\)", "", text)  # images
-    text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)  # links
+    text = _strip_markdown_links(text)
     text = text.replace("`", "")
     text = text.replace("**", "").replace("*", "").replace("__", "").replace("_", "")
     return compact_whitespace(text)
@@ -40,82 +45,157 @@ def is_image_only_highlight(text: str) -> bool:
     return bool(re.fullmatch(r"!\[[^\]]*\]\([^)]+\)", (text or "").strip()))
 
 
-class HeadingParser(HTMLParser):
+def image_basename_from_src(src: str) -> str:
+    base = ""
+    try:
+        parsed = urllib.parse.urlparse(src)
+        query = urllib.parse.parse_qs(parsed.query)
+        inner = query.get("url", [None])[0]
+        if inner:
+            inner = urllib.parse.unquote(inner)
+            base = os.path.basename(urllib.parse.urlparse(inner).path)
+        if not base:
+            base = os.path.basename(parsed.path)
+    except Exception:
+        base = ""
+    return base
+
+
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# Stream parts are joined into a block every this many parts, so a long document's stream is
+# not held as hundreds of thousands of small strings while it is built.
+_STREAM_BLOCK_PARTS = 4096
+
+
+@dataclass(frozen=True)
+class HtmlAnalysis:
+    headings: List[Tuple[int, str]]
+    html_stream: str
+    # Character offset in `html_stream` where each heading's text starts (parallel to `headings`).
+    heading_offsets: List[int]
+
+
+class HtmlAnalysisParser(HTMLParser):
+    """
+    One tokenization pass over a Reader document's HTML producing its headings, the
+    image-anchor stream (text plus ` [IMG:<basename>] ` markers) and each heading's offset.
+
+    The stream is whitespace-compacted as it is built, so offsets index straight into the
+    final `html_stream` (identical to `compact_whitespace(" ".join(parts))`).
+    """
+
     def __init__(self) -> None:
         super().__init__()
+        self._blocks: List[str] = []
+        self._out: List[str] = []
+        self._length = 0
         self._level: Optional[int] = None
-        self._buf: List[str] = []
+        self._heading_buf: List[str] = []
+        self._heading_offset = 0
         self.headings: List[Tuple[int, str]] = []
+        self.heading_offsets: List[int] = []
+
+    def _emit(self, text: str) -> None:
+        # Parts are space-separated, and runs of whitespace collapse to one space.
+        body = " ".join(text.split())
+        if not body:
+            return
+        if self._length:
+            self._out.append(" ")
+            self._length += 1
+        self._out.append(body)
+        self._length += len(body)
+        if len(self._out) >= _STREAM_BLOCK_PARTS:
+            self._blocks.append("".join(self._out))
+            self._out = []
+
+    def _next_offset(self) -> int:
+        # Where the next emitted character will land (after its separating space, if any).
+        return self._length + 1 if self._length else 0
 
     def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
-        if tag in {"h1", "h2", "h3", "h4", "h5", "h6"}:
+        if tag in _HEADING_TAGS:
             self._level = int(tag[1])
-            self._buf = []
+            self._heading_buf = []
+            self._heading_offset = self._next_offset()
+            return
+        if tag != "img":
+            return
+        attr_map = {k: v for k, v in attrs}
+        src = attr_map.get("src") or attr_map.get("data-src")
+        base = image_basename_from_src(src) if src else ""
+        if base:
+            self._emit(f"[IMG:{base}]")
 
     def handle_endtag(self, tag: str) -> None:
-        if self._level is None:
+        if self._level is None or tag != f"h{self._level}":
             return
-        if tag != f"h{self._level}":
-            return
-        text = compact_whitespace("".join(self._buf))
+        text = compact_whitespace("".join(self._heading_buf))
         if text:
             self.headings.append((self._level, text))
+            self.heading_offsets.append(self._heading_offset)
         self._level = None
-        self._buf = []
+        self._heading_buf = []
 
     def handle_data(self, data: str) -> None:
+        if not data:
+            return
         if self._level is not None:
-            self._buf.append(data)
+            self._heading_buf.append(data)
+        self._emit(data)
 
+    def result(self) -> HtmlAnalysis:
+        return HtmlAnalysis(
+            headings=self.headings,
+            html_stream="".join(self._blocks) + "".join(self._out),
+            heading_offsets=self.heading_offsets,
+        )
 
-class HtmlStreamParser(HTMLParser):
-    def __init__(self) -> None:
-        super().__init__()
-        self.parts: List[str] = []
 
-    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
-        if tag != "img":
-            return
-        attr_map = {k: v for k, v in attrs}
-        src = attr_map.get("src") or attr_map.get("data-src")
-        if not src:
-            return
+def analyze_html(html: str) -> HtmlAnalysis:
+    if not html or not isinstance(html, str):
+        return HtmlAnalysis(headings=[], html_stream="", heading_offsets=[])
+    parser = HtmlAnalysisParser()
+    parser.feed(html)
+    parser.close()
+    return parser.result()
 
-        base = ""
-        try:
-            parsed = urllib.parse.urlparse(src)
-            query = urllib.parse.parse_qs(parsed.query)
-            inner = query.get("url", [None])[0]
-            if inner:
-                inner = urllib.parse.unquote(inner)
-                base = os.path.basename(urllib.parse.urlparse(inner).path)
-            if not base:
-                base = os.path.basename(parsed.path)
-        except Exception:
-            base = ""
 
-        if base:
-            self.parts.append(f" [IMG:{base}] ")
+class HtmlAnalysisStream:
+    """
+    `analyze_html` for HTML that arrives in pieces (see `json_stream.ReaderPayloadDecoder`).
 
-    def handle_data(self, data: str) -> None:
-        if data:
-            self.parts.append(data)
+    Pieces are handed to the parser cut just before a `<`, so no text run is ever split
+    across two feeds and the result is identical to analyzing the whole string at once.
+    """
+
+    def __init__(self) -> None:
+        self._parser = HtmlAnalysisParser()
+        self._tail = ""
+
+    def feed(self, text: str) -> None:
+        data = self._tail + text
+        cut = data.rfind("<")
+        if cut <= 0:
+            self._tail = data
+            return
+        self._parser.feed(data[:cut])
+        self._tail = data[cut:]
+
+    def close(self) -> HtmlAnalysis:
+        if self._tail:
+            self._parser.feed(self._tail)
+            self._tail = ""
+        self._parser.close()
+        return self._parser.result()
 
 
 def extract_headings_from_html(html: str) -> List[Tuple[int, str]]:
-    if not html or not isinstance(html, str):
-        return []
-    parser = HeadingParser()
-    parser.feed(html)
-    return parser.headings
+    return analyze_html(html).headings
 
 
 def build_html_stream(html: str) -> str:
-    if not html or not isinstance(html, str):
-        return ""
-    parser = HtmlStreamParser()
-    parser.feed(html)
-    return compact_whitespace(" ".join(parser.parts))
+    return analyze_html(html).html_stream
 
 
 def norm(value: str) -> str:
@@ -146,37 +226,72 @@ def strip_heading_prefix(value: str) -> str:
     return stripped.strip() or value
 
 
-def sort_highlights_in_read_order(highlights: List[Dict[str, Any]], html_stream: str) -> List[Dict[str, Any]]:
-    location_type = None
-    for h in highlights:
-        if h.get("location_type"):
-            location_type = h.get("location_type")
-            break
-
-    def effective_offset(h: Dict[str, Any]) -> int:
+def highlight_anchor_pattern(h: Dict[str, Any]) -> List[str]:
+    """
+    Leading tokens of a highlight as they appear in the HTML stream: its image marker for an
+    image-only highlight, otherwise its first words. Only link/image syntax is removed: emphasis
+    markers are punctuation to `anchor_tokens`, as in the stream, so both tokenize alike.
+    """
+    text = h.get("text") or ""
+    if not isinstance(text, str):
+        return []
+    if is_image_only_highlight(text):
+        base = image_basename_from_markdown_image(text)
+        return anchor_tokens(f"[IMG:{base}]") if base else []
+    return anchor_tokens(_strip_markdown_links(text))[:PATTERN_WORDS]
+
+
+def anchor_highlights(highlights: List[Dict[str, Any]], html_stream: str) -> List[int]:
+    """
+    Token position of each highlight (in the given order) in `anchor_tokens(html_stream)`,
+    found in one multi-pattern pass. One that cannot be anchored takes the position of the
+    highlight before it (-1 if none was anchored yet).
+    """
+    if not html_stream:
+        return [-1] * len(highlights)
+    anchors = anchor_positions([highlight_anchor_pattern(h) for h in highlights], anchor_tokens(html_stream))
+    positions: List[int] = []
+    last = -1
+    for pos in anchors:
+        if pos is not None:
+            last = pos
+        positions.append(pos if pos is not None else last)
+    return positions
+
+
+def place_highlights_in_read_order(highlights: List[Dict[str, Any]], html_stream: str) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Order by where each highlight's text sits in the document, keeping each one's token
+    position (see `anchor_highlights`) for section bucketing.
+
+    Highlights are first ordered by `location` (then `highlighted_at`), which is exact for
+    offsets but coarse for pages and absent (or 0) for some highlights. All of them are then
+    anchored in the HTML stream; one that cannot be anchored keeps its place right after the
+    highlight that preceded it. Anchors never reorder highlights with an `offset` location:
+    one anchored before an earlier offset is moved up to it.
+    """
+
+    def location_key(h: Dict[str, Any]) -> Tuple[int, str]:
         try:
-            loc_i = int(h.get("location"))
+            loc_i = int(h.get("location")) or 10**18
         except Exception:
             loc_i = 10**18
+        highlighted_at = h.get("highlighted_at") or ""
+        return (loc_i, highlighted_at if isinstance(highlighted_at, str) else "")
 
-        if loc_i not in (0, 10**18):
-            return loc_i
-
-        if location_type == "offset" and html_stream:
-            text = h.get("text") or ""
-            if isinstance(text, str) and "![](" in text:
-                base = image_basename_from_markdown_image(text)
-                if base:
-                    pos = html_stream.find(f"[IMG:{base}]")
-                    if pos >= 0:
-                        return pos
-        return loc_i
+    by_location = sorted(highlights, key=location_key)
+    positions = anchor_highlights(by_location, html_stream)
+    floor = -1
+    for rank, h in enumerate(by_location):
+        if h.get("location_type") == "offset" and location_key(h)[0] != 10**18:
+            positions[rank] = max(positions[rank], floor)
+            floor = positions[rank]
+    order = sorted(range(len(by_location)), key=lambda rank: (positions[rank], rank))
+    return [(positions[rank], by_location[rank]) for rank in order]
 
-    def key(h: Dict[str, Any]) -> Tuple[int, str]:
-        highlighted_at = h.get("highlighted_at") or ""
-        return (effective_offset(h), highlighted_at if isinstance(highlighted_at, str) else "")
 
-    return sorted(highlights, key=key)
+def sort_highlights_in_read_order(highlights: List[Dict[str, Any]], html_stream: str) -> List[Dict[str, Any]]:
+    return [h for _, h in place_highlights_in_read_order(highlights, html_stream)]
 
 
 def dedupe_exact_highlights_in_place_order(highlights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests import exceptions as req_exc
+from requests.adapters import HTTPAdapter
+
+from rwhtn import cassette, response_cache
+from rwhtn.config import RawPayloadWriter, iter_raw_payload
+from rwhtn.json_stream import PayloadDecoder
+from rwhtn.ratelimit import rate_limiter
+
+
+@dataclass(frozen=True)
+class TransportSettings:
+    timeout: int = 60
+    max_retries: int = 10
+    pool_connections: int = 4
+    pool_maxsize: int = 16
+
+
+# Bytes read per chunk from a streamed response body (see `stream_json`).
+STREAM_CHUNK_BYTES = 64 * 1024
+
+_settings = TransportSettings()
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def configure_transport(
+    *,
+    timeout: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    pool_connections: Optional[int] = None,
+    pool_maxsize: Optional[int] = None,
+) -> TransportSettings:
+    """
+    Update the process-wide transport settings. Pool sizes only apply to sessions created
+    afterwards, so existing sessions are closed and rebuilt lazily.
+    """
+    global _settings
+    changes: Dict[str, Any] = {}
+    if timeout is not None:
+        changes["timeout"] = max(1, int(timeout))
+    if max_retries is not None:
+        changes["max_retries"] = max(0, int(max_retries))
+    if pool_connections is not None:
+        changes["pool_connections"] = max(1, int(pool_connections))
+    if pool_maxsize is not None:
+        changes["pool_maxsize"] = max(1, int(pool_maxsize))
+    _settings = replace(_settings, **changes)
+    if "pool_connections" in changes or "pool_maxsize" in changes:
+        close_sessions()
+    return _settings
+
+
+def transport_settings() -> TransportSettings:
+    return _settings
+
+
+def _new_session(token: str) -> requests.Session:
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Token {token}"})
+    adapter = HTTPAdapter(pool_connections=_settings.pool_connections, pool_maxsize=_settings.pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(token: str) -> requests.Session:
+    """
+    One keep-alive session per token, shared by the Reader and Readwise clients.
+    """
+    with _sessions_lock:
+        session = _sessions.get(token)
+        if session is None:
+            session = _new_session(token)
+            _sessions[token] = session
+        return session
+
+
+def close_sessions() -> None:
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+def backoff_seconds(attempt: int, retry_after_seconds: Optional[int]) -> float:
+    if retry_after_seconds is not None and retry_after_seconds > 0:
+        return float(retry_after_seconds)
+    return float(min(30, 1.5**attempt))
+
+
+def sleep_backoff(attempt: int, retry_after_seconds: Optional[int]) -> None:
+    time.sleep(backoff_seconds(attempt, retry_after_seconds))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[int]:
+    return int(value) if value and value.isdigit() else None
+
+
+def get_json(
+    *,
+    url: str,
+    token: str,
+    params: Dict[str, Any],
+    api_name: str = "Readwise",
+    timeout: Optional[int] = None,
+    max_retries: Optional[int] = None,
+) -> Dict[str, Any]:
+    replayed = cassette.replay(url, params)
+    if replayed is not None:
+        return replayed
+    cached = response_cache.lookup(url, token, params)
+    if cached is not None:
+        cassette.record(url, params, cached)
+        return cached
+
+    resp = _send(url=url, token=token, params=params, api_name=api_name, timeout=timeout, max_retries=max_retries)
+    payload = resp.json()
+    payload = payload if isinstance(payload, dict) else {"results": payload}
+    response_cache.store(url, token, params, payload)
+    cassette.record(url, params, payload)
+    return payload
+
+
+def decode_entry(
+    path: str, decoder: PayloadDecoder, *, url: str, params: Dict[str, Any], cached: bool = True
+) -> Dict[str, Any]:
+    """
+    Feed the payload of a response cache (or, with `cached=False`, cassette) entry to `decoder`
+    chunk by chunk, as if it were arriving over the network, recording it when a cassette is
+    being recorded. An unreadable cache entry is discarded before the error is raised.
+    """
+    writer = cassette.open_writer(url, params) if cached else None
+    try:
+        for chunk in iter_raw_payload(path, STREAM_CHUNK_BYTES):
+            decoder.feed(chunk)
+            if writer is not None:
+                writer.write(chunk)
+        payload = decoder.close()
+    except BaseException as e:
+        if writer is not None:
+            writer.abort()
+        if isinstance(e, (OSError, ValueError)):
+            if cached:
+                response_cache.discard(path)
+            raise RuntimeError(f"Unreadable {'cached' if cached else 'recorded'} response {path}: {e}") from e
+        raise
+    if writer is not None:
+        writer.commit()
+    return payload
+
+
+def stream_json(
+    *,
+    url: str,
+    token: str,
+    params: Dict[str, Any],
+    decoder: PayloadDecoder,
+    api_name: str = "Readwise",
+    timeout: Optional[int] = None,
+    max_retries: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    `get_json` for large responses: the body is fed to `decoder` chunk by chunk as it arrives
+    and copied raw into the response cache / cassette on disk, so it is never held in memory
+    whole. Cache and cassette hits are streamed from disk the same way (`decode_entry`).
+    """
+    replayed = cassette.replay_path(url, params)
+    if replayed is not None:
+        return decode_entry(replayed, decoder, url=url, params=params, cached=False)
+    cached = response_cache.lookup_path(url, token, params)
+    if cached is not None:
+        return decode_entry(cached, decoder, url=url, params=params)
+
+    resp = _send(
+        url=url, token=token, params=params, api_name=api_name, timeout=timeout, max_retries=max_retries, stream=True
+    )
+    writers: List[RawPayloadWriter] = []
+    try:
+        for writer in (response_cache.open_writer(url, token, params), cassette.open_writer(url, params)):
+            if writer is not None:
+                writers.append(writer)
+        for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+            decoder.feed(chunk)
+            for writer in writers:
+                writer.write(chunk)
+        payload = decoder.close()
+    except BaseException as e:
+        for writer in writers:
+            writer.abort()
+        if isinstance(e, req_exc.RequestException):
+            raise RuntimeError(f"{api_name} API request failed: {e}") from e
+        if isinstance(e, ValueError):
+            raise RuntimeError(f"{api_name} API returned invalid JSON: {e}") from e
+        raise
+    finally:
+        resp.close()
+    for writer in writers:
+        writer.commit()
+    return payload
+
+
+def _send(
+    *,
+    url: str,
+    token: str,
+    params: Dict[str, Any],
+    api_name: str,
+    timeout: Optional[int],
+    max_retries: Optional[int],
+    stream: bool = False,
+) -> requests.Response:
+    """
+    GET with rate limiting and 429 retries; returns the first successful response.
+    """
+    timeout = _settings.timeout if timeout is None else timeout
+    max_retries = _settings.max_retries if max_retries is None else max_retries
+    session = get_session(token)
+    limiter = rate_limiter()
+
+    attempt = 0
+    while True:
+        limiter.acquire(url)
+        try:
+            resp = session.get(url, params=params, timeout=timeout, stream=stream)
+        except req_exc.RequestException as e:
+            raise RuntimeError(f"{api_name} API request failed: {e}") from e
+        if resp.status_code == 429:
+            resp.close()
+            retry_after_seconds = parse_retry_after(resp.headers.get("Retry-After"))
+            attempt += 1
+            if attempt > max_retries:
+                raise RuntimeError("Hit rate limit repeatedly (429); aborting.")
+            if limiter.enabled:
+                # Every thread sharing this endpoint's bucket waits out the penalty.
+                limiter.penalize(url, backoff_seconds(attempt, retry_after_seconds))
+            else:
+                sleep_backoff(attempt, retry_after_seconds)
+            continue
+        try:
+            resp.raise_for_status()
+        except Exception:
+            resp.close()
+            raise
+        return resp
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from rwhtn.json_stream import ReaderPayloadDecoder
+from rwhtn.transform import HtmlAnalysisStream, analyze_html
+
+
+class CollectingSink:
+    def __init__(self) -> None:
+        self.parts = []
+
+    def feed(self, text: str) -> None:
+        self.parts.append(text)
+
+    def close(self) -> str:
+        return "".join(self.parts)
+
+
+PAYLOAD = {
+    "count": 2,
+    "nextPageCursor": None,
+    "results": [
+        {
+            "id": "a",
+            "reading_progress": 0.35,
+            "word_count": 1.5e3,
+            "offset": -12,
+            "small": 2.5e-7,
+            "saved": True,
+            "html_content": '<h1>Title</h1><p>café "quoted" \\ back\nslash \U0001f600 emoji</p>',
+        },
+        {"id": "b", "reading_progress": 1, "html_content": "", "tags": {"x": [1, 2.25, None]}},
+    ],
+}
+
+
+def decode_in_pieces(raw: bytes, size: int, html_sink=CollectingSink):
+    decoder = ReaderPayloadDecoder(html_sink=html_sink)
+    for i in range(0, len(raw), size):
+        decoder.feed(raw[i : i + size])
+    return decoder.close()
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_decoder_matches_json_loads_when_fed_one_byte_at_a_time(ensure_ascii):
+    raw = json.dumps(PAYLOAD, ensure_ascii=ensure_ascii).encode("utf-8")
+    assert decode_in_pieces(raw, 1) == json.loads(raw)
+
+
+def test_decoder_matches_json_loads_at_every_split_point():
+    raw = json.dumps(PAYLOAD).encode("utf-8")
+    expected = json.loads(raw)
+    for cut in range(1, len(raw)):
+        decoder = ReaderPayloadDecoder(html_sink=CollectingSink)
+        decoder.feed(raw[:cut])
+        decoder.feed(raw[cut:])
+        assert decoder.close() == expected, cut
+
+
+def test_decoder_accepts_number_at_end_of_input():
+    assert decode_in_pieces(b'{"results": [], "count": 12.5}', 1) == {"results": [], "count": 12.5}
+
+
+def test_decoder_rejects_truncated_payload():
+    decoder = ReaderPayloadDecoder(html_sink=CollectingSink)
+    decoder.feed(b'{"results": [{"id": "a", "html_content": "<p>unterminated')
+    with pytest.raises(ValueError):
+        decoder.close()
+
+
+HTML = (
+    "<html><body><h1>The Book</h1><p>Intro <em>text</em> &amp; more.</p>"
+    '<h2 id="c1">Chapter <b>One</b></h2><p>First paragraph.</p><img src="https://x/a.png" alt="a">'
+    "<h3>Section 1.1</h3><p>Second &lt;paragraph&gt;.</p><h2>Chapter Two</h2><p>Trailing</p></body></html>"
+    " text after the last tag"
+)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_html_analysis_stream_matches_analyze_html(size):
+    stream = HtmlAnalysisStream()
+    for i in range(0, len(HTML), size):
+        stream.feed(HTML[i : i + size])
+    assert stream.close() == analyze_html(HTML)
+
+
+def test_decoder_streams_html_content_into_analysis():
+    raw = json.dumps({"results": [{"id": "a", "reading_progress": 0.5, "html_content": HTML}]}).encode("utf-8")
+    payload = decode_in_pieces(raw, 5, html_sink=HtmlAnalysisStream)
+    assert payload["results"][0]["html_content"] == analyze_html(HTML)
+    assert payload["results"][0]["reading_progress"] == 0.5
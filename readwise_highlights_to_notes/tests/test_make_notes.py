@@ -0,0 +1,117 @@
+import importlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from rwhtn import async_api, config, orchestrate, reader_api, readwise_api, response_cache
+from rwhtn.manifest import exported_book_state
+
+
+class FakeReadwise:
+    """
+    Just enough of the Reader list, books and export endpoints for `08_make_notes.py`.
+    """
+
+    def __init__(self):
+        self.books = [
+            {
+                "id": 1,
+                "title": "Book",
+                "source_url": "https://example.com/book",
+                "updated": "2025-01-01T00:00:00Z",
+                "last_highlight_at": "2025-01-01T00:00:00Z",
+            }
+        ]
+        self.highlights = [
+            {"id": 10, "text": "first words", "location": 1, "location_type": "offset", "updated_at": "2025-01-01T00:00:00Z"}
+        ]
+        self.doc = {
+            "id": "d1",
+            "title": "Book",
+            "source_url": "https://example.com/book",
+            "updated_at": "2025-01-01T00:00:00Z",
+            "parent_id": None,
+            "html_content": "<h1>Book</h1><p>first words. second words.</p>",
+        }
+
+    def respond(self, path, q):
+        if path.endswith("/books/"):
+            rows = [b for b in self.books if b["updated"] > q.get("updated__gt", "")]
+            return {"count": len(rows), "next": None, "results": rows}
+        if path.endswith("/export/"):
+            rows = [h for h in self.highlights if h["updated_at"] > q.get("updatedAfter", "")]
+            return {"results": [{"user_book_id": 1, "highlights": rows}] if rows else [], "nextPageCursor": None}
+        doc = dict(self.doc)
+        if not q.get("id"):
+            doc.pop("html_content")
+        return {"results": [doc], "count": 1, "nextPageCursor": None}
+
+    def add_highlight(self, highlight_id, text, location, at):
+        self.highlights.append(
+            {"id": highlight_id, "text": text, "location": location, "location_type": "offset", "updated_at": at}
+        )
+        self.books[0].update(updated=at, last_highlight_at=at)
+
+
+@pytest.fixture
+def readwise(tmp_path, monkeypatch):
+    fake = FakeReadwise()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            body = json.dumps(fake.respond(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    for module in (readwise_api, async_api):
+        monkeypatch.setattr(module, "READWISE_BOOKS_URL", f"{base}/api/v2/books/")
+        monkeypatch.setattr(module, "READWISE_EXPORT_URL", f"{base}/api/v2/export/")
+    for module in (reader_api, async_api):
+        monkeypatch.setattr(module, "READER_LIST_URL", f"{base}/api/v3/list/")
+    monkeypatch.setattr(config, "_cache_root", str(tmp_path / "cache"))
+    monkeypatch.setattr(orchestrate, "FINAL_NOTES_DIR", str(tmp_path / "notes"))
+    monkeypatch.setattr(response_cache, "_settings", response_cache.ResponseCacheSettings())
+    monkeypatch.setenv("READWISE_TOKEN", "token")
+    yield fake
+    server.shutdown()
+
+
+def _make_notes(*args):
+    assert importlib.import_module("08_make_notes").main(["--all-shortlist", *args]) == 0
+
+
+def test_skip_unchanged_picks_up_a_new_highlight_despite_cached_exports(readwise, tmp_path):
+    note = tmp_path / "notes" / "book.md"
+    _make_notes()
+    _make_notes()  # a delta export that finds nothing new
+    assert "first words" in note.read_text()
+
+    readwise.add_highlight(11, "second words", 2, "2025-02-01T00:00:00Z")
+    _make_notes("--skip-unchanged")
+    assert "second words" in note.read_text()
+
+    readwise.add_highlight(12, "third words", 3, "2025-03-01T00:00:00Z")
+    _make_notes("--skip-unchanged")
+    _make_notes("--skip-unchanged")
+    assert "third words" in note.read_text()
+
+
+def test_manifest_records_the_newest_highlight_the_export_returned():
+    book = {"id": 1, "updated": "2025-02-01T00:00:00Z", "last_highlight_at": "2025-02-01T00:00:00Z"}
+    lagging = [{"id": 10, "updated_at": "2025-01-01T00:00:00Z"}]
+    current = lagging + [{"id": 11, "updated_at": "2025-02-01T00:00:00.000Z"}]
+    assert exported_book_state(book, lagging)["last_highlight_at"] == "2025-01-01T00:00:00Z"
+    assert exported_book_state(book, current) == book
@@ -0,0 +1,93 @@
+import random
+
+from rwhtn.near_dupes import containment, dedupe_near_duplicate_highlights, minhash, near_duplicate_clusters, shingles
+
+PARAGRAPH = (
+    "The most important property of a program is whether it accomplishes the intention of its user, "
+    "and everything else we discuss in this chapter, from performance to readability, only matters "
+    "once that first property holds for the inputs people actually give it in practice every day."
+)
+SENTENCE = "everything else we discuss in this chapter, from performance to readability, only matters"
+
+
+def test_containment_of_sentence_in_paragraph():
+    a, b = shingles(SENTENCE), shingles(PARAGRAPH)
+    assert containment(a, b) == 1.0
+    assert len(a & b) / len(a | b) < 0.3  # far below any Jaccard threshold
+
+
+def test_contained_highlight_is_dropped_in_favour_of_the_longer_one():
+    highlights = [
+        {"id": 1, "text": SENTENCE, "location": 1100, "location_type": "offset"},
+        {"id": 2, "text": "An unrelated highlight about something else entirely.", "location": 1150, "location_type": "offset"},
+        {"id": 3, "text": PARAGRAPH, "location": 1000, "location_type": "offset"},
+    ]
+    assert [h["id"] for h in dedupe_near_duplicate_highlights(highlights, threshold=0.8)] == [2, 3]
+    assert [h["id"] for h in dedupe_near_duplicate_highlights(highlights, threshold=0.8, keep="first")] == [1, 2]
+
+
+def test_same_text_in_distant_places_is_kept():
+    summary = "In summary, the chapter showed that small programs are easier to change."
+    refrain = "And so it goes, and so it goes, and so it goes."
+    highlights = [
+        {"id": 1, "text": refrain, "location": 100, "location_type": "offset"},
+        {"id": 2, "text": summary, "location": 900, "location_type": "offset"},
+        {"id": 3, "text": SENTENCE, "location": 1000, "location_type": "offset"},
+        {"id": 4, "text": refrain, "location": 5000, "location_type": "offset"},
+        {"id": 5, "text": summary, "location": 9000, "location_type": "offset"},
+        {"id": 6, "text": "In summary, the chapter showed", "location": 9001, "location_type": "offset"},
+    ]
+    assert [h["id"] for h in dedupe_near_duplicate_highlights(highlights, threshold=0.8)] == [1, 2, 3, 4, 5]
+
+
+def test_anchored_spans_decide_over_locations():
+    highlights = [
+        {"id": 1, "text": SENTENCE, "location": 3, "location_type": "page"},
+        {"id": 2, "text": PARAGRAPH, "location": 3, "location_type": "page"},
+    ]
+    # Same page, but anchored far apart in the document.
+    kept = dedupe_near_duplicate_highlights(highlights, threshold=0.8, positions=[500, 10])
+    assert [h["id"] for h in kept] == [1, 2]
+    kept = dedupe_near_duplicate_highlights(highlights, threshold=0.8, positions=[25, 10])
+    assert [h["id"] for h in kept] == [2]
+
+
+def test_highlights_without_any_position_are_not_merged():
+    highlights = [{"id": 1, "text": SENTENCE}, {"id": 2, "text": PARAGRAPH}]
+    assert dedupe_near_duplicate_highlights(highlights, threshold=0.8) == highlights
+
+
+def test_threshold_zero_disables():
+    highlights = [{"id": 1, "text": SENTENCE}, {"id": 2, "text": PARAGRAPH}]
+    assert dedupe_near_duplicate_highlights(highlights, threshold=0) == highlights
+
+
+def test_image_only_highlights_are_left_alone():
+    highlights = [{"id": 1, "text": "![](https://x/a.png)"}, {"id": 2, "text": "![](https://x/a.png)"}]
+    assert dedupe_near_duplicate_highlights(highlights, threshold=0.5) == highlights
+
+
+def test_minhash_densification_fills_every_bin_from_the_next_non_empty_one():
+    signature = minhash({42})
+    assert len(set(signature)) == len(signature)
+    assert minhash(set()) == [0] * len(signature)
+
+
+def test_clusters_match_brute_force_on_spans_of_paragraphs():
+    rng = random.Random(7)
+    vocabulary = [f"w{i}" for i in range(2000)]
+    texts = []
+    for _ in range(60):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(20, 60))]
+        texts.append(" ".join(words))
+        start = rng.randrange(len(words) - 12)
+        texts.append(" ".join(words[start : start + 12]))
+    sets = [shingles(t) for t in texts]
+    expected = {
+        (i, j) for i in range(len(texts)) for j in range(i + 1, len(texts)) if containment(sets[i], sets[j]) >= 0.8
+    }
+    root = {}
+    for group in near_duplicate_clusters(texts, threshold=0.8):
+        for i in group:
+            root[i] = group[0]
+    assert expected and all(root.get(i, -1) == root.get(j, -2) for i, j in expected)
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from rwhtn.render import render_markdown_note, update_markdown_note
+from rwhtn.sections import Section, SectionTree
+from rwhtn.templates import load_note_template
+
+TITLE = "Book"
+HEADINGS = [(1, "Book"), (2, "Chapter One"), (3, "Detail"), (2, "Chapter Two")]
+
+
+def _tree():
+    sections = [
+        Section(1, "Book", 0, 0),
+        Section(2, "Chapter One", 10, 2, parent=0),
+        Section(3, "Detail", 20, 4, parent=1),
+        Section(2, "Chapter Two", 30, 6, parent=0),
+    ]
+    sections[0].children = [1, 3]
+    sections[1].children = [2]
+    return SectionTree(sections)
+
+
+# (highlight, enclosing section)
+HIGHLIGHTS = [
+    ({"id": 1, "text": "intro words"}, 0),
+    ({"id": 2, "text": "first in chapter one"}, 1),
+    ({"id": 3, "text": "a detail"}, 2),
+    ({"id": 4, "text": "another detail"}, 2),
+    ({"id": 5, "text": "back in chapter one"}, 1),
+    ({"id": 6, "text": "chapter two opens"}, 3),
+    ({"id": 7, "text": "chapter two closes"}, 3),
+]
+
+
+def _render(path, items):
+    render_markdown_note(
+        path=str(path),
+        title=TITLE,
+        source_url="",
+        cover_image_url="",
+        frontmatter={"title": TITLE},
+        highlights=[h for h, _ in items],
+        headings=HEADINGS,
+        section_tree=_tree(),
+        highlight_sections=[s for _, s in items],
+    )
+
+
+def _update(path, items, rendered_ids):
+    return update_markdown_note(
+        path=str(path),
+        title=TITLE,
+        highlights=[h for h, _ in items],
+        headings=HEADINGS,
+        rendered_ids=rendered_ids,
+        section_tree=_tree(),
+        highlight_sections=[s for _, s in items],
+    )
+
+
+def _stable(text):
+    volatile = load_note_template().is_volatile_line
+    return [line for line in text.splitlines() if not volatile(line)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_update_matches_a_full_render(tmp_path, seed):
+    rng = random.Random(seed)
+    old = [item for item in HIGHLIGHTS if rng.random() < 0.5]
+    _render(tmp_path / "note.md", old)
+    _update(tmp_path / "note.md", HIGHLIGHTS, {h["id"] for h, _ in old})
+    _render(tmp_path / "full.md", HIGHLIGHTS)
+    assert _stable((tmp_path / "note.md").read_text()) == _stable((tmp_path / "full.md").read_text())
+
+
+def test_new_highlights_go_under_their_sections_and_keep_user_notes_and_footer(tmp_path):
+    path = tmp_path / "note.md"
+    old = [HIGHLIGHTS[1], HIGHLIGHTS[5]]
+    _render(path, old)
+    text = path.read_text()
+    text = text.replace("- first in chapter one\n", "- first in chapter one\n  my note on it\n    - nested\n")
+    text += "\n## My thoughts\n\nwritten by hand\n"
+    path.write_text(text)
+
+    assert _update(path, HIGHLIGHTS[1:3] + HIGHLIGHTS[5:7], {2, 6})
+
+    lines = path.read_text().splitlines()
+    body = lines[lines.index("### Chapter One") :]
+    assert body == [
+        "### Chapter One",
+        "",
+        "- first in chapter one",
+        "  my note on it",
+        "    - nested",
+        "",
+        "#### Detail",
+        "",
+        "- a detail",
+        "",
+        "### Chapter Two",
+        "",
+        "- chapter two opens",
+        "- chapter two closes",
+        "",
+        "## My thoughts",
+        "",
+        "written by hand",
+    ]
+
+
+def test_nothing_new_leaves_the_note_untouched(tmp_path):
+    path = tmp_path / "note.md"
+    _render(path, HIGHLIGHTS)
+    before = path.read_bytes()
+    assert not _update(path, HIGHLIGHTS, {h["id"] for h, _ in HIGHLIGHTS})
+    assert path.read_bytes() == before
@@ -0,0 +1,90 @@
+import json
+import os
+import time
+
+import pytest
+
+from rwhtn import response_cache
+from rwhtn.json_stream import ReaderPayloadDecoder
+from rwhtn.transform import HtmlAnalysisStream, analyze_html
+from rwhtn.transport import decode_entry
+
+URL = "https://readwise.io/api/v3/list/"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "_settings", response_cache.ResponseCacheSettings(root=str(tmp_path)))
+
+
+def _age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def _entry(params):
+    return response_cache._entry_path(response_cache._cache_key(URL, "t", params))
+
+
+def test_lookup_deletes_expired_entry(cache):
+    params = {"location": "shortlist"}
+    response_cache.store(URL, "t", params, {"results": [1]})
+    assert response_cache.lookup(URL, "t", params) == {"results": [1]}
+    _age(_entry(params), response_cache.DEFAULT_TTLS["reader_list"] + 1)
+    assert response_cache.lookup(URL, "t", params) is None
+    assert not os.path.exists(_entry(params))
+
+
+def test_prune_removes_expired_entries_and_trims_to_size(cache):
+    for i in range(4):
+        response_cache.store(URL, "t", {"id": str(i)}, {"results": ["x" * 1000]})
+    _age(_entry({"id": "0"}), max(response_cache.DEFAULT_TTLS.values()) + 1)
+    for i in (1, 2, 3):
+        _age(_entry({"id": str(i)}), 60 * (4 - i))
+    kept = sum(os.path.getsize(_entry({"id": str(i)})) for i in (2, 3))
+
+    response_cache.configure_response_cache(max_bytes=kept)
+    removed, freed = response_cache.prune_response_cache()
+
+    assert removed == 2 and freed > 2000
+    assert [os.path.exists(_entry({"id": str(i)})) for i in range(4)] == [False, False, True, True]
+
+
+def test_delta_exports_are_never_cached(cache):
+    export = "https://readwise.io/api/v2/export/"
+    delta = {"ids": "1", "updatedAfter": "2025-01-01T00:00:00Z"}
+    response_cache.store(export, "t", delta, {"results": []})
+    assert response_cache.lookup(export, "t", delta) is None
+    assert response_cache.open_writer(export, "t", delta) is None
+    response_cache.store(export, "t", {"ids": "1"}, {"results": []})
+    assert response_cache.lookup(export, "t", {"ids": "1"}) == {"results": []}
+
+
+@pytest.mark.parametrize("raw", [False, True])
+def test_cache_hits_stream_through_the_decoder(cache, raw):
+    reader = "https://readwise.io/api/v3/list/"
+    params = {"id": "d1", "withHtmlContent": "true"}
+    payload = {"results": [{"id": "d1", "title": "T", "html_content": "<h1>Head</h1><p>Body \"x\"</p>tail"}]}
+    if raw:
+        writer = response_cache.open_writer(reader, "t", params)
+        writer.write(json.dumps(payload).encode("utf-8"))
+        writer.commit()
+    else:
+        response_cache.store(reader, "t", params, payload)
+
+    path = response_cache.lookup_path(reader, "t", params)
+    decoded = decode_entry(path, ReaderPayloadDecoder(html_sink=HtmlAnalysisStream), url=reader, params=params)
+    assert decoded["results"][0]["title"] == "T"
+    assert decoded["results"][0]["html_content"] == analyze_html(payload["results"][0]["html_content"])
+
+
+def test_unreadable_cache_entry_is_discarded(cache):
+    reader = "https://readwise.io/api/v3/list/"
+    params = {"id": "d1", "withHtmlContent": "true"}
+    response_cache.store(reader, "t", params, {"results": [{"id": "d1", "html_content": "<p>x</p>"}]})
+    path = response_cache.lookup_path(reader, "t", params)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 10)
+    with pytest.raises(RuntimeError):
+        decode_entry(path, ReaderPayloadDecoder(html_sink=HtmlAnalysisStream), url=reader, params=params)
+    assert response_cache.lookup_path(reader, "t", params) is None
@@ -0,0 +1,79 @@
+from rwhtn.anchoring import anchor_tokens
+from rwhtn.sections import SectionTree
+from rwhtn.transform import analyze_html, place_highlights_in_read_order
+
+HTML = (
+    "<p>Preface before any heading.</p>"
+    "<h1>Part One</h1><p>Opening of part one.</p>"
+    "<h2>Chapter A</h2><p>Alpha text in chapter a.</p>"
+    "<h3>Detail</h3><p>Deep detail words.</p>"
+    "<h2>Chapter B</h2><p>Beta text in chapter b.</p>"
+    "<h1>Part Two</h1><p>Closing words of the book.</p>"
+)
+
+
+def _tree(html=HTML):
+    analysis = analyze_html(html)
+    return SectionTree.build(analysis.headings, analysis.heading_offsets, analysis.html_stream), analysis.html_stream
+
+
+def test_sections_nest_by_level_and_count_tokens_like_the_whole_stream():
+    tree, stream = _tree()
+    assert [(s.level, s.title, s.parent) for s in tree.sections] == [
+        (1, "Part One", None),
+        (2, "Chapter A", 0),
+        (3, "Detail", 1),
+        (2, "Chapter B", 0),
+        (1, "Part Two", None),
+    ]
+    assert tree.roots == [0, 4]
+    assert tree.sections[0].children == [1, 3]
+    for s in tree.sections:
+        assert s.token == len(anchor_tokens(stream[: s.offset]))
+        assert anchor_tokens(stream)[s.token] == anchor_tokens(s.title)[0]
+
+
+def test_highlights_are_bucketed_into_their_enclosing_section():
+    tree, stream = _tree()
+    highlights = [
+        {"id": 1, "text": "Closing words of the book."},
+        {"id": 2, "text": "Deep detail words."},
+        {"id": 3, "text": "Preface before any heading."},
+        {"id": 4, "text": "Beta text in chapter b."},
+        {"id": 5, "text": "Alpha text in chapter a."},
+    ]
+    placed = place_highlights_in_read_order(highlights, stream)
+    assert [h["id"] for _, h in placed] == [3, 5, 2, 4, 1]
+    sections = [tree.section_at(pos) for pos, _ in placed]
+    assert sections == [None, 1, 2, 3, 4]
+    assert [tree.path(i) for i in sections] == [[], [0, 1], [0, 1, 2], [0, 3], [4]]
+
+
+def test_section_at_boundaries():
+    tree, _ = _tree()
+    first = tree.sections[0].token
+    assert tree.section_at(None) is None
+    assert tree.section_at(-1) is None
+    assert tree.section_at(first - 1) is None
+    assert tree.section_at(first) == 0
+    assert tree.section_at(tree.sections[1].token - 1) == 0
+    assert tree.section_at(10**9) == len(tree) - 1
+
+
+def test_mismatched_offsets_give_an_empty_tree():
+    tree = SectionTree.build([(1, "A"), (2, "B")], [0], "A B")
+    assert len(tree) == 0 and tree.section_at(0) is None
+
+
+def test_repeated_phrase_late_in_the_book_lands_in_the_later_section():
+    html = "".join(
+        f"<h2>Chapter {i}</h2><p>Story number {i} unfolds here. In summary, it ends.</p>" for i in range(1, 41)
+    )
+    tree, stream = _tree(html)
+    highlights = [
+        {"id": 1, "text": "Story number 38 unfolds here.", "location": 900, "location_type": "offset"},
+        {"id": 2, "text": "In summary, it ends.", "location": 950, "location_type": "offset"},
+    ]
+    placed = place_highlights_in_read_order(highlights, stream)
+    assert [h["id"] for _, h in placed] == [1, 2]
+    assert [tree.sections[tree.section_at(pos)].title for pos, _ in placed] == ["Chapter 38", "Chapter 38"]
@@ -0,0 +1,18 @@
+import pytest
+
+from rwhtn.templates import HIGHLIGHT_FIELDS, compile_fragment, render_fragment
+
+
+@pytest.mark.parametrize(
+    "source",
+    ["- {text}\n", "{text!r:>12} at {location:05d}{{literal}}", "{note!s}{color!a} {id:x}", "no fields", ""],
+)
+def test_render_matches_str_format(source):
+    values = {"text": "naïve", "location": 42, "note": None, "color": "ü", "id": 255}
+    assert render_fragment(compile_fragment(source, HIGHLIGHT_FIELDS), values) == source.format(**values)
+
+
+@pytest.mark.parametrize("source", ["{bogus}", "{text!x}", "{text:{location}}", "{text"])
+def test_invalid_fragments_are_rejected(source):
+    with pytest.raises(ValueError):
+        compile_fragment(source, HIGHLIGHT_FIELDS)
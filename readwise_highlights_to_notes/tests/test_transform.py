@@ -0,0 +1,66 @@
+import pytest
+
+from rwhtn.anchoring import anchor_tokens
+from rwhtn.transform import analyze_html, anchor_highlights, highlight_anchor_pattern, place_highlights_in_read_order
+
+
+@pytest.mark.parametrize(
+    "markdown, stream",
+    [
+        ("Call `parse_args()` with *no* arguments", "Call parse_args() with no arguments"),
+        ("the __main__ module and **snake_case** names", "the __main__ module and snake_case names"),
+        ("so 2*3 is [six](https://example.com/six)", "so 2*3 is six"),
+        ("an _emphasised_ word", "an emphasised word"),
+    ],
+)
+def test_highlight_tokens_match_stream_tokens(markdown, stream):
+    assert highlight_anchor_pattern({"text": markdown}) == anchor_tokens(stream)
+
+
+def test_highlights_with_markdown_anchor_in_the_stream():
+    stream = "Intro text. Then set MAX_RETRIES to 3. Later, call __init__ on each snake_case object."
+    highlights = [{"text": "call `__init__` on each *snake_case* object"}, {"text": "set `MAX_RETRIES` to 3"}]
+    tokens = anchor_tokens(stream)
+    assert anchor_highlights(highlights, stream) == [tokens.index("call"), tokens.index("set")]
+
+
+def _chapters(n):
+    return " ".join(f"Chapter {i} has its own story number {i}. In summary, it ends." for i in range(1, n + 1))
+
+
+def test_a_phrase_repeated_more_than_32_times_keeps_its_offset_order():
+    stream = _chapters(40)
+    highlights = [
+        {"id": 2, "text": "In summary, it ends.", "location": 950, "location_type": "offset"},
+        {"id": 1, "text": "its own story number 38", "location": 900, "location_type": "offset"},
+    ]
+    placed = place_highlights_in_read_order(highlights, stream)
+    assert [h["id"] for _, h in placed] == [1, 2]
+    tokens = anchor_tokens(stream)
+    assert tokens[placed[1][0] : placed[1][0] + 3] == ["in", "summary", "it"]
+    assert placed[1][0] > placed[0][0]
+
+
+def test_repeated_phrase_with_no_occurrence_after_its_predecessor_is_left_unanchored():
+    stream = _chapters(3) + " Epilogue without the phrase."
+    highlights = [
+        {"id": 1, "text": "Epilogue without the phrase", "location": 10, "location_type": "page"},
+        {"id": 2, "text": "In summary, it ends.", "location": 11, "location_type": "page"},
+    ]
+    assert anchor_highlights(highlights, stream) == [anchor_tokens(stream).index("epilogue")] * 2
+    assert [h["id"] for _, h in place_highlights_in_read_order(highlights, stream)] == [1, 2]
+
+
+def test_a_unique_phrase_before_its_predecessor_still_corrects_a_coarse_location():
+    stream = _chapters(3)
+    highlights = [
+        {"id": 2, "text": "its own story number 3", "location": 1, "location_type": "page"},
+        {"id": 1, "text": "its own story number 1", "location": 1, "location_type": "page", "highlighted_at": "z"},
+    ]
+    assert [h["id"] for _, h in place_highlights_in_read_order(highlights, stream)] == [1, 2]
+
+
+def test_html_stream_keeps_text_after_the_last_tag():
+    analysis = analyze_html("<h1>Title</h1><p>Body</p>trailing words")
+    assert analysis.html_stream.endswith("trailing words")
+    assert analysis.headings == [(1, "Title")]